@@ -0,0 +1,203 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# ─────────────────────────────────────────────────────────
+# AI 응답 캐시 (SQLite 영구 저장 + 세션 메모)
+#
+# - 키: 정규화된 (함수, 모델, 메시지) 의 sha256
+# - 함수별 TTL, 최대 행 수 초과 시 last_used 기준 LRU 삭제
+# - 같은 세션 안에서는 st.session_state 메모로 DB 조회 없이 반환
+# - 실패 응답(None/빈 문자열)은 저장하지 않음
+# ─────────────────────────────────────────────────────────
+
+DB_PATH = "student_system.db"
+
+# 초 단위. 0 이면 캐시하지 않고 매번 호출 (문제 생성은 매번 새 세트가 필요)
+TTL_SECONDS = {
+    'search_content': 30 * 24 * 3600,
+    'generate_book_recommendations': 7 * 24 * 3600,
+    'generate_motivation_message': 6 * 3600,
+    'generate_questions': 0,
+    'parent_ai_text': 24 * 3600,
+    'parent_ai_sections': 24 * 3600,
+    'teacher_ai_text': 24 * 3600,
+}
+DEFAULT_TTL = 24 * 3600
+
+MAX_ROWS = 20000
+_EVICT_EVERY = 100
+
+_lock = threading.Lock()
+_table_ready = False
+_puts_since_evict = 0
+
+stats = {}
+
+
+def _stat(func, field):
+    with _lock:
+        s = stats.setdefault(func, {'session_hits': 0, 'db_hits': 0, 'misses': 0, 'stores': 0,
+                                   'stale_fallbacks': 0})
+        s[field] += 1
+
+
+def get_stats():
+    with _lock:
+        out = {}
+        for func, s in stats.items():
+            total = s['session_hits'] + s['db_hits'] + s['misses']
+            out[func] = dict(s, hit_rate=round((s['session_hits'] + s['db_hits']) / total, 3) if total else 0.0)
+        return out
+
+
+def _conn():
+    global _table_ready
+    con = sqlite3.connect(DB_PATH, timeout=10)
+    con.row_factory = sqlite3.Row
+    if not _table_ready:
+        con.execute("""
+        CREATE TABLE IF NOT EXISTS ai_response_cache (
+            cache_key  TEXT PRIMARY KEY,
+            func       TEXT NOT NULL,
+            model      TEXT,
+            response   TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used  REAL NOT NULL,
+            hit_count  INTEGER DEFAULT 0
+        )""")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_ai_cache_last_used ON ai_response_cache(last_used)")
+        con.commit()
+        _table_ready = True
+    return con
+
+
+def normalize_text(text):
+    return re.sub(r'\s+', ' ', str(text or '')).strip()
+
+
+def make_key(func, model, messages):
+    parts = [func, model or '']
+    base_url = os.environ.get('OPENAI_BASE_URL', '').strip()
+    if base_url:
+        # 로컬/대체 서버 응답이 실제 API 캐시와 섞이지 않도록 분리
+        parts.append(base_url)
+    for m in messages:
+        parts.append(f"{m.get('role', '')}:{normalize_text(m.get('content', ''))}")
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _session_memo():
+    try:
+        import streamlit as st
+        return st.session_state.setdefault('_ai_response_memo', {})
+    except Exception:
+        return None
+
+
+def lookup(key, func, ttl=None):
+    """세션 메모 → 영구 캐시 순으로 조회. 없으면 None."""
+    ttl = TTL_SECONDS.get(func, DEFAULT_TTL) if ttl is None else ttl
+    if ttl <= 0:
+        return None
+
+    memo = _session_memo()
+    if memo is not None and key in memo:
+        _stat(func, 'session_hits')
+        return memo[key]
+    now = time.time()
+    try:
+        con = _conn()
+        row = con.execute(
+            "SELECT response, created_at FROM ai_response_cache WHERE cache_key=?", (key,)
+        ).fetchone()
+        if row and now - row['created_at'] <= ttl:
+            con.execute(
+                "UPDATE ai_response_cache SET last_used=?, hit_count=hit_count+1 WHERE cache_key=?",
+                (now, key)
+            )
+            con.commit()
+            con.close()
+            if memo is not None:
+                memo[key] = row['response']
+            _stat(func, 'db_hits')
+            return row['response']
+        con.close()
+    except sqlite3.Error:
+        pass
+    return None
+
+
+def last_response(key):
+    """TTL 과 무관하게 마지막 저장 응답 (장애 시 대체용)."""
+    try:
+        con = _conn()
+        row = con.execute("SELECT response FROM ai_response_cache WHERE cache_key=?", (key,)).fetchone()
+        con.close()
+        return row['response'] if row else None
+    except sqlite3.Error:
+        return None
+
+
+def store(key, func, model, response, ttl=None):
+    global _puts_since_evict
+    if not response:
+        return
+    ttl = TTL_SECONDS.get(func, DEFAULT_TTL) if ttl is None else ttl
+    if ttl <= 0:
+        return
+    memo = _session_memo()
+    if memo is not None:
+        memo[key] = response
+    now = time.time()
+    try:
+        con = _conn()
+        con.execute("""
+            INSERT INTO ai_response_cache (cache_key, func, model, response, created_at, last_used)
+            VALUES (?,?,?,?,?,?)
+            ON CONFLICT(cache_key) DO UPDATE SET
+                response=excluded.response, created_at=excluded.created_at, last_used=excluded.last_used
+        """, (key, func, model, response, now, now))
+        with _lock:
+            _puts_since_evict += 1
+            evict = _puts_since_evict >= _EVICT_EVERY
+            if evict:
+                _puts_since_evict = 0
+        if evict:
+            con.execute("""
+                DELETE FROM ai_response_cache WHERE cache_key IN (
+                    SELECT cache_key FROM ai_response_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, (MAX_ROWS,))
+        con.commit()
+        con.close()
+        _stat(func, 'stores')
+    except sqlite3.Error:
+        pass
+
+
+def cached_call(func, model, messages, call, ttl=None):
+    """
+    캐시 조회 후 없으면 call() 실행.
+    call() 이 실패하면 마지막 저장 응답을 돌려주고, 그것도 없으면 예외를 전파해
+    호출부의 기존 템플릿/Mock 처리를 따른다.
+    """
+    key = make_key(func, model, messages)
+    hit = lookup(key, func, ttl)
+    if hit is not None:
+        return hit
+    _stat(func, 'misses')
+    try:
+        response = call()
+    except Exception:
+        # 마감 초과/브레이커 열림 등 → TTL 이 지났더라도 마지막 저장 응답으로 대체
+        stale = last_response(key)
+        if stale is None:
+            raise
+        _stat(func, 'stale_fallbacks')
+        return stale
+    store(key, func, model, response, ttl)
+    return response
@@ -0,0 +1,297 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import openai
+from openai import OpenAI
+
+import ai_governor
+
+# ─────────────────────────────────────────────────────────
+# 공용 OpenAI 클라이언트 팩토리
+#
+# - API 키: 환경변수 → st.secrets → .env / api_key.txt (파일·secrets 는 프로세스당 1회만 읽음)
+# - OPENAI_BASE_URL 환경변수가 있으면 그 주소로 호출 (예: 부하 테스트용 fake_openai_server.py)
+# - 프로세스 전체가 하나의 클라이언트(keep-alive 커넥션 풀)를 공유
+# - 호출마다 timeout(= 재시도 포함 전체 마감 시간) 지정, 일시 오류는 지터를 둔 지수 백오프로 재시도
+# - 연속 실패 시 서킷 브레이커가 열려 즉시 실패 → 호출부는 캐시/템플릿으로 대체
+# - 동시 호출 상한/토큰 버킷/하루 토큰 한도와 사용량 기록은 ai_governor 가 담당
+# - 지연/오류 카운터는 get_metrics() 로 조회
+# ─────────────────────────────────────────────────────────
+
+DEFAULT_TIMEOUT = 30.0
+MAX_RETRIES = 2
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN = 30.0
+
+_RETRYABLE = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+_lock = threading.Lock()
+_file_key = None
+_file_key_loaded = False
+_client = None
+_client_key = None
+_client_base_url = None
+
+LOCAL_PLACEHOLDER_KEY = "sk-local-test"
+
+_latencies = deque(maxlen=500)
+metrics = {'calls': 0, 'errors': 0, 'retries': 0, 'timeouts': 0, 'deadline_exceeded': 0,
+           'breaker_rejections': 0, 'latency_total': 0.0}
+
+
+class CircuitOpenError(RuntimeError):
+    """브레이커가 열려 있어 업스트림을 호출하지 않음."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """재시도를 포함한 호출 마감 시간 초과."""
+
+
+class _CircuitBreaker:
+    """closed → (연속 실패 N회) open → (cooldown 후) half_open 에서 1회 시험 호출."""
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = 'half_open'
+                self.probe_in_flight = False
+            if self.state == 'half_open' and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self.probe_in_flight = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+            self.probe_in_flight = False
+
+    def release_probe(self):
+        with self._lock:
+            self.probe_in_flight = False
+
+    def snapshot(self):
+        with self._lock:
+            return {'state': self.state, 'consecutive_failures': self.failures}
+
+
+breaker = _CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_COOLDOWN)
+
+
+def _load_file_key():
+    key = None
+    try:
+        import streamlit as st
+        key = st.secrets.get("OPENAI_API_KEY")
+    except Exception:
+        pass
+    if not key:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        for filename in ['.env', 'api_key.txt']:
+            try:
+                with open(os.path.join(base_dir, filename), 'r', encoding='utf-8') as f:
+                    for line in f:
+                        line = line.strip()
+                        if line.startswith('OPENAI_API_KEY='):
+                            key = line.split('=', 1)[1].strip()
+                            break
+            except Exception:
+                pass
+            if key:
+                break
+    return key or None
+
+
+def resolve_api_key():
+    """환경변수는 매번(설정 페이지에서 바뀔 수 있음), 파일/secrets 는 최초 1회만 확인."""
+    global _file_key, _file_key_loaded
+    key = os.environ.get('OPENAI_API_KEY', '').strip()
+    if key:
+        return key
+    with _lock:
+        if not _file_key_loaded:
+            _file_key = _load_file_key()
+            _file_key_loaded = True
+        return _file_key
+
+
+def resolve_base_url():
+    """OPENAI_BASE_URL 이 지정되면 그 서버(로컬 가짜 서버 등)로 보낸다. 없으면 None(공식 API)."""
+    return os.environ.get('OPENAI_BASE_URL', '').strip() or None
+
+
+def is_configured():
+    """실제 키가 있거나 대체 서버 주소가 지정돼 호출 가능한 상태인지."""
+    return bool(resolve_api_key() or resolve_base_url())
+
+
+def get_client():
+    """키가 있으면 공용 클라이언트, 없으면 None. 키/주소가 바뀌면 새로 만든다."""
+    global _client, _client_key, _client_base_url
+    base_url = resolve_base_url()
+    key = resolve_api_key() or (LOCAL_PLACEHOLDER_KEY if base_url else None)
+    if not key:
+        return None
+    with _lock:
+        if _client is None or _client_key != key or _client_base_url != base_url:
+            # 커넥션 풀은 클라이언트 기본값 사용 (HTTP 라이브러리를 직접 다루지 않음 — openai 버전별로 다름)
+            # 재시도는 아래 chat_completion 에서 직접 처리
+            _client = OpenAI(api_key=key, base_url=base_url, timeout=DEFAULT_TIMEOUT, max_retries=0)
+            _client_key = key
+            _client_base_url = base_url
+        return _client
+
+
+def _record(latency, error=False, timeout=False):
+    with _lock:
+        metrics['calls'] += 1
+        metrics['latency_total'] += latency
+        if error:
+            metrics['errors'] += 1
+        if timeout:
+            metrics['timeouts'] += 1
+        _latencies.append(latency)
+
+
+def get_metrics():
+    with _lock:
+        out = dict(metrics)
+        lat = sorted(_latencies)
+    out['latency_avg'] = round(out['latency_total'] / out['calls'], 3) if out['calls'] else 0.0
+    out['latency_p50'] = round(lat[len(lat) // 2], 3) if lat else 0.0
+    out['latency_p95'] = round(lat[min(len(lat) - 1, int(len(lat) * 0.95))], 3) if lat else 0.0
+    out['breaker'] = breaker.snapshot()
+    return out
+
+
+def _backoff(attempt):
+    # full jitter: 0 ~ min(cap, base * 2^attempt)
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
+def chat_completion(model, messages, timeout=DEFAULT_TIMEOUT, retries=MAX_RETRIES, func=None, **kwargs):
+    """
+    chat.completions.create 래퍼. timeout 은 재시도·대기열 대기를 포함한 전체 마감 시간(초).
+    stream=True 면 스트림 iterator 를 반환한다(재시도는 연결 수립까지만).
+    키가 없으면 RuntimeError, 브레이커가 열려 있으면 CircuitOpenError,
+    마감 시간을 넘기면 DeadlineExceeded, 하루 한도 초과면 ai_governor.BudgetExceeded.
+    func 는 사용량 집계용 이름.
+    """
+    client = get_client()
+    if client is None:
+        raise RuntimeError("OpenAI API 키가 설정되지 않았습니다.")
+    if not breaker.allow():
+        with _lock:
+            metrics['breaker_rejections'] += 1
+        raise CircuitOpenError("AI 서버 응답이 불안정해 잠시 호출을 중단했습니다.")
+
+    deadline_at = time.monotonic() + timeout
+    try:
+        ticket = ai_governor.acquire(func, model, messages, kwargs.get('max_tokens'), deadline_at)
+    except ai_governor.QueueTimeout as e:
+        breaker.release_probe()
+        with _lock:
+            metrics['deadline_exceeded'] += 1
+        raise DeadlineExceeded(f"AI 호출 대기 마감 시간({timeout:.0f}초) 초과") from e
+    except Exception:
+        breaker.release_probe()
+        raise
+
+    stream = kwargs.get('stream', False)
+    if stream:
+        # 마지막 이벤트에 토큰 사용량을 받아 집계 (구버전 SDK 호환을 위해 extra_body 로 전달)
+        extra_body = dict(kwargs.pop('extra_body', None) or {})
+        extra_body.setdefault('stream_options', {'include_usage': True})
+        kwargs['extra_body'] = extra_body
+
+    attempt = 0
+    while True:
+        remaining = deadline_at - time.monotonic()
+        started = time.perf_counter()
+        try:
+            response = client.with_options(timeout=max(remaining, 0.1)).chat.completions.create(
+                model=model, messages=messages, **kwargs
+            )
+            _record(time.perf_counter() - started)
+            breaker.success()
+            if stream:
+                return _governed_stream(response, ticket)
+            usage = getattr(response, 'usage', None)
+            ticket.release(getattr(usage, 'prompt_tokens', None), getattr(usage, 'completion_tokens', None))
+            return response
+        except _RETRYABLE as e:
+            _record(time.perf_counter() - started, error=True,
+                    timeout=isinstance(e, openai.APITimeoutError))
+            wait = _backoff(attempt)
+            if attempt >= retries or time.monotonic() + wait >= deadline_at:
+                breaker.failure()
+                ticket.release(ok=False)
+                if time.monotonic() + wait >= deadline_at:
+                    with _lock:
+                        metrics['deadline_exceeded'] += 1
+                    raise DeadlineExceeded(f"AI 응답 마감 시간({timeout:.0f}초) 초과") from e
+                raise
+            with _lock:
+                metrics['retries'] += 1
+            time.sleep(wait)
+            attempt += 1
+        except Exception:
+            # 인증/요청 오류 등은 업스트림 장애가 아니므로 브레이커에 반영하지 않음
+            _record(time.perf_counter() - started, error=True)
+            breaker.release_probe()
+            ticket.release(ok=False)
+            raise
+
+
+def _governed_stream(stream, ticket):
+    """스트림을 끝까지 읽거나 중간에 닫을 때 거버너 슬롯을 반환."""
+    usage = None
+    ok = True
+    try:
+        for event in stream:
+            if getattr(event, 'usage', None):
+                usage = event.usage
+            yield event
+    except Exception:
+        ok = False
+        raise
+    finally:
+        ticket.release(getattr(usage, 'prompt_tokens', None), getattr(usage, 'completion_tokens', None), ok=ok)
+        close = getattr(stream, 'close', None)
+        if close:
+            close()
+
+
+def chat_text(model, messages, **kwargs):
+    response = chat_completion(model, messages, **kwargs)
+    return response.choices[0].message.content
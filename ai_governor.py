@@ -0,0 +1,337 @@
+import datetime as dt
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# ─────────────────────────────────────────────────────────
+# AI 호출 거버너 (학생/학부모/교사/배치 공용)
+#
+# ai_client.chat_completion 이 모든 호출 전에 acquire(), 끝나면 release() 한다.
+# - 전역 동시 호출 상한(MAX_CONCURRENT): 초과분은 대기열에서 기다림
+# - 토큰 버킷(분당 토큰): 예상 토큰만큼 차감, 부족하면 채워질 때까지 대기
+#   (대기는 호출 마감 시간까지만 → 넘기면 QueueTimeout)
+# - 역할별 / 사용자별 하루 토큰 한도: 초과 시 즉시 BudgetExceeded (호출부는 캐시/템플릿으로 대체)
+# - 호출마다 ai_usage 테이블에 함수/모델/토큰/지연/대기 시간 기록 → 관리자 화면에서 조회
+#
+# 호출자(역할, 사용자)는 스레드별로 caller() 로 지정. 바깥에서 먼저 지정한 값이 우선
+# (예: 야간 배치가 'batch' 로 지정하면 parent_ai_helper 안의 'parent' 지정은 무시됨).
+# ─────────────────────────────────────────────────────────
+
+DB_PATH = "student_system.db"
+
+MAX_CONCURRENT = 16
+TOKENS_PER_MINUTE = 200_000
+
+# 하루 토큰 한도 (None = 무제한)
+# prefetch: 풀이 중 다음 세트 미리 생성 → 학생 개인 한도와 별도로 역할 합계만 제한
+ROLE_DAILY_BUDGET = {'student': 3_000_000, 'parent': 1_000_000, 'teacher': 1_000_000,
+                     'prefetch': 1_000_000, 'batch': None, 'system': None}
+USER_DAILY_BUDGET = {'student': 60_000, 'parent': 40_000, 'teacher': 150_000,
+                     'prefetch': None, 'batch': None, 'system': None}
+
+
+class BudgetExceeded(RuntimeError):
+    """오늘 사용 가능한 토큰 한도를 넘음."""
+
+
+class QueueTimeout(TimeoutError):
+    """동시 호출 상한/토큰 버킷 대기 중 마감 시간 초과."""
+
+
+_local = threading.local()
+_cond = threading.Condition()
+_table_ready = False
+
+_state = {'in_flight': 0, 'waiting': 0, 'tokens': float(TOKENS_PER_MINUTE), 'refilled_at': time.monotonic()}
+_used = {}       # (day, role, user_id|None) → 오늘 사용 토큰 (user_id None = 역할 합계)
+_reserved = {}   # 진행 중 호출의 예상 토큰
+stats = {'calls': 0, 'queued': 0, 'queue_timeouts': 0, 'budget_rejections': 0, 'wait_total': 0.0}
+
+
+# ─────────────────────────────────────────────────────────
+# 호출자 지정
+# ─────────────────────────────────────────────────────────
+
+@contextmanager
+def caller(role, user_id=None):
+    """이 스레드의 AI 호출을 (role, user_id) 로 집계. 이미 지정돼 있으면 바깥 값을 유지."""
+    prev = getattr(_local, 'who', None)
+    if prev is None:
+        _local.who = (role, user_id)
+    try:
+        yield
+    finally:
+        _local.who = prev
+
+
+def current_caller():
+    return getattr(_local, 'who', None) or ('system', None)
+
+
+def bind(fn):
+    """현재 호출자를 작업 스레드로 전달 (스레드 풀 submit 용)."""
+    who = getattr(_local, 'who', None)
+
+    def run(*args, **kwargs):
+        if who is None:
+            return fn(*args, **kwargs)
+        with caller(*who):
+            return fn(*args, **kwargs)
+    return run
+
+
+# ─────────────────────────────────────────────────────────
+# 사용량 테이블
+# ─────────────────────────────────────────────────────────
+
+def _conn():
+    global _table_ready
+    con = sqlite3.connect(DB_PATH, timeout=10)
+    con.row_factory = sqlite3.Row
+    if not _table_ready:
+        con.execute("""
+        CREATE TABLE IF NOT EXISTS ai_usage (
+            id                INTEGER PRIMARY KEY AUTOINCREMENT,
+            day               TEXT NOT NULL,     -- YYYY-MM-DD
+            role              TEXT NOT NULL,     -- student | parent | teacher | prefetch | batch | system
+            user_id           INTEGER,
+            func              TEXT,
+            model             TEXT,
+            prompt_tokens     INTEGER DEFAULT 0,
+            completion_tokens INTEGER DEFAULT 0,
+            latency           REAL,
+            queue_wait        REAL,
+            status            TEXT NOT NULL,     -- ok | error | rejected
+            created_at        DATETIME DEFAULT CURRENT_TIMESTAMP
+        )""")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_ai_usage_day_role_user ON ai_usage(day, role, user_id)")
+        con.commit()
+        _table_ready = True
+    return con
+
+
+def _today():
+    return dt.date.today().isoformat()
+
+
+def _load_used(day, role, user_id):
+    """프로세스 재시작 후에도 한도가 이어지도록 최초 1회 DB 합계로 초기화 (_cond 보유 상태에서 호출)."""
+    key = (day, role, user_id)
+    if key not in _used:
+        sql = "SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0) FROM ai_usage WHERE day=? AND role=?"
+        params = [day, role]
+        if user_id is not None:
+            sql += " AND user_id=?"
+            params.append(user_id)
+        try:
+            con = _conn()
+            _used[key] = con.execute(sql, params).fetchone()[0]
+            con.close()
+        except sqlite3.Error:
+            _used[key] = 0
+    return _used[key]
+
+
+def _record(day, role, user_id, func, model, prompt_tokens, completion_tokens, latency, wait, status):
+    try:
+        con = _conn()
+        con.execute("""
+            INSERT INTO ai_usage (day, role, user_id, func, model, prompt_tokens, completion_tokens,
+                                  latency, queue_wait, status)
+            VALUES (?,?,?,?,?,?,?,?,?,?)
+        """, (day, role, user_id, func, model, prompt_tokens, completion_tokens,
+              round(latency, 3), round(wait, 3), status))
+        con.commit()
+        con.close()
+    except sqlite3.Error:
+        pass
+
+
+# ─────────────────────────────────────────────────────────
+# 획득 / 반환
+# ─────────────────────────────────────────────────────────
+
+def estimate_tokens(messages, max_tokens=None):
+    """한글 위주 프롬프트 기준 대략 2자당 1토큰 + 응답 상한."""
+    chars = sum(len(str(m.get('content', ''))) for m in messages)
+    return chars // 2 + 10 * len(messages) + (max_tokens or 500)
+
+
+def _refill():
+    now = time.monotonic()
+    _state['tokens'] = min(float(TOKENS_PER_MINUTE),
+                           _state['tokens'] + (now - _state['refilled_at']) * TOKENS_PER_MINUTE / 60.0)
+    _state['refilled_at'] = now
+
+
+def _scopes(role, user_id):
+    """(한도 dict, user_id) 목록: 역할 합계 + (있으면) 사용자별."""
+    scopes = [(ROLE_DAILY_BUDGET, None)]
+    if user_id is not None:
+        scopes.append((USER_DAILY_BUDGET, user_id))
+    return scopes
+
+
+def _check_budget(day, role, user_id, est):
+    for limits, uid in _scopes(role, user_id):
+        limit = limits.get(role)
+        if limit is None:
+            continue
+        if _load_used(day, role, uid) + _reserved.get((day, role, uid), 0) + est > limit:
+            scope = "역할" if uid is None else "사용자"
+            raise BudgetExceeded(f"오늘 AI 사용 한도({scope} {limit:,} 토큰)를 모두 사용했습니다.")
+
+
+def _reserve(day, role, user_id, delta):
+    for _, uid in _scopes(role, user_id):
+        key = (day, role, uid)
+        _reserved[key] = _reserved.get(key, 0) + delta
+        if _reserved[key] <= 0:
+            _reserved.pop(key, None)
+
+
+class Ticket:
+    def __init__(self, day, role, user_id, func, model, est, cost, wait):
+        self.day, self.role, self.user_id = day, role, user_id
+        self.func, self.model = func, model
+        self.est, self.cost, self.wait = est, cost, wait
+        self.started = time.perf_counter()
+        self._released = False
+
+    def release(self, prompt_tokens=None, completion_tokens=None, ok=True):
+        """사용 토큰을 반영하고 슬롯 반환. 실제 사용량을 모르면 예상치로 집계."""
+        if self._released:
+            return
+        self._released = True
+        latency = time.perf_counter() - self.started
+        if prompt_tokens is None and completion_tokens is None:
+            prompt_tokens, completion_tokens = (self.est, 0) if ok else (0, 0)
+        actual = (prompt_tokens or 0) + (completion_tokens or 0)
+        with _cond:
+            _state['in_flight'] -= 1
+            # 예상보다 적게 썼으면 버킷에 되돌려 줌
+            if actual < self.cost:
+                _state['tokens'] = min(float(TOKENS_PER_MINUTE), _state['tokens'] + self.cost - actual)
+            _reserve(self.day, self.role, self.user_id, -self.est)
+            for _, uid in _scopes(self.role, self.user_id):
+                _load_used(self.day, self.role, uid)
+                _used[(self.day, self.role, uid)] += actual
+            _cond.notify_all()
+        _record(self.day, self.role, self.user_id, self.func, self.model,
+                prompt_tokens or 0, completion_tokens or 0, latency, self.wait, 'ok' if ok else 'error')
+
+
+def acquire(func, model, messages, max_tokens, deadline_at):
+    """
+    동시 호출 슬롯과 토큰 버킷을 확보하고 Ticket 반환.
+    한도 초과 → BudgetExceeded (대기하지 않음), 마감 시간까지 확보 못 하면 QueueTimeout.
+    """
+    role, user_id = current_caller()
+    day = _today()
+    est = estimate_tokens(messages, max_tokens)
+    cost = min(est, TOKENS_PER_MINUTE)
+    queued_at = time.monotonic()
+
+    with _cond:
+        try:
+            _check_budget(day, role, user_id, est)
+        except BudgetExceeded:
+            stats['budget_rejections'] += 1
+            _record(day, role, user_id, func, model, 0, 0, 0.0, 0.0, 'rejected')
+            raise
+        _reserve(day, role, user_id, est)
+        stats['calls'] += 1
+        waited = False
+        _state['waiting'] += 1
+        try:
+            while True:
+                _refill()
+                if _state['in_flight'] < MAX_CONCURRENT and _state['tokens'] >= cost:
+                    _state['tokens'] -= cost
+                    _state['in_flight'] += 1
+                    break
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    stats['queue_timeouts'] += 1
+                    _reserve(day, role, user_id, -est)
+                    raise QueueTimeout("AI 호출 대기열 마감 시간 초과")
+                if not waited:
+                    waited = True
+                    stats['queued'] += 1
+                if _state['in_flight'] >= MAX_CONCURRENT:
+                    _cond.wait(remaining)
+                else:
+                    need = (cost - _state['tokens']) * 60.0 / TOKENS_PER_MINUTE
+                    _cond.wait(min(remaining, max(need, 0.01)))
+        finally:
+            _state['waiting'] -= 1
+        wait = time.monotonic() - queued_at
+        stats['wait_total'] += wait
+    return Ticket(day, role, user_id, func, model, est, cost, wait)
+
+
+# ─────────────────────────────────────────────────────────
+# 조회 (관리자 화면)
+# ─────────────────────────────────────────────────────────
+
+def get_status():
+    with _cond:
+        _refill()
+        out = dict(stats)
+        out.update(in_flight=_state['in_flight'], waiting=_state['waiting'],
+                   bucket_tokens=int(_state['tokens']), max_concurrent=MAX_CONCURRENT,
+                   tokens_per_minute=TOKENS_PER_MINUTE)
+    out['wait_avg'] = round(out['wait_total'] / out['calls'], 3) if out['calls'] else 0.0
+    return out
+
+
+def usage_by_function(day=None):
+    con = _conn()
+    rows = con.execute("""
+        SELECT role, func, model,
+               COUNT(*)                                        AS calls,
+               SUM(CASE WHEN status='error' THEN 1 ELSE 0 END)  AS errors,
+               SUM(CASE WHEN status='rejected' THEN 1 ELSE 0 END) AS rejected,
+               SUM(prompt_tokens)                              AS prompt_tokens,
+               SUM(completion_tokens)                          AS completion_tokens,
+               ROUND(AVG(CASE WHEN status!='rejected' THEN latency END), 3)    AS avg_latency,
+               ROUND(AVG(CASE WHEN status!='rejected' THEN queue_wait END), 3) AS avg_queue_wait
+        FROM ai_usage WHERE day=?
+        GROUP BY role, func, model
+        ORDER BY prompt_tokens + completion_tokens DESC
+    """, (day or _today(),)).fetchall()
+    con.close()
+    return [dict(r) for r in rows]
+
+
+def usage_by_user(day=None):
+    con = _conn()
+    rows = con.execute("""
+        SELECT role, user_id, COUNT(*) AS calls,
+               SUM(prompt_tokens + completion_tokens) AS tokens
+        FROM ai_usage WHERE day=?
+        GROUP BY role, user_id
+        ORDER BY tokens DESC
+    """, (day or _today(),)).fetchall()
+    con.close()
+    out = []
+    for r in rows:
+        d = dict(r)
+        limit = USER_DAILY_BUDGET.get(d['role']) if d['user_id'] is not None else None
+        d['budget'] = limit
+        d['budget_used_pct'] = round(d['tokens'] / limit * 100, 1) if limit else None
+        out.append(d)
+    return out
+
+
+def usage_by_day(days=14):
+    con = _conn()
+    rows = con.execute("""
+        SELECT day, role, SUM(prompt_tokens) AS prompt_tokens, SUM(completion_tokens) AS completion_tokens,
+               COUNT(*) AS calls
+        FROM ai_usage WHERE day >= ?
+        GROUP BY day, role ORDER BY day
+    """, ((dt.date.today() - dt.timedelta(days=days - 1)).isoformat(),)).fetchall()
+    con.close()
+    return [dict(r) for r in rows]
@@ -1,5 +1,10 @@
 import streamlit as st
 
+import database as db
+
+# 어느 페이지로 들어와도 스키마가 준비되도록 (예전 questions 테이블 변환 포함)
+db.init_database()
+
 pg = st.navigation({
     "── 정시 시스템 ──": [
         st.Page("pages/1_정세담소개.py", title="정세담 소개",    icon="📋"),
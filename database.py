@@ -1,5 +1,11 @@
 import sqlite3
 import datetime
+import hashlib
+import json
+import unicodedata
+
+import read_cache
+from pagination import keyset_page, cached_page
 
 DB_PATH = "student_system.db"
 
@@ -10,6 +16,224 @@ def get_connection():
     return con
 
 
+def _query_rows(sql, params=()):
+    con = get_connection()
+    rows = con.execute(sql, params).fetchall()
+    con.close()
+    return rows
+
+
+# ── 문제 저장 구조 ───────────────────────────────────────────
+# question_content : 문제/정답/해설 본문. 내용 해시로 한 번만 저장 (같은 Mock/AI 문제 공유)
+# session_questions: 세션별 출제 행 (session_id, 번호, content_id, 정답 여부) — 자주 훑는 좁은 테이블
+# questions        : 위 둘을 합친 읽기용 뷰 (기존 조회 코드는 그대로 사용)
+#                    본문 컬럼을 쓰지 않는 집계는 LEFT JOIN 이 생략되어 좁은 테이블만 읽는다.
+# 쓰기(출제/채점/삭제)는 이 모듈의 함수만 session_questions / question_content 에 직접 한다.
+
+def content_key(question_text, answer, explanation) -> str:
+    """본문 저장소 키. 공백까지 그대로 보존해야 하므로 정규화하지 않는다."""
+    raw = json.dumps([question_text, answer, explanation], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _content_id(con, question_text, answer, explanation) -> int:
+    key = content_key(question_text, answer, explanation)
+    con.execute(
+        """INSERT OR IGNORE INTO question_content (content_hash, question_text, answer, explanation)
+           VALUES (?,?,?,?)""",
+        (key, question_text, answer, explanation)
+    )
+    return con.execute("SELECT id FROM question_content WHERE content_hash=?", (key,)).fetchone()[0]
+
+
+def _init_question_storage(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS question_content (
+        id            INTEGER   PRIMARY KEY AUTOINCREMENT,
+        content_hash  TEXT      UNIQUE NOT NULL,
+        question_text TEXT,
+        answer        TEXT,
+        explanation   TEXT,
+        created_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS session_questions (
+        id              INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id      INTEGER NOT NULL,
+        question_number INTEGER NOT NULL,
+        content_id      INTEGER NOT NULL,
+        is_correct      INTEGER DEFAULT 0
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_session_questions_session ON session_questions(session_id, question_number)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_session_questions_content ON session_questions(content_id)")
+
+    legacy = cur.execute("SELECT type FROM sqlite_master WHERE name='questions'").fetchone()
+    if legacy and legacy[0] == 'table':
+        # 예전 넓은 questions 테이블 → 본문/출제 행으로 옮김 (id 유지: retry_links, review_state 가 참조)
+        rows = cur.execute(
+            "SELECT id, session_id, question_number, question_text, answer, explanation, is_correct FROM questions"
+        ).fetchall()
+        for r in rows:
+            cid = _content_id(cur.connection, r[3], r[4], r[5])
+            cur.execute(
+                """INSERT OR IGNORE INTO session_questions (id, session_id, question_number, content_id, is_correct)
+                   VALUES (?,?,?,?,?)""",
+                (r[0], r[1], r[2], cid, r[6])
+            )
+        cur.execute("DROP TABLE questions")   # 본문 색인 트리거도 함께 삭제됨
+        old_fts = cur.execute("SELECT sql FROM sqlite_master WHERE name='questions_fts'").fetchone()
+        if old_fts and "content='questions'" in old_fts[0]:
+            cur.execute("DROP TABLE questions_fts")   # 본문 저장소 기준으로 _init_fts 에서 다시 만듦
+
+    cur.execute("""
+    CREATE VIEW IF NOT EXISTS questions AS
+    SELECT sq.id, sq.session_id, sq.question_number,
+           c.question_text, c.answer, c.explanation, sq.is_correct, sq.content_id
+    FROM session_questions sq
+    LEFT JOIN question_content c ON c.id = sq.content_id
+    """)
+
+
+def _release_contents(con, content_ids):
+    """더 이상 어느 세션에서도 쓰지 않는 본문 삭제."""
+    for cid in set(content_ids):
+        con.execute(
+            """DELETE FROM question_content WHERE id=?
+               AND NOT EXISTS (SELECT 1 FROM session_questions WHERE content_id=?)""",
+            (cid, cid)
+        )
+
+
+# ── 단어장 저장 구조 ─────────────────────────────────────────
+# definitions       : (과목, 정규화한 용어) → 설명. 학교 전체가 한 번 받은 설명을 공유
+#                     source='ai' 는 API 로 받은 설명 (검색 시 재사용), 'saved' 는 학생이 저장한
+#                     대체/Mock 문구 (재사용하지 않고, 같은 용어의 AI 설명이 생기면 덮어씀)
+# student_vocabulary: 학생별 단어장 행 (검색어, definition_id)
+# search_history    : 위 둘을 합친 읽기용 뷰 (기존 result_text 조회 그대로)
+
+NON_DEFINITION_PREFIXES = ("[", "검색 오류", "OpenAI API 키")   # 대체/Mock 응답 문구
+
+
+def normalize_term(term) -> str:
+    """'세포 호흡', '세포호흡?', 'Photosynthesis ' 처럼 표기만 다른 검색어를 같은 키로."""
+    text = unicodedata.normalize("NFKC", str(term or "")).lower()
+    return "".join(text.split()).strip(".,?!~\"'")
+
+
+def _init_vocabulary_storage(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS definitions (
+        id              INTEGER   PRIMARY KEY AUTOINCREMENT,
+        subject         TEXT      NOT NULL,
+        normalized_term TEXT      NOT NULL,
+        term            TEXT,
+        definition      TEXT      NOT NULL,
+        source          TEXT      DEFAULT 'ai',   -- ai | saved
+        created_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (subject, normalized_term)
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS student_vocabulary (
+        id            INTEGER   PRIMARY KEY AUTOINCREMENT,
+        student_id    INTEGER   NOT NULL,
+        subject       TEXT,
+        search_term   TEXT,
+        definition_id INTEGER   NOT NULL,
+        created_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_student_vocabulary_student ON student_vocabulary(student_id, created_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_student_vocabulary_subject ON student_vocabulary(student_id, subject, created_at)")
+
+    legacy = cur.execute("SELECT type FROM sqlite_master WHERE name='search_history'").fetchone()
+    if legacy and legacy[0] == 'table':
+        # 예전 학생별 설명 사본 → 공용 설명 + 단어장 행 (id 유지, 같은 용어는 처음 저장된 설명 사용)
+        rows = cur.execute(
+            "SELECT id, student_id, subject, search_term, result_text, created_at FROM search_history ORDER BY id"
+        ).fetchall()
+        for r in rows:
+            text = r[4] or ""
+            source = 'saved' if text.startswith(NON_DEFINITION_PREFIXES) else 'ai'
+            definition_id = _definition_id(cur.connection, r[2] or "", r[3], text, source)
+            cur.execute(
+                """INSERT OR IGNORE INTO student_vocabulary (id, student_id, subject, search_term, definition_id, created_at)
+                   VALUES (?,?,?,?,?,?)""",
+                (r[0], r[1], r[2], r[3], definition_id, r[5])
+            )
+        cur.execute("DROP TABLE search_history")   # 검색 색인 트리거도 함께 삭제됨
+        cur.execute("DROP TABLE IF EXISTS search_history_fts")   # definitions_fts 로 대체
+
+    cur.execute("""
+    CREATE VIEW IF NOT EXISTS search_history AS
+    SELECT v.id, v.student_id, v.subject, v.search_term, d.definition AS result_text, v.created_at,
+           v.definition_id
+    FROM student_vocabulary v
+    LEFT JOIN definitions d ON d.id = v.definition_id
+    """)
+
+
+def _definition_id(con, subject, term, text, source='saved') -> int:
+    """(과목, 용어) 설명 id. 없으면 만들고, AI 설명이 들어오면 'saved' 문구를 대체한다."""
+    key = normalize_term(term)
+    con.execute("""
+        INSERT INTO definitions (subject, normalized_term, term, definition, source) VALUES (?,?,?,?,?)
+        ON CONFLICT(subject, normalized_term) DO UPDATE SET
+            term=excluded.term, definition=excluded.definition, source=excluded.source
+        WHERE definitions.source <> 'ai' AND excluded.source = 'ai'
+    """, (subject or "", key, term, text or "", source))
+    return con.execute(
+        "SELECT id FROM definitions WHERE subject=? AND normalized_term=?", (subject or "", key)
+    ).fetchone()[0]
+
+
+# ── 전문 검색(FTS5) 색인 정의 ────────────────────────────────
+# 원본 테이블을 content 로 쓰는 외부 콘텐츠 색인 + 트리거 동기화.
+# trigram 토크나이저라 띄어쓰기/조사와 무관하게 한글 부분 문자열로 찾을 수 있다 (3글자 이상).
+
+FTS_INDEXES = {
+    'definitions_fts': ('definitions', ('term', 'definition')),
+    'vocabulary_fts': ('student_vocabulary', ('search_term',)),   # 학생 본인 검색어 표기
+    'questions_fts': ('question_content', ('question_text', 'explanation')),
+}
+
+
+def _init_fts(cur):
+    """FTS5 색인/트리거 생성. 처음 만들 때만 기존 행으로 재구성. FTS5 미지원 SQLite 면 건너뜀."""
+    for fts, (table, cols) in FTS_INDEXES.items():
+        exists = cur.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (fts,)
+        ).fetchone()
+        try:
+            cur.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                {', '.join(cols)}, content='{table}', content_rowid='id', tokenize='trigram'
+            )""")
+        except sqlite3.OperationalError:
+            return
+        col_list = ', '.join(cols)
+        new_vals = ', '.join(f"new.{c}" for c in cols)
+        old_vals = ', '.join(f"old.{c}" for c in cols)
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}(rowid, {col_list}) VALUES (new.id, {new_vals});
+            END""")
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {col_list}) VALUES ('delete', old.id, {old_vals});
+            END""")
+        # 채점(is_correct 갱신)마다 색인이 다시 쓰이지 않도록 본문 컬럼 변경에만 반응
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {col_list} ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {col_list}) VALUES ('delete', old.id, {old_vals});
+                INSERT INTO {fts}(rowid, {col_list}) VALUES (new.id, {new_vals});
+            END""")
+        if not exists:
+            cur.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
 def init_database():
     con = get_connection()
     cur = con.cursor()
@@ -43,20 +267,93 @@ def init_database():
         created_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )
     """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_study_sessions_student ON study_sessions(student_id, created_at, id)")
+
+    # ── 문제 (본문 저장소 + 세션별 출제 행, questions 는 둘을 합친 뷰) ──
+    _init_question_storage(cur)
 
-    # ── 문제 ───────────────────────────────────────────────
+    # ── 오답 복습 문항 → 원래 오답 문항 연결 ─────────────────
+    # 복습 세션의 문항은 원래 문항을 복사해 만들고, 여기서 원본(root)을 가리킨다
     cur.execute("""
-    CREATE TABLE IF NOT EXISTS questions (
-        id              INTEGER PRIMARY KEY AUTOINCREMENT,
-        session_id      INTEGER NOT NULL,
-        question_number INTEGER NOT NULL,
-        question_text   TEXT,
-        answer          TEXT,
-        explanation     TEXT,
-        is_correct      INTEGER DEFAULT 0
+    CREATE TABLE IF NOT EXISTS retry_links (
+        question_id        INTEGER PRIMARY KEY,   -- 복습 세션에 새로 만든 questions.id
+        source_question_id INTEGER NOT NULL       -- 처음 틀렸던 questions.id
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_retry_links_source ON retry_links(source_question_id)")
+
+    # ── 오답 간격 반복 상태 (원본 오답 문항당 1행, Leitner 상자 + SM-2 난이도 계수) ──
+    had_review_state = cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='review_state'"
+    ).fetchone()
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS review_state (
+        question_id   INTEGER PRIMARY KEY,        -- 원본 오답 questions.id
+        student_id    INTEGER NOT NULL,
+        box           INTEGER NOT NULL DEFAULT 1, -- 1~REVIEW_MAX_BOX
+        ease          REAL    NOT NULL DEFAULT 2.5,
+        interval_days INTEGER NOT NULL DEFAULT 1,
+        due_date      TEXT    NOT NULL,           -- YYYY-MM-DD
+        reviews       INTEGER NOT NULL DEFAULT 0,
+        lapses        INTEGER NOT NULL DEFAULT 0,
+        updated_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_review_state_due ON review_state(student_id, due_date)")
+    if not had_review_state:
+        # 기존 오답은 틀린 다음 날 복습 예정으로 한 번만 채워 넣음
+        cur.execute("""
+            INSERT OR IGNORE INTO review_state (question_id, student_id, due_date)
+            SELECT q.id, ss.student_id, date(ss.created_at, '+1 day')
+            FROM session_questions q JOIN study_sessions ss ON ss.id = q.session_id
+            WHERE q.is_correct = 0 AND q.id NOT IN (SELECT question_id FROM retry_links)
+        """)
+
+    # ── 문제 은행 (범위 키별 풀, 내용 해시로 중복 제거) ────────
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS question_bank (
+        bank_key      TEXT    NOT NULL,
+        content_hash  TEXT    NOT NULL,
+        question_text TEXT,
+        answer        TEXT,
+        explanation   TEXT,
+        served_count  INTEGER DEFAULT 0,
+        created_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (bank_key, content_hash)
     )
     """)
 
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS question_bank_seen (
+        student_id   INTEGER NOT NULL,
+        content_hash TEXT    NOT NULL,
+        seen_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (student_id, content_hash)
+    )
+    """)
+
+    # ── 다음 세트 미리 생성 (풀이 중 백그라운드) ──────────────
+    # 학습 세션이 아니므로 통계/이력에 잡히지 않음. 시작 시 study_sessions 로 옮겨짐
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS prefetched_sets (
+        id             INTEGER   PRIMARY KEY AUTOINCREMENT,
+        student_id     INTEGER   NOT NULL,
+        bank_key       TEXT      NOT NULL,
+        subject        TEXT,
+        grade          TEXT,
+        page_start     INTEGER,
+        page_end       INTEGER,
+        difficulty     TEXT,
+        exam_type      TEXT,
+        num_questions  INTEGER,
+        questions_json TEXT      NOT NULL,
+        status         TEXT      DEFAULT 'pending',   -- pending | used | expired
+        expires_at     TIMESTAMP NOT NULL,
+        created_at     TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_prefetched_student ON prefetched_sets(student_id, status)")
+
     # ── 심리 테스트 ─────────────────────────────────────────
     cur.execute("""
     CREATE TABLE IF NOT EXISTS psychological_tests (
@@ -70,18 +367,13 @@ def init_database():
         test_date   TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )
     """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_psychological_tests_student ON psychological_tests(student_id, test_date, id)")
 
-    # ── 검색 이력(단어장) ────────────────────────────────────
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS search_history (
-        id          INTEGER   PRIMARY KEY AUTOINCREMENT,
-        student_id  INTEGER   NOT NULL,
-        subject     TEXT,
-        search_term TEXT,
-        result_text TEXT,
-        created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
+    # ── 검색 이력(단어장): 공용 용어 설명 + 학생별 단어장 행, search_history 는 뷰 ──
+    _init_vocabulary_storage(cur)
+
+    # ── 전문 검색 색인 (단어장 / 문제 이력) ───────────────────
+    _init_fts(cur)
 
     # ── 순위 캐시 ───────────────────────────────────────────
     cur.execute("""
@@ -225,6 +517,7 @@ def init_database():
 
     con.commit()
     con.close()
+    read_cache.clear()
 
 
 # ── 학생 조회 ────────────────────────────────────────────────
@@ -247,6 +540,11 @@ def get_student_by_id(student_id: int):
 
 
 def get_student_stats(student_id: int) -> dict:
+    return dict(read_cache.cached_value(DB_PATH, 'student_stats', ('study_sessions',), (student_id,),
+                                        lambda: _load_student_stats(student_id)))
+
+
+def _load_student_stats(student_id: int) -> dict:
     con = get_connection()
 
     total_row = con.execute(
@@ -291,6 +589,7 @@ def update_target_university(student_id: int, university: str, department: str):
     )
     con.commit()
     con.close()
+    read_cache.bump('students')
 
 
 # ── 학습 세션 ────────────────────────────────────────────────
@@ -307,25 +606,42 @@ def create_study_session(student_id, subject, grade, page_start, page_end,
     session_id = cur.lastrowid
     con.commit()
     con.close()
+    read_cache.bump('study_sessions')
     return session_id
 
 
+def update_session_total(session_id: int, total_questions: int):
+    con = get_connection()
+    con.execute("UPDATE study_sessions SET total_questions=? WHERE id=?", (total_questions, session_id))
+    con.commit()
+    con.close()
+    read_cache.bump('study_sessions')
+
+
+def delete_study_session(session_id: int):
+    con = get_connection()
+    content_ids = [r[0] for r in con.execute(
+        "SELECT content_id FROM session_questions WHERE session_id=?", (session_id,)
+    ).fetchall()]
+    con.execute("DELETE FROM session_questions WHERE session_id=?", (session_id,))
+    _release_contents(con, content_ids)
+    con.execute("DELETE FROM study_sessions WHERE id=?", (session_id,))
+    con.commit()
+    con.close()
+    read_cache.bump('questions', 'study_sessions')
+
+
 def save_questions(session_id: int, questions: list):
     con = get_connection()
     for q in questions:
+        content_id = _content_id(con, q.get("question_text", ""), q.get("answer", ""), q.get("explanation", ""))
         con.execute(
-            """INSERT INTO questions (session_id, question_number, question_text, answer, explanation)
-               VALUES (?,?,?,?,?)""",
-            (
-                session_id,
-                q.get("question_number", 0),
-                q.get("question_text", ""),
-                q.get("answer", ""),
-                q.get("explanation", ""),
-            )
+            "INSERT INTO session_questions (session_id, question_number, content_id) VALUES (?,?,?)",
+            (session_id, q.get("question_number", 0), content_id)
         )
     con.commit()
     con.close()
+    read_cache.bump('questions')
 
 
 def get_session_questions(session_id: int) -> list:
@@ -346,6 +662,7 @@ def submit_answers(session_id: int, user_answers: dict) -> int:
     ).fetchall()
 
     correct_count = 0
+    graded = []
     for q in questions:
         num = q["question_number"]
         user_ans = str(user_answers.get(num, "")).strip()
@@ -353,8 +670,9 @@ def submit_answers(session_id: int, user_answers: dict) -> int:
         is_correct = 1 if user_ans == correct_ans else 0
         if is_correct:
             correct_count += 1
+        graded.append((q["id"], is_correct))
         con.execute(
-            "UPDATE questions SET is_correct=? WHERE id=?",
+            "UPDATE session_questions SET is_correct=? WHERE id=?",
             (is_correct, q["id"])
         )
 
@@ -380,22 +698,394 @@ def submit_answers(session_id: int, user_answers: dict) -> int:
               total_correct = total_correct + excluded.total_correct,
               updated_at    = CURRENT_TIMESTAMP
         """, (sid, score, correct_count))
+        _schedule_reviews(con, sid, graded)
 
     con.commit()
     con.close()
+    read_cache.bump('questions', 'study_sessions', 'rank_cache', 'review_state')
     return correct_count
 
 
 def get_study_history(student_id: int) -> list:
-    con = get_connection()
-    rows = con.execute(
+    return read_cache.cached_rows(DB_PATH, 'study_history', ('study_sessions',), (student_id,),
+                                  lambda: _query_rows(
         "SELECT * FROM study_sessions WHERE student_id=? ORDER BY created_at DESC",
-        (student_id,)
-    ).fetchall()
+        (student_id,)))
+
+
+# ── 목록 페이지 (키셋 커서: 마지막 행의 정렬 키, 다음 페이지가 없으면 None) ──
+
+def get_study_history_page(student_id: int, limit: int = 20, cursor=None):
+    """학습 이력 한 페이지 (최근 순). 반환: (행 리스트, 다음 커서)"""
+    return cached_page(DB_PATH, 'study_history_page', ('study_sessions',), (student_id,), limit, cursor,
+                       lambda: keyset_page(
+        _query_rows, "SELECT * FROM study_sessions WHERE student_id=?", (student_id,),
+        [("created_at", "created_at"), ("id", "id")], limit, cursor))
+
+
+def get_wrong_notes_page(student_id: int, subject: str = None, limit: int = 20, cursor=None):
+    """오답 노트 한 페이지 (최근 세션 순, 복습 세션 복사본 제외). 반환: (행 리스트, 다음 커서)"""
+    sql = """
+        SELECT q.id, q.question_number, c.question_text, c.answer, c.explanation,
+               ss.subject, ss.grade, substr(ss.created_at,1,10) AS study_date,
+               ss.created_at AS session_created_at, ss.id AS session_id
+        FROM study_sessions ss
+        JOIN session_questions q ON q.session_id = ss.id
+        JOIN question_content c ON c.id = q.content_id
+        WHERE ss.student_id=? AND q.is_correct=0
+          AND q.id NOT IN (SELECT question_id FROM retry_links)
+    """
+    params = [student_id]
+    if subject:
+        sql += " AND ss.subject=?"
+        params.append(subject)
+    return cached_page(DB_PATH, 'wrong_notes_page', ('questions', 'study_sessions'), (student_id, subject),
+                       limit, cursor, lambda: keyset_page(
+        _query_rows, sql, params,
+        [("ss.created_at", "session_created_at"), ("ss.id", "session_id"), ("q.id", "id")], limit, cursor))
+
+
+def count_wrong_notes(student_id: int) -> dict:
+    """과목별 오답 수 (오답 노트 탭 표시용, 복습 세션 복사본 제외)."""
+    return dict(read_cache.cached_value(DB_PATH, 'wrong_note_counts', ('questions', 'study_sessions'), (student_id,),
+                                        lambda: tuple((r[0], r[1]) for r in _query_rows("""
+        SELECT ss.subject, COUNT(*)
+        FROM study_sessions ss JOIN session_questions q ON q.session_id = ss.id
+        WHERE ss.student_id=? AND q.is_correct=0
+          AND q.id NOT IN (SELECT question_id FROM retry_links)
+        GROUP BY ss.subject
+    """, (student_id,)))))
+
+
+# ── 오답 복습 세션 ───────────────────────────────────────────
+# AI 생성 없이 저장된 오답 문항을 복사해 새 학습 세션을 만든다 (submit_answers 로 채점).
+# 같은 문제를 여러 번 복습해도 원본 문항 기준으로 한 번만 뽑히고,
+# 가장 최근에 틀린 문제부터 정렬된다.
+
+RETRY_EXAM_TYPE = "오답복습"
+
+
+def get_wrong_question_roots(student_id: int, subject: str = None, date_from: str = None,
+                             date_to: str = None, limit: int = None) -> list:
+    """원본 오답 문항 목록 (최근에 틀린 순). 복습 세션에서 다시 틀린 기록도 원본으로 합산."""
+    sql = """
+        SELECT root.id, root.content_id, root.question_text, root.answer, root.explanation,
+               rs.subject, rs.grade, MAX(ss.created_at) AS last_wrong_at, COUNT(*) AS wrong_count
+        FROM session_questions q
+        JOIN study_sessions ss ON ss.id = q.session_id
+        LEFT JOIN retry_links rl ON rl.question_id = q.id
+        JOIN questions root ON root.id = COALESCE(rl.source_question_id, q.id)
+        JOIN study_sessions rs ON rs.id = root.session_id
+        WHERE ss.student_id = ? AND q.is_correct = 0
+    """
+    params = [student_id]
+    if subject:
+        sql += " AND rs.subject = ?"
+        params.append(subject)
+    if date_from:
+        sql += " AND date(ss.created_at) >= date(?)"
+        params.append(date_from)
+    if date_to:
+        sql += " AND date(ss.created_at) <= date(?)"
+        params.append(date_to)
+    sql += " GROUP BY root.id ORDER BY last_wrong_at DESC, root.id DESC"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    return [dict(r) for r in _query_rows(sql, params)]
+
+
+def create_retry_session(student_id: int, subject: str = None, date_from: str = None,
+                         date_to: str = None, limit: int = 10, question_ids: list = None):
+    """
+    오답 복습 세션 생성 후 session_id 반환 (대상 문항이 없으면 None).
+    question_ids 를 주면 해당 원본 문항만, 아니면 필터 조건에 맞는 최근 오답 limit 개.
+    """
+    if question_ids:
+        con = get_connection()
+        marks = ",".join("?" * len(question_ids))
+        roots = [dict(r) for r in con.execute(f"""
+            SELECT root.id, root.content_id, root.question_text, root.answer, root.explanation, rs.subject, rs.grade
+            FROM questions root JOIN study_sessions rs ON rs.id = root.session_id
+            WHERE rs.student_id = ? AND root.id IN (
+                SELECT COALESCE(rl.source_question_id, q.id) FROM session_questions q
+                LEFT JOIN retry_links rl ON rl.question_id = q.id WHERE q.id IN ({marks})
+            )
+        """, [student_id, *question_ids]).fetchall()]
+        con.close()
+    else:
+        roots = get_wrong_question_roots(student_id, subject, date_from, date_to, limit)
+    if not roots:
+        return None
+
+    subjects = {r["subject"] for r in roots}
+    session_subject = subject or (roots[0]["subject"] if len(subjects) == 1 else "혼합")
+    con = get_connection()
+    try:
+        cur = con.execute(
+            """INSERT INTO study_sessions
+               (student_id, subject, grade, page_start, page_end, difficulty, exam_type, total_questions)
+               VALUES (?,?,?,?,?,?,?,?)""",
+            (student_id, session_subject, roots[0]["grade"], None, None, "복습", RETRY_EXAM_TYPE, len(roots))
+        )
+        session_id = cur.lastrowid
+        for number, r in enumerate(roots, 1):
+            cur = con.execute(   # 본문은 원본과 같은 content_id 를 그대로 공유
+                "INSERT INTO session_questions (session_id, question_number, content_id) VALUES (?,?,?)",
+                (session_id, number, r["content_id"])
+            )
+            con.execute("INSERT INTO retry_links (question_id, source_question_id) VALUES (?,?)",
+                        (cur.lastrowid, r["id"]))
+        con.commit()
+    finally:
+        con.close()
+    read_cache.bump('study_sessions', 'questions')
+    return session_id
+
+
+# ── 오답 간격 반복 (Leitner 상자 + SM-2) ─────────────────────
+# 처음 틀린 문항은 다음 날 복습 예정(상자 1). 복습 세션에서 맞히면 상자를 올리고
+# 간격을 ease 배로 늘리며, 다시 틀리면 상자 1 로 돌아가고 ease 를 낮춘다.
+# "오늘 복습" 조회는 (student_id, due_date) 인덱스 범위 검색이라 누적 문항 수와 무관하다.
+
+REVIEW_MAX_BOX = 5
+REVIEW_MIN_EASE = 1.3
+REVIEW_MAX_EASE = 3.0
+
+
+def next_review_state(state, is_correct: int, today: datetime.date = None) -> dict:
+    """현재 상태(None 이면 신규)와 채점 결과로 다음 복습 상태 계산."""
+    today = today or datetime.date.today()
+    state = dict(state) if state else {'box': 0, 'ease': 2.5, 'interval_days': 0, 'reviews': 0, 'lapses': 0}
+    if is_correct:
+        box = min(state['box'] + 1, REVIEW_MAX_BOX)
+        ease = min(state['ease'] + 0.1, REVIEW_MAX_EASE)
+        interval = max(state['interval_days'] + 1, round(state['interval_days'] * state['ease']))
+        lapses = state['lapses']
+    else:
+        box = 1
+        ease = max(state['ease'] - 0.2, REVIEW_MIN_EASE) if state['box'] else state['ease']
+        interval = 1
+        lapses = state['lapses'] + (1 if state['box'] else 0)
+    return {
+        'box': box, 'ease': round(ease, 2), 'interval_days': interval,
+        'due_date': (today + datetime.timedelta(days=interval)).isoformat(),
+        'reviews': state['reviews'] + (1 if state['box'] else 0), 'lapses': lapses,
+    }
+
+
+def _schedule_reviews(con, student_id: int, graded: list):
+    """submit_answers 안에서 호출: 오답은 새로 등록, 복습 문항은 원본 상태를 갱신."""
+    if not graded:
+        return
+    ids = [qid for qid, _ in graded]
+    marks = ",".join("?" * len(ids))
+    roots = dict(con.execute(
+        f"SELECT question_id, source_question_id FROM retry_links WHERE question_id IN ({marks})", ids
+    ).fetchall())
+    targets = {}
+    for qid, is_correct in graded:
+        if qid in roots:
+            targets[roots[qid]] = is_correct
+        elif not is_correct:
+            targets[qid] = 0   # 일반 세션은 틀린 문항만 복습 대상
+    if not targets:
+        return
+    marks = ",".join("?" * len(targets))
+    current = {r["question_id"]: r for r in con.execute(
+        f"SELECT * FROM review_state WHERE question_id IN ({marks})", list(targets)
+    ).fetchall()}
+    for root_id, is_correct in targets.items():
+        nxt = next_review_state(current.get(root_id), is_correct)
+        con.execute("""
+            INSERT INTO review_state
+                (question_id, student_id, box, ease, interval_days, due_date, reviews, lapses, updated_at)
+            VALUES (?,?,?,?,?,?,?,?,CURRENT_TIMESTAMP)
+            ON CONFLICT(question_id) DO UPDATE SET
+                box=excluded.box, ease=excluded.ease, interval_days=excluded.interval_days,
+                due_date=excluded.due_date, reviews=excluded.reviews, lapses=excluded.lapses,
+                updated_at=CURRENT_TIMESTAMP
+        """, (root_id, student_id, nxt['box'], nxt['ease'], nxt['interval_days'], nxt['due_date'],
+              nxt['reviews'], nxt['lapses']))
+
+
+def get_due_reviews(student_id: int, on_date: str = None, limit: int = 20) -> list:
+    """on_date(기본 오늘)까지 복습 예정인 원본 오답 문항 (오래 밀린 순)."""
+    on_date = on_date or datetime.date.today().isoformat()
+    return _query_rows("""
+        SELECT rv.question_id AS id, rv.box, rv.ease, rv.interval_days, rv.due_date, rv.lapses,
+               q.question_text, q.answer, q.explanation, ss.subject, ss.grade
+        FROM review_state rv
+        JOIN questions q ON q.id = rv.question_id
+        JOIN study_sessions ss ON ss.id = q.session_id
+        WHERE rv.student_id = ? AND rv.due_date <= ?
+        ORDER BY rv.due_date, rv.question_id
+        LIMIT ?
+    """, (student_id, on_date, int(limit)))
+
+
+def count_due_reviews(student_id: int, on_date: str = None) -> int:
+    on_date = on_date or datetime.date.today().isoformat()
+    con = get_connection()
+    n = con.execute("SELECT COUNT(*) FROM review_state WHERE student_id=? AND due_date<=?",
+                    (student_id, on_date)).fetchone()[0]
+    con.close()
+    return n
+
+
+def create_due_review_session(student_id: int, limit: int = 20):
+    """오늘 복습 예정 문항으로 오답 복습 세션 생성 (없으면 None)."""
+    due = get_due_reviews(student_id, limit=limit)
+    if not due:
+        return None
+    return create_retry_session(student_id, question_ids=[r["id"] for r in due])
+
+
+# ── 문제 은행 ────────────────────────────────────────────────
+
+def make_bank_key(subject, grade, page_start, page_end, difficulty, exam_type) -> str:
+    return f"{subject}|{grade}|{int(page_start)}-{int(page_end)}|{difficulty}|{exam_type}"
+
+
+def question_content_hash(question_text, answer) -> str:
+    norm = " ".join(str(question_text or "").split()) + "\x1f" + " ".join(str(answer or "").split())
+    return hashlib.sha256(norm.encode("utf-8")).hexdigest()
+
+
+def bank_add_questions(bank_key: str, questions: list) -> list:
+    """문제를 은행에 저장(이미 있으면 무시)하고 각 문제의 content_hash 목록을 반환."""
+    hashes = []
+    rows = []
+    for q in questions:
+        h = question_content_hash(q.get("question_text"), q.get("answer"))
+        hashes.append(h)
+        rows.append((bank_key, h, q.get("question_text", ""), q.get("answer", ""), q.get("explanation", "")))
+    con = get_connection()
+    con.executemany(
+        """INSERT OR IGNORE INTO question_bank (bank_key, content_hash, question_text, answer, explanation)
+           VALUES (?,?,?,?,?)""",
+        rows
+    )
+    con.commit()
+    con.close()
+    read_cache.bump('question_bank')
+    return hashes
+
+
+def bank_get_unseen(student_id: int, bank_key: str, limit: int) -> list:
+    """학생이 아직 받지 않은 문제를 덜 출제된 순으로 반환."""
+    con = get_connection()
+    rows = con.execute("""
+        SELECT b.* FROM question_bank b
+        WHERE b.bank_key=?
+          AND NOT EXISTS (
+              SELECT 1 FROM question_bank_seen s
+              WHERE s.student_id=? AND s.content_hash=b.content_hash
+          )
+        ORDER BY b.served_count, RANDOM()
+        LIMIT ?
+    """, (bank_key, student_id, limit)).fetchall()
     con.close()
     return [dict(r) for r in rows]
 
 
+def bank_mark_served(student_id: int, bank_key: str, content_hashes: list):
+    con = get_connection()
+    con.executemany(
+        "INSERT OR IGNORE INTO question_bank_seen (student_id, content_hash) VALUES (?,?)",
+        [(student_id, h) for h in content_hashes]
+    )
+    con.executemany(
+        "UPDATE question_bank SET served_count = served_count + 1 WHERE bank_key=? AND content_hash=?",
+        [(bank_key, h) for h in content_hashes]
+    )
+    con.commit()
+    con.close()
+    read_cache.bump('question_bank', 'question_bank_seen')
+
+
+def bank_pool_sizes() -> list:
+    con = get_connection()
+    rows = con.execute("""
+        SELECT bank_key, COUNT(*) AS questions, COALESCE(SUM(served_count),0) AS served
+        FROM question_bank GROUP BY bank_key ORDER BY served DESC
+    """).fetchall()
+    con.close()
+    return [dict(r) for r in rows]
+
+
+# ── 다음 세트 미리 생성 ──────────────────────────────────────
+
+def expire_prefetched_sets(student_id: int = None):
+    """만료 시각이 지난 대기 세트를 expired 로, 하루 지난 종료 세트는 삭제."""
+    con = get_connection()
+    now = datetime.datetime.now().isoformat(sep=" ", timespec="seconds")
+    sql = "UPDATE prefetched_sets SET status='expired' WHERE status='pending' AND expires_at < ?"
+    params = [now]
+    if student_id is not None:
+        sql += " AND student_id=?"
+        params.append(student_id)
+    con.execute(sql, params)
+    con.execute(
+        "DELETE FROM prefetched_sets WHERE status!='pending' AND created_at < datetime('now', '-1 day')"
+    )
+    con.commit()
+    con.close()
+
+
+def save_prefetched_set(student_id, bank_key, subject, grade, page_start, page_end,
+                        difficulty, exam_type, questions: list, ttl_seconds: int) -> int:
+    """학생당 대기 세트는 1개만 유지 (새 세트가 들어오면 이전 대기분은 expired)."""
+    expires_at = (datetime.datetime.now() + datetime.timedelta(seconds=ttl_seconds)).isoformat(
+        sep=" ", timespec="seconds")
+    con = get_connection()
+    con.execute(
+        "UPDATE prefetched_sets SET status='expired' WHERE student_id=? AND status='pending'",
+        (student_id,)
+    )
+    cur = con.execute(
+        """INSERT INTO prefetched_sets
+           (student_id, bank_key, subject, grade, page_start, page_end, difficulty, exam_type,
+            num_questions, questions_json, expires_at)
+           VALUES (?,?,?,?,?,?,?,?,?,?,?)""",
+        (student_id, bank_key, subject, grade, page_start, page_end, difficulty, exam_type,
+         len(questions), json.dumps(questions, ensure_ascii=False), expires_at)
+    )
+    prefetch_id = cur.lastrowid
+    con.commit()
+    con.close()
+    return prefetch_id
+
+
+def get_pending_prefetch(student_id: int):
+    """만료되지 않은 대기 세트 (없으면 None). questions 는 리스트로 풀어서 반환."""
+    con = get_connection()
+    row = con.execute(
+        """SELECT * FROM prefetched_sets
+           WHERE student_id=? AND status='pending' AND expires_at >= ?
+           ORDER BY id DESC LIMIT 1""",
+        (student_id, datetime.datetime.now().isoformat(sep=" ", timespec="seconds"))
+    ).fetchone()
+    con.close()
+    if not row:
+        return None
+    out = dict(row)
+    out["questions"] = json.loads(out.pop("questions_json") or "[]")
+    return out
+
+
+def claim_prefetched_set(prefetch_id: int) -> bool:
+    """대기 세트를 사용 처리. 이미 사용/만료됐으면 False (동시 클릭 방지)."""
+    con = get_connection()
+    cur = con.execute(
+        "UPDATE prefetched_sets SET status='used' WHERE id=? AND status='pending'",
+        (prefetch_id,)
+    )
+    con.commit()
+    con.close()
+    return cur.rowcount == 1
+
+
 # ── 심리 테스트 ──────────────────────────────────────────────
 
 def save_psychological_test(student_id: int, answers: dict):
@@ -410,34 +1100,191 @@ def save_psychological_test(student_id: int, answers: dict):
     )
     con.commit()
     con.close()
+    read_cache.bump('psychological_tests')
 
 
 # ── 검색 이력(단어장) ─────────────────────────────────────────
 
 def save_search_history(student_id: int, subject: str, search_term: str, result_text: str):
+    """단어장에 저장. 같은 (과목, 용어)의 공용 설명이 있으면 그것을 가리키고 사본은 만들지 않는다."""
     con = get_connection()
+    definition_id = _definition_id(con, subject, search_term, result_text)
     con.execute(
-        "INSERT INTO search_history (student_id, subject, search_term, result_text) VALUES (?,?,?,?)",
-        (student_id, subject, search_term, result_text)
+        "INSERT INTO student_vocabulary (student_id, subject, search_term, definition_id) VALUES (?,?,?,?)",
+        (student_id, subject, search_term, definition_id)
     )
     con.commit()
     con.close()
+    read_cache.bump('search_history')
 
 
-def get_search_history(student_id: int, subject: str = None) -> list:
+def get_definition(subject: str, term: str):
+    """API 로 받아 둔 공용 설명 (없으면 None). 읽기 전용 — 여기서 쓰면 read_cache 전체가 무효화된다."""
+    con = get_connection()
+    row = con.execute(
+        "SELECT definition FROM definitions WHERE subject=? AND normalized_term=? AND source='ai'",
+        (subject or "", normalize_term(term))
+    ).fetchone()
+    con.close()
+    return row["definition"] if row else None
+
+
+def save_definition(subject: str, term: str, definition: str):
+    """API 로 받은 설명을 공용 저장소에 기록 (이미 AI 설명이 있으면 유지)."""
+    if not definition or definition.startswith(NON_DEFINITION_PREFIXES):
+        return
     con = get_connection()
+    _definition_id(con, subject, term, definition, source='ai')
+    con.commit()
+    con.close()
+    read_cache.bump('search_history')
+
+
+def get_search_history(student_id: int, subject: str = None) -> list:
     if subject:
-        rows = con.execute(
+        loader = lambda: _query_rows(
             "SELECT * FROM search_history WHERE student_id=? AND subject=? ORDER BY created_at DESC",
-            (student_id, subject)
-        ).fetchall()
+            (student_id, subject))
     else:
-        rows = con.execute(
+        loader = lambda: _query_rows(
             "SELECT * FROM search_history WHERE student_id=? ORDER BY created_at DESC",
-            (student_id,)
-        ).fetchall()
-    con.close()
-    return [dict(r) for r in rows]
+            (student_id,))
+    return read_cache.cached_rows(DB_PATH, 'search_history', ('search_history',), (student_id, subject), loader)
+
+
+def get_search_history_page(student_id: int, subject: str = None, limit: int = 20, cursor=None):
+    """단어장 한 페이지 (최근 순). 반환: (행 리스트, 다음 커서)"""
+    sql = """
+        SELECT v.id, v.student_id, v.subject, v.search_term, d.definition AS result_text, v.created_at,
+               v.definition_id
+        FROM student_vocabulary v
+        LEFT JOIN definitions d ON d.id = v.definition_id
+        WHERE v.student_id=?
+    """
+    params = [student_id]
+    if subject:
+        sql += " AND v.subject=?"
+        params.append(subject)
+    return cached_page(DB_PATH, 'search_history_page', ('search_history',), (student_id, subject), limit, cursor,
+                       lambda: keyset_page(
+        _query_rows, sql, params, [("v.created_at", "created_at"), ("v.id", "id")], limit, cursor))
+
+
+# ── 전문 검색 ────────────────────────────────────────────────
+# 검색어를 공백으로 나눠 모두 포함(AND)하는 행을 찾는다.
+# 3글자 이상 단어는 FTS5 trigram 색인으로 bm25 순위를 매기고,
+# 2글자 이하 단어는 색인으로 찾을 수 없으므로 좁혀진 결과(또는 학생 본인 행)에 LIKE 로 거른다.
+# 끝의 * (접두 검색 표기)는 trigram 이 이미 부분 문자열 일치라 그대로 떼어낸다.
+
+def _split_search_terms(query: str):
+    """검색어 → (trigram 색인용 3글자 이상 단어, 2글자 이하 단어)."""
+    terms = [t.strip('*"') for t in str(query or '').split()]
+    terms = [t for t in terms if t]
+    return [t for t in terms if len(t) >= 3], [t for t in terms if len(t) < 3]
+
+
+def _like_filter(cols, terms):
+    sql, params = "", []
+    for t in terms:
+        sql += " AND (" + " OR ".join(f"t.{c} LIKE ?" for c in cols) + ")"
+        params += [f"%{t}%"] * len(cols)
+    return sql, params
+
+
+def _like_search(table, cols, join_sql, select_sql, filters, params, terms, limit):
+    """색인 없이 LIKE 로만 찾기 (FTS5 미지원 또는 MATCH 실패 시)."""
+    like_sql, like_params = _like_filter(cols, terms)
+    sql = f"""
+        SELECT {select_sql}, substr(t.{cols[-1]}, 1, 80) AS snippet, 0 AS score
+        FROM {table} t {join_sql}
+        WHERE 1=1 {filters} {like_sql}
+        ORDER BY t.id DESC LIMIT ?
+    """
+    return [dict(r) for r in _query_rows(sql, [*params, *like_params, int(limit)])]
+
+
+def _full_text_search(fts, table, cols, weights, join_sql, select_sql, filters, params,
+                      query, limit, rowid_col='id'):
+    """공통 검색 실행. FTS 색인이 없으면(FTS5 미지원) 전부 LIKE 로 대체."""
+    long_terms, short_terms = _split_search_terms(query)
+    if not long_terms and not short_terms:
+        return []
+
+    if long_terms:
+        match = " AND ".join('"' + t.replace('"', '""') + '"' for t in long_terms)
+        like_sql, like_params = _like_filter(cols, short_terms)
+        sql = f"""
+            SELECT {select_sql}, snippet({fts}, -1, '**', '**', '…', 12) AS snippet,
+                   bm25({fts}, {', '.join(str(w) for w in weights)}) AS score
+            FROM {fts} JOIN {table} t ON t.{rowid_col} = {fts}.rowid {join_sql}
+            WHERE {fts} MATCH ? {filters} {like_sql}
+            ORDER BY score, t.id DESC LIMIT ?
+        """
+        try:
+            return [dict(r) for r in _query_rows(sql, [match, *params, *like_params, int(limit)])]
+        except sqlite3.OperationalError:
+            pass
+
+    return _like_search(table, cols, join_sql, select_sql, filters, params, long_terms + short_terms, limit)
+
+
+def search_vocabulary(student_id: int, query: str, subject: str = None, limit: int = 50) -> list:
+    """
+    단어장 검색. 학생 본인 검색어(vocabulary_fts) 또는 공용 용어/설명(definitions_fts) 중
+    하나라도 일치하면 찾고, 검색어·용어 일치가 설명 일치보다 높은 순위.
+    공용 용어는 처음 저장한 사람의 표기라 본인 검색어도 함께 색인한다.
+    """
+    filters, params = "AND t.student_id = ?", [student_id]
+    if subject:
+        filters += " AND t.subject = ?"
+        params.append(subject)
+    select_sql = "t.id, t.subject, t.search_term, t.result_text, t.created_at"
+    cols = ('search_term', 'result_text')
+
+    long_terms, short_terms = _split_search_terms(query)
+    if not long_terms and not short_terms:
+        return []
+
+    if long_terms:
+        match = " AND ".join('"' + t.replace('"', '""') + '"' for t in long_terms)
+        like_sql, like_params = _like_filter(cols, short_terms)
+        sql = f"""
+            SELECT {select_sql},
+                   COALESCE(d.snippet, substr(t.result_text, 1, 80)) AS snippet,
+                   MIN(COALESCE(v.score, 0), COALESCE(d.score, 0)) AS score
+            FROM search_history t
+            LEFT JOIN (SELECT rowid, bm25(vocabulary_fts, 10.0) AS score
+                       FROM vocabulary_fts WHERE vocabulary_fts MATCH ?) v ON v.rowid = t.id
+            LEFT JOIN (SELECT rowid, snippet(definitions_fts, -1, '**', '**', '…', 12) AS snippet,
+                              bm25(definitions_fts, 10.0, 1.0) AS score
+                       FROM definitions_fts WHERE definitions_fts MATCH ?) d ON d.rowid = t.definition_id
+            WHERE (v.rowid IS NOT NULL OR d.rowid IS NOT NULL) {filters} {like_sql}
+            ORDER BY score, t.id DESC LIMIT ?
+        """
+        try:
+            return [dict(r) for r in _query_rows(sql, [match, match, *params, *like_params, int(limit)])]
+        except sqlite3.OperationalError:
+            pass
+
+    return _like_search('search_history', cols, "", select_sql, filters, params, long_terms + short_terms, limit)
+
+
+def search_questions(student_id: int, query: str, subject: str = None, wrong_only: bool = False,
+                     limit: int = 50) -> list:
+    """지난 문제(문제/해설) 검색. 오답 복습 복사본은 제외."""
+    filters, params = "AND ss.student_id = ?", [student_id]
+    if subject:
+        filters += " AND ss.subject = ?"
+        params.append(subject)
+    if wrong_only:
+        filters += " AND t.is_correct = 0"
+    filters += " AND t.id NOT IN (SELECT question_id FROM retry_links)"
+    return _full_text_search(
+        'questions_fts', 'questions', ('question_text', 'explanation'), (5.0, 1.0),
+        "JOIN study_sessions ss ON ss.id = t.session_id",
+        "t.id, t.session_id, t.question_number, t.question_text, t.answer, t.explanation, t.is_correct, "
+        "ss.subject, ss.grade, ss.created_at",
+        filters, params, query, limit, rowid_col='content_id')
 
 
 # ── 순위 ────────────────────────────────────────────────────
@@ -0,0 +1,224 @@
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ─────────────────────────────────────────────────────────
+# 로컬 가짜 OpenAI 서버 (부하 테스트용, 크레딧 소비 없음)
+#
+# - POST /v1/chat/completions (stream 포함) 만 흉내 냄
+# - 응답 지연 분포: fixed:S | uniform:A,B | normal:MU,SD | lognormal:MU,SIGMA (초)
+#   스트리밍은 첫 토큰까지 위 지연, 이후 조각마다 --chunk-delay
+# - 429 주입: 확률(--error-rate) 또는 동시 요청 상한(--max-concurrent) 초과 시
+# - 응답 본문: 문제 생성 프롬프트면 "문제 N: / 정답: / 해설:" 형식,
+#   json_schema 응답 형식이면 필수 키를 채운 JSON, 그 외는 짧은 설명문
+#
+# 실행: python fake_openai_server.py --port 8765 --latency lognormal:0.0,0.5 --error-rate 0.02
+# 앱/부하 테스트 연결: OPENAI_BASE_URL=http://127.0.0.1:8765/v1 (키가 없으면 임시 키 사용)
+# ─────────────────────────────────────────────────────────
+
+DEFAULT_PORT = 8765
+
+
+def parse_latency(spec):
+    """'lognormal:0.0,0.5' → 호출할 때마다 지연(초)을 뽑는 함수."""
+    kind, _, args = (spec or 'fixed:0').partition(':')
+    vals = [float(x) for x in args.split(',') if x.strip()] or [0.0]
+    if kind == 'fixed':
+        return lambda: vals[0]
+    if kind == 'uniform':
+        return lambda: random.uniform(vals[0], vals[1])
+    if kind == 'normal':
+        return lambda: max(0.0, random.gauss(vals[0], vals[1]))
+    if kind == 'lognormal':
+        return lambda: random.lognormvariate(vals[0], vals[1])
+    raise ValueError(f"알 수 없는 지연 분포: {spec}")
+
+
+def _estimate_tokens(text):
+    return max(1, math.ceil(len(text) / 2))
+
+
+def canned_questions(n):
+    blocks = []
+    for i in range(1, n + 1):
+        tag = uuid.uuid4().hex[:6]
+        blocks.append(
+            f"문제 {i}:\n다음 중 옳은 것을 고르시오. (연습 문항 {tag})\n"
+            f"① 보기 1  ② 보기 2  ③ 보기 3  ④ 보기 4\n"
+            f"정답: {random.randint(1, 4)}\n"
+            f"해설: 가짜 서버가 만든 해설입니다. 문항 {tag} 의 핵심 개념을 정리합니다.\n"
+        )
+    return "\n".join(blocks)
+
+
+def canned_content(body):
+    messages = body.get('messages') or []
+    prompt = "\n".join(str(m.get('content', '')) for m in messages)
+
+    rf = body.get('response_format') or {}
+    if rf.get('type') == 'json_schema':
+        schema = (rf.get('json_schema') or {}).get('schema') or {}
+        keys = schema.get('required') or list((schema.get('properties') or {}).keys())
+        return json.dumps({k: f"[{k}] 가짜 서버 응답입니다.\n- 오늘은 루틴 유지가 핵심입니다." for k in keys},
+                          ensure_ascii=False)
+
+    m = re.search(r'정확히\s*(\d+)\s*개', prompt)
+    if m and '문제' in prompt:
+        return canned_questions(int(m.group(1)))
+    return "가짜 서버 응답입니다. 핵심 개념을 세 문장으로 요약하면 다음과 같습니다. 첫째, 정의. 둘째, 예시. 셋째, 주의점."
+
+
+class FakeOpenAI:
+    def __init__(self, latency='fixed:0.3', chunk_delay=0.02, error_rate=0.0, max_concurrent=0):
+        self.latency = parse_latency(latency)
+        self.chunk_delay = chunk_delay
+        self.error_rate = error_rate
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'streams': 0, 'rate_limited': 0}
+
+    def enter(self):
+        """429 를 돌려줘야 하면 False."""
+        with self.lock:
+            self.stats['requests'] += 1
+            over = self.max_concurrent and self.in_flight >= self.max_concurrent
+            if over or random.random() < self.error_rate:
+                self.stats['rate_limited'] += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _json(self, status, payload, headers=None):
+            data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip('/').endswith('/stats'):
+                with fake.lock:
+                    self._json(200, dict(fake.stats, in_flight=fake.in_flight))
+                return
+            self._json(404, {'error': {'message': 'not found'}})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b'{}')
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self._json(404, {'error': {'message': 'not found'}})
+                return
+            if not fake.enter():
+                self._json(429, {'error': {'message': 'Rate limit reached (fake server)', 'type': 'requests',
+                                           'code': 'rate_limit_exceeded'}}, {'Retry-After': '1'})
+                return
+            try:
+                time.sleep(fake.latency())
+                content = canned_content(body)
+                if body.get('stream'):
+                    self._stream(body, content)
+                else:
+                    self._complete(body, content)
+            finally:
+                fake.leave()
+
+        def _usage(self, body, content):
+            prompt = "".join(str(m.get('content', '')) for m in body.get('messages') or [])
+            p, c = _estimate_tokens(prompt), _estimate_tokens(content)
+            return {'prompt_tokens': p, 'completion_tokens': c, 'total_tokens': p + c}
+
+        def _complete(self, body, content):
+            self._json(200, {
+                'id': f"chatcmpl-{uuid.uuid4().hex}",
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': body.get('model', 'fake'),
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content},
+                             'finish_reason': 'stop'}],
+                'usage': self._usage(body, content),
+            })
+
+        def _stream(self, body, content):
+            with fake.lock:
+                fake.stats['streams'] += 1
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            cid = f"chatcmpl-{uuid.uuid4().hex}"
+            base = {'id': cid, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                    'model': body.get('model', 'fake')}
+
+            def send(payload):
+                self.wfile.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+
+            try:
+                # 줄 단위(약 한 토큰 묶음)로 잘라 보냄
+                pieces = re.findall(r'[^\n]*\n|[^\n]+$', content)
+                for piece in pieces:
+                    send(dict(base, choices=[{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]))
+                    if fake.chunk_delay:
+                        time.sleep(fake.chunk_delay)
+                send(dict(base, choices=[{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]))
+                if (body.get('stream_options') or {}).get('include_usage'):
+                    send(dict(base, choices=[], usage=self._usage(body, content)))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # 클라이언트가 중간에 끊음 (필요한 문제 수를 다 받은 경우 등)
+            self.close_connection = True
+
+    return Handler
+
+
+def serve(port=DEFAULT_PORT, host='127.0.0.1', background=False, **options):
+    """서버 시작. background=True 면 데몬 스레드로 띄우고 (server, fake) 반환."""
+    fake = FakeOpenAI(**options)
+    server = ThreadingHTTPServer((host, port), make_handler(fake))
+    server.daemon_threads = True
+    if background:
+        threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+        return server, fake
+    print(f"가짜 OpenAI 서버: http://{host}:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return server, fake
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="부하 테스트용 로컬 가짜 OpenAI 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", default="fixed:0.3", help="fixed:S | uniform:A,B | normal:MU,SD | lognormal:MU,SIGMA")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="스트리밍 조각 간격(초)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="429 응답 확률 (0~1)")
+    parser.add_argument("--max-concurrent", type=int, default=0, help="동시 요청 상한 (초과 시 429, 0=무제한)")
+    args = parser.parse_args()
+    serve(args.port, args.host, latency=args.latency, chunk_delay=args.chunk_delay,
+          error_rate=args.error_rate, max_concurrent=args.max_concurrent)
@@ -0,0 +1,132 @@
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+# ─────────────────────────────────────────────────────────
+# AI 경로 부하 테스트 (가짜 OpenAI 서버 대상)
+#
+# 가상 사용자 N명이 동시에 문제 생성 / 검색 / 리포트를 호출하고
+# 지연(p50/p95/p99), 실패·대체 응답 수, 거버너 대기 현황을 출력한다.
+# 캐시/사용량/공용 설명 기록은 임시 DB 에 쌓여 실제 student_system.db 를 건드리지 않는다.
+#
+# 실행: python loadtest_ai.py --users 100 --scenario mixed --start-fake --latency lognormal:0.0,0.5
+#       (이미 띄운 서버 사용 시 OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python loadtest_ai.py ...)
+# ─────────────────────────────────────────────────────────
+
+SCENARIOS = ['questions', 'stream', 'search', 'report', 'mixed']
+FALLBACK_PREFIXES = ("[AI 응답 지연]", "[AI 사용 한도]", "검색 오류", "열심히 공부해봅시다")
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def _run_user(uid, scenario, num_questions, results, lock):
+    import ai_governor
+    import openai_helper as ai
+    import parent_ai_helper
+
+    kind = scenario if scenario != 'mixed' else ['questions', 'stream', 'search', 'report'][uid % 4]
+    started = time.perf_counter()
+    first = None
+    ok = True
+    with ai_governor.caller('student' if kind != 'report' else 'parent', uid):
+        try:
+            if kind == 'questions':
+                out = ai.generate_questions('수학', '고1', 10, 20, '보통', '중간', num_questions)
+                ok = bool(out)
+            elif kind == 'stream':
+                count = 0
+                for _ in ai.generate_questions_stream('수학', '고1', 10, 20, '보통', '중간', num_questions):
+                    count += 1
+                    if first is None:
+                        first = time.perf_counter() - started
+                ok = count > 0
+            elif kind == 'search':
+                out = ai.search_content('과학', f'광합성 {uid}')
+                ok = not str(out).startswith(FALLBACK_PREFIXES)
+            else:
+                out = parent_ai_helper.generate_ai_text(f"학부모 일간 리포트 부하 테스트 {uid}", force=True)
+                ok = bool(out)
+        except Exception:
+            ok = False
+    elapsed = time.perf_counter() - started
+    with lock:
+        results.append({'kind': kind, 'elapsed': elapsed, 'first': first, 'ok': ok})
+
+
+def run(users=100, scenario='mixed', num_questions=10, db_path=None):
+    import ai_cache
+    import ai_client
+    import ai_governor
+    import config
+    import database
+    import openai_helper as ai
+
+    db_path = db_path or os.path.join(tempfile.mkdtemp(prefix="jsd-load-"), "load.db")
+    ai_cache.DB_PATH = db_path
+    ai_governor.DB_PATH = db_path
+    database.DB_PATH = db_path      # 검색의 공용 설명 저장소
+    database.init_database()
+    config.USE_OPENAI = True
+    if not ai_client.resolve_base_url():
+        raise SystemExit("OPENAI_BASE_URL 이 없습니다. --start-fake 를 쓰거나 가짜 서버 주소를 지정하세요.")
+    ai.init_openai()
+
+    results, lock = [], threading.Lock()
+    threads = [threading.Thread(target=_run_user, args=(i + 1, scenario, num_questions, results, lock))
+               for i in range(users)]
+    wall = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - wall
+
+    print(f"사용자 {users}명 / 시나리오 {scenario} / 전체 {wall:.2f}초")
+    for kind in sorted({r['kind'] for r in results}):
+        rs = [r for r in results if r['kind'] == kind]
+        lat = [r['elapsed'] for r in rs]
+        line = (f"  {kind:<9} n={len(rs):<4} 실패/대체={sum(not r['ok'] for r in rs):<4} "
+                f"p50={_percentile(lat, 0.5):.2f}s p95={_percentile(lat, 0.95):.2f}s "
+                f"p99={_percentile(lat, 0.99):.2f}s max={max(lat):.2f}s")
+        firsts = [r['first'] for r in rs if r['first'] is not None]
+        if firsts:
+            line += f" 첫문제 p50={statistics.median(firsts):.2f}s"
+        print(line)
+    gov = ai_governor.get_status()
+    met = ai_client.get_metrics()
+    print(f"  거버너: 대기 발생 {gov['queued']}건, 평균 대기 {gov['wait_avg']}초, 대기 마감 초과 {gov['queue_timeouts']}건, "
+          f"한도 거절 {gov['budget_rejections']}건")
+    print(f"  클라이언트: 재시도 {met['retries']}건, 오류 {met['errors']}건, 브레이커 {met['breaker']['state']}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI 경로 부하 테스트")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--scenario", choices=SCENARIOS, default='mixed')
+    parser.add_argument("--questions", type=int, default=10, help="문제 생성 시 문항 수")
+    parser.add_argument("--start-fake", action="store_true", help="가짜 OpenAI 서버를 이 프로세스에서 띄움")
+    parser.add_argument("--latency", default="lognormal:-0.5,0.5")
+    parser.add_argument("--chunk-delay", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--max-concurrent", type=int, default=0)
+    args = parser.parse_args()
+
+    fake = None
+    if args.start_fake:
+        import fake_openai_server
+        server, fake = fake_openai_server.serve(0, background=True, latency=args.latency,
+                                                chunk_delay=args.chunk_delay, error_rate=args.error_rate,
+                                                max_concurrent=args.max_concurrent)
+        os.environ['OPENAI_BASE_URL'] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    run(args.users, args.scenario, args.questions)
+    if fake:
+        print(f"  가짜 서버: 요청 {fake.stats['requests']}건, 429 {fake.stats['rate_limited']}건")
@@ -2,6 +2,9 @@ import sqlite3
 import datetime
 import json
 
+import read_cache
+from pagination import keyset_page, cached_page
+
 DB_PATH = "student_system.db"
 
 
@@ -96,6 +99,40 @@ def init_naesin_database():
         UNIQUE(student_id, term_id, subject_id)
     )""")
 
+    # ── 성적 집계: 이수단위(성적 행과 같은 키) + 학기별/학생별 합계 (save_grade·verify_grade 에서 갱신) ──
+    had_grade_stats = cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='grade_term_stats'"
+    ).fetchone()
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS grade_credits (
+        student_id   INTEGER NOT NULL,
+        term_id      INTEGER NOT NULL,
+        subject_id   INTEGER NOT NULL,
+        credit_units REAL    NOT NULL CHECK(credit_units > 0),
+        PRIMARY KEY (student_id, term_id, subject_id)
+    )""")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS grade_term_stats (
+        student_id     INTEGER NOT NULL,
+        term_id        INTEGER NOT NULL,
+        grade_count    INTEGER NOT NULL,
+        grade_sum      REAL    NOT NULL,
+        credit_sum     REAL    NOT NULL,
+        weighted_sum   REAL    NOT NULL,   -- Σ 등급 × 이수단위
+        verified_count INTEGER NOT NULL,
+        PRIMARY KEY (student_id, term_id)
+    )""")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS grade_student_stats (
+        student_id     INTEGER PRIMARY KEY,
+        grade_count    INTEGER NOT NULL,
+        grade_sum      REAL    NOT NULL,
+        credit_sum     REAL    NOT NULL,
+        weighted_sum   REAL    NOT NULL,
+        verified_count INTEGER NOT NULL,
+        term_count     INTEGER NOT NULL
+    )""")
+
     cur.execute("""
     CREATE TABLE IF NOT EXISTS activity_types (
         activity_type_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -121,6 +158,7 @@ def init_naesin_database():
         tags             TEXT,
         created_at       TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_student_activities_student ON student_activities(student_id, created_at, activity_id)")
 
     cur.execute("""
     CREATE TABLE IF NOT EXISTS teacher_activity_reviews (
@@ -133,6 +171,7 @@ def init_naesin_database():
         reviewed_at TIMESTAMP,
         UNIQUE(activity_id, teacher_id)
     )""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_activity_reviews_status ON teacher_activity_reviews(teacher_id, status, activity_id)")
 
     cur.execute("""
     CREATE TABLE IF NOT EXISTS daily_learning_logs (
@@ -199,6 +238,25 @@ def init_naesin_database():
         created_at     TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )""")
 
+    # ── 학과별 컷 추세: 연도별 컷 이력에서 미리 계산 (컷 Import 때 다시 계산) ──
+    had_cutoff_trends = cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='cutoff_trends'"
+    ).fetchone()
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS cutoff_trends (
+        department_id   INTEGER NOT NULL,
+        admission_type  TEXT    NOT NULL,
+        year_count      INTEGER NOT NULL,
+        first_year      INTEGER NOT NULL,
+        last_year       INTEGER NOT NULL,
+        last_value      REAL    NOT NULL,
+        slope           REAL    NOT NULL,   -- 연간 변화량 (최소제곱, 1년뿐이면 0)
+        step_rms        REAL,               -- 연도 간 변화의 제곱평균제곱근 (1년뿐이면 NULL)
+        target_year     INTEGER NOT NULL,   -- 전형 전체 최근 연도 + 1
+        projected_value REAL    NOT NULL,
+        PRIMARY KEY (department_id, admission_type)
+    )""")
+
     cur.execute("""
     CREATE TABLE IF NOT EXISTS student_recommendation_snapshots (
         snapshot_id  INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -255,11 +313,17 @@ def init_naesin_database():
             SELECT MIN(activity_id) FROM student_activities GROUP BY student_id, activity_type_id, title
         )
     """)
+    cur.execute("""
+        DELETE FROM admissions_cutoffs WHERE cutoff_id NOT IN (
+            SELECT MIN(cutoff_id) FROM admissions_cutoffs GROUP BY department_id, admission_type, year
+        )
+    """)
     con.commit()
 
     # ── 중복 방지 UNIQUE INDEX ──
     cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_edu_students_user ON edu_students(user_id)")
     cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_edu_links_unique ON edu_student_links(student_id, user_id, relation)")
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_cutoffs_unique ON admissions_cutoffs(department_id, admission_type, year)")
     con.commit()
 
     _seed_users(cur, con)
@@ -269,9 +333,14 @@ def init_naesin_database():
     _seed_schools(cur, con)
     _seed_universities(cur, con)
     _seed_demo_data(cur, con)
+    if not had_grade_stats:
+        _refresh_grade_stats(con)       # 기존 성적으로 집계 채우기 (처음 한 번)
+    if not had_cutoff_trends:
+        _rebuild_cutoff_trends(con)     # 기존 컷 이력으로 추세 채우기 (처음 한 번)
 
     con.commit()
     con.close()
+    read_cache.clear()
 
 
 def _seed_users(cur, con):
@@ -580,6 +649,7 @@ def _seed_universities(cur, con):
 
 def _seed_demo_data(cur, con):
     today = datetime.date.today()
+    seeded_grades = False
     for student_id in [1, 2, 3]:
         subj_rows = cur.execute("SELECT subject_id FROM subjects LIMIT 8").fetchall()
         subj_ids = [r['subject_id'] for r in subj_rows]
@@ -593,6 +663,7 @@ def _seed_demo_data(cur, con):
                     "INSERT OR IGNORE INTO student_grades (student_id,term_id,subject_id,grade_level_num,entered_by) VALUES (?,?,?,?,'student')",
                     (student_id, tid, sid, g)
                 )
+                seeded_grades |= cur.rowcount > 0
         term2 = cur.execute("SELECT term_id FROM terms WHERE school_year=2024 AND grade_level=2 AND semester=2").fetchone()
         if term2:
             tid2 = term2['term_id']
@@ -603,6 +674,7 @@ def _seed_demo_data(cur, con):
                     "INSERT OR IGNORE INTO student_grades (student_id,term_id,subject_id,grade_level_num,entered_by) VALUES (?,?,?,?,'student')",
                     (student_id, tid2, sid, g)
                 )
+                seeded_grades |= cur.rowcount > 0
 
         act_type = cur.execute("SELECT activity_type_id FROM activity_types WHERE name='동아리'").fetchone()
         if act_type:
@@ -638,6 +710,8 @@ def _seed_demo_data(cur, con):
                 "INSERT OR IGNORE INTO daily_self_assessments (student_id,date,performance_level,understanding_level) VALUES (?,?,?,?)",
                 (student_id, dt, perf, under)
             )
+    if seeded_grades:
+        _refresh_grade_stats(con, [1, 2, 3])
     con.commit()
 
 
@@ -678,32 +752,88 @@ def get_linked_students(user_id: int, relation: str):
 # 과목 / 학기
 # ─────────────────────────────────────────────────────────
 
-def get_subjects():
+def _query_rows(sql, params=()):
     con = get_connection()
-    rows = con.execute("SELECT * FROM subjects WHERE is_active=1 ORDER BY subject_id").fetchall()
+    rows = con.execute(sql, params).fetchall()
     con.close()
-    return [dict(r) for r in rows]
+    return rows
+
+
+def get_subjects():
+    return read_cache.cached_rows(DB_PATH, 'subjects', ('subjects',), (), lambda: _query_rows(
+        "SELECT * FROM subjects WHERE is_active=1 ORDER BY subject_id"))
 
 
 def get_terms():
-    con = get_connection()
-    rows = con.execute("SELECT * FROM terms ORDER BY school_year DESC, grade_level, semester").fetchall()
-    con.close()
-    return [dict(r) for r in rows]
+    return read_cache.cached_rows(DB_PATH, 'terms', ('terms',), (), lambda: _query_rows(
+        "SELECT * FROM terms ORDER BY school_year DESC, grade_level, semester"))
 
 
 def get_activity_types():
-    con = get_connection()
-    rows = con.execute("SELECT * FROM activity_types WHERE is_active=1 ORDER BY activity_type_id").fetchall()
-    con.close()
-    return [dict(r) for r in rows]
+    return read_cache.cached_rows(DB_PATH, 'activity_types', ('activity_types',), (), lambda: _query_rows(
+        "SELECT * FROM activity_types WHERE is_active=1 ORDER BY activity_type_id"))
 
 
 # ─────────────────────────────────────────────────────────
 # 내신 성적 CRUD
 # ─────────────────────────────────────────────────────────
 
-def save_grade(student_id, term_id, subject_id, grade_level_num, raw_score=None, rank_in_class=None, entered_by='student'):
+DEFAULT_CREDIT_UNITS = 4      # 이수단위를 입력하지 않은 과목 (일반 과목 기본 단위)
+
+
+def _refresh_grade_stats(con, student_ids=None, term_id=None):
+    """
+    학기별 집계(term_id 를 주면 그 학기만)와 학생별 합계를 성적 행으로 다시 계산 (호출한 트랜잭션 안에서).
+    성적 색인(student_id, term_id, subject_id)으로 해당 학생·학기 행만 읽는다. student_ids=None 이면 전체.
+    """
+    if student_ids is None:
+        chunks = [None]
+    else:
+        ids = sorted(set(student_ids))
+        chunks = [ids[i:i + 500] for i in range(0, len(ids), 500)]
+
+    def where(ids, alias='', with_term=False):
+        conds, params = ["1=1"], []
+        if ids is not None:
+            conds.append(f"{alias}student_id IN ({','.join('?' * len(ids))})")
+            params += ids
+        if with_term and term_id is not None:
+            conds.append(f"{alias}term_id=?")
+            params.append(term_id)
+        return " AND ".join(conds), params
+
+    for ids in chunks:
+        cond, params = where(ids, with_term=True)
+        con.execute(f"DELETE FROM grade_term_stats WHERE {cond}", params)
+        cond, params = where(ids, 'g.', with_term=True)
+        con.execute(f"""
+            INSERT INTO grade_term_stats
+                (student_id, term_id, grade_count, grade_sum, credit_sum, weighted_sum, verified_count)
+            SELECT g.student_id, g.term_id, COUNT(*), SUM(g.grade_level_num),
+                   SUM(COALESCE(c.credit_units, {DEFAULT_CREDIT_UNITS})),
+                   SUM(g.grade_level_num * COALESCE(c.credit_units, {DEFAULT_CREDIT_UNITS})),
+                   SUM(g.verified_by_teacher)
+            FROM student_grades g
+            LEFT JOIN grade_credits c
+                   ON c.student_id = g.student_id AND c.term_id = g.term_id AND c.subject_id = g.subject_id
+            WHERE {cond}
+            GROUP BY g.student_id, g.term_id
+        """, params)
+        cond, params = where(ids)
+        con.execute(f"DELETE FROM grade_student_stats WHERE {cond}", params)
+        con.execute(f"""
+            INSERT INTO grade_student_stats
+                (student_id, grade_count, grade_sum, credit_sum, weighted_sum, verified_count, term_count)
+            SELECT student_id, SUM(grade_count), SUM(grade_sum), SUM(credit_sum), SUM(weighted_sum),
+                   SUM(verified_count), COUNT(*)
+            FROM grade_term_stats WHERE {cond}
+            GROUP BY student_id
+        """, params)
+
+
+def save_grade(student_id, term_id, subject_id, grade_level_num, raw_score=None, rank_in_class=None,
+               entered_by='student', credit_units=None):
+    """credit_units(이수단위)가 None 이면 기존 값 유지 (없으면 DEFAULT_CREDIT_UNITS 로 계산)."""
     con = get_connection()
     con.execute("""
         INSERT INTO student_grades (student_id,term_id,subject_id,grade_level_num,raw_score,rank_in_class,entered_by)
@@ -714,38 +844,57 @@ def save_grade(student_id, term_id, subject_id, grade_level_num, raw_score=None,
             rank_in_class=excluded.rank_in_class,
             entered_by=excluded.entered_by
     """, (student_id, term_id, subject_id, grade_level_num, raw_score, rank_in_class, entered_by))
+    if credit_units:
+        con.execute(
+            "INSERT OR REPLACE INTO grade_credits (student_id,term_id,subject_id,credit_units) VALUES (?,?,?,?)",
+            (student_id, term_id, subject_id, credit_units)
+        )
+    _refresh_grade_stats(con, [student_id], term_id)
     con.commit()
     con.close()
+    read_cache.bump('student_grades')
 
 
 def get_grades(student_id, term_id=None):
+    return read_cache.cached_rows(DB_PATH, 'grades', ('student_grades', 'subjects', 'terms'),
+                                  (student_id, term_id), lambda: _load_grades(student_id, term_id))
+
+
+def _load_grades(student_id, term_id):
     con = get_connection()
+    select = f"""
+        SELECT g.*, COALESCE(c.credit_units, {DEFAULT_CREDIT_UNITS}) as credit_units,
+               s.subject_name, s.category, t.school_year, t.grade_level, t.semester
+        FROM student_grades g
+        JOIN subjects s ON g.subject_id=s.subject_id
+        JOIN terms t ON g.term_id=t.term_id
+        LEFT JOIN grade_credits c
+               ON c.student_id=g.student_id AND c.term_id=g.term_id AND c.subject_id=g.subject_id
+    """
     if term_id:
-        rows = con.execute("""
-            SELECT g.*, s.subject_name, s.category, t.school_year, t.grade_level, t.semester
-            FROM student_grades g
-            JOIN subjects s ON g.subject_id=s.subject_id
-            JOIN terms t ON g.term_id=t.term_id
+        rows = con.execute(select + """
             WHERE g.student_id=? AND g.term_id=?
             ORDER BY s.subject_id
         """, (student_id, term_id)).fetchall()
     else:
-        rows = con.execute("""
-            SELECT g.*, s.subject_name, s.category, t.school_year, t.grade_level, t.semester
-            FROM student_grades g
-            JOIN subjects s ON g.subject_id=s.subject_id
-            JOIN terms t ON g.term_id=t.term_id
+        rows = con.execute(select + """
             WHERE g.student_id=?
             ORDER BY t.school_year DESC, t.grade_level, t.semester, s.subject_id
         """, (student_id,)).fetchall()
     con.close()
-    return [dict(r) for r in rows]
+    return rows
 
 
 def get_naesin_avg(student_id):
+    """이수단위 가중 내신 평균 등급 (집계 테이블 1행 조회)."""
+    return read_cache.cached_value(DB_PATH, 'naesin_avg', ('student_grades',), (student_id,),
+                                   lambda: _load_naesin_avg(student_id))
+
+
+def _load_naesin_avg(student_id):
     con = get_connection()
     row = con.execute(
-        "SELECT AVG(grade_level_num) as avg FROM student_grades WHERE student_id=?",
+        "SELECT weighted_sum / credit_sum as avg FROM grade_student_stats WHERE student_id=?",
         (student_id,)
     ).fetchone()
     con.close()
@@ -754,14 +903,48 @@ def get_naesin_avg(student_id):
     return None
 
 
+def get_naesin_avgs(student_ids):
+    """여러 학생의 내신 평균 {student_id: 평균} (성적 없는 학생은 빠짐). 학생 목록 화면용."""
+    ids = sorted(set(student_ids))
+    if not ids:
+        return {}
+    rows = read_cache.cached_rows(DB_PATH, 'naesin_avgs', ('student_grades',), (tuple(ids),),
+                                  lambda: _query_rows(f"""
+        SELECT student_id, weighted_sum / credit_sum as avg FROM grade_student_stats
+        WHERE student_id IN ({','.join('?' * len(ids))})
+    """, ids))
+    return {r['student_id']: round(r['avg'], 2) for r in rows if r['avg'] is not None}
+
+
+def get_term_gpa(student_id):
+    """
+    학기별 평균 등급 (오래된 학기부터). avg = 단순 평균, weighted_avg = 이수단위 가중 평균.
+    추이 그래프용 — 성적 행을 다시 묶지 않고 집계 테이블을 그대로 읽는다.
+    """
+    return read_cache.cached_rows(DB_PATH, 'term_gpa', ('student_grades', 'terms'), (student_id,),
+                                  lambda: _query_rows("""
+        SELECT s.term_id, t.school_year, t.grade_level, t.semester,
+               s.grade_count, s.credit_sum, s.verified_count,
+               ROUND(s.grade_sum / s.grade_count, 2) as avg,
+               ROUND(s.weighted_sum / s.credit_sum, 2) as weighted_avg
+        FROM grade_term_stats s JOIN terms t ON t.term_id = s.term_id
+        WHERE s.student_id=?
+        ORDER BY t.school_year, t.grade_level, t.semester
+    """, (student_id,)))
+
+
 def verify_grade(grade_id, teacher_id_user):
     con = get_connection()
+    row = con.execute("SELECT student_id, term_id FROM student_grades WHERE grade_id=?", (grade_id,)).fetchone()
     con.execute(
         "UPDATE student_grades SET verified_by_teacher=1, verified_at=CURRENT_TIMESTAMP WHERE grade_id=?",
         (grade_id,)
     )
+    if row:
+        _refresh_grade_stats(con, [row['student_id']], row['term_id'])
     con.commit()
     con.close()
+    read_cache.bump('student_grades')
 
 
 # ─────────────────────────────────────────────────────────
@@ -781,27 +964,41 @@ def save_activity(student_id, activity_type_id, title, summary, detail, learned,
           evidence_url, json.dumps(tags_list, ensure_ascii=False)))
     con.commit()
     con.close()
+    read_cache.bump('student_activities')
 
 
 def get_activities(student_id):
-    con = get_connection()
-    rows = con.execute("""
+    rows = read_cache.cached_rows(DB_PATH, 'activities', ('student_activities', 'activity_types'),
+                                  (student_id,), lambda: _query_rows("""
         SELECT a.*, at.name as type_name
         FROM student_activities a
         JOIN activity_types at ON a.activity_type_id=at.activity_type_id
         WHERE a.student_id=?
         ORDER BY a.created_at DESC
-    """, (student_id,)).fetchall()
-    con.close()
-    result = []
-    for r in rows:
-        d = dict(r)
-        try:
-            d['tags'] = json.loads(d['tags']) if d['tags'] else []
-        except Exception:
-            d['tags'] = []
-        result.append(d)
-    return result
+    """, (student_id,)))
+    return [_with_tags(r) for r in rows]
+
+
+def _with_tags(row):
+    d = dict(row)
+    try:
+        d['tags'] = json.loads(d['tags']) if d['tags'] else []
+    except Exception:
+        d['tags'] = []
+    return d
+
+
+def get_activities_page(student_id, limit=20, cursor=None):
+    """활동 목록 한 페이지 (최근 순). 반환: (행 리스트, 다음 커서 또는 None)"""
+    rows, next_cursor = cached_page(
+        DB_PATH, 'activities_page', ('student_activities', 'activity_types'), (student_id,), limit, cursor,
+        lambda: keyset_page(_query_rows, """
+            SELECT a.*, at.name as type_name
+            FROM student_activities a
+            JOIN activity_types at ON a.activity_type_id=at.activity_type_id
+            WHERE a.student_id=?
+        """, (student_id,), [("a.created_at", "created_at"), ("a.activity_id", "activity_id")], limit, cursor))
+    return [_with_tags(r) for r in rows], next_cursor
 
 
 def get_activity_strength(student_id):
@@ -819,15 +1016,14 @@ def get_activity_strength(student_id):
 
 
 def get_activity_reviews_for_student(student_id):
-    con = get_connection()
-    rows = con.execute("""
+    return read_cache.cached_rows(DB_PATH, 'activity_reviews',
+                                  ('teacher_activity_reviews', 'student_activities'),
+                                  (student_id,), lambda: _query_rows("""
         SELECT r.*, a.title, a.student_id
         FROM teacher_activity_reviews r
         JOIN student_activities a ON r.activity_id=a.activity_id
         WHERE a.student_id=?
-    """, (student_id,)).fetchall()
-    con.close()
-    return [dict(r) for r in rows]
+    """, (student_id,)))
 
 
 def save_activity_review(activity_id, teacher_user_id, status, score, comment):
@@ -841,32 +1037,154 @@ def save_activity_review(activity_id, teacher_user_id, status, score, comment):
     """, (activity_id, teacher_user_id, status, score, comment))
     con.commit()
     con.close()
+    read_cache.bump('teacher_activity_reviews')
 
 
-def get_pending_activities_for_teacher(teacher_user_id):
-    con = get_connection()
-    rows = con.execute("""
+_TEACHER_ACTIVITY_SQL = """
         SELECT a.activity_id, a.student_id, a.title, a.summary, a.detail, a.learned,
                a.role, a.major_related, a.start_date, a.end_date, a.hours, a.evidence_url,
-               a.tags, a.created_at,
+               a.tags, a.created_at, l.class_id,
                at.name as type_name, eu.name as student_name,
                r.status as review_status, r.score as review_score, r.comment as review_comment
-        FROM student_activities a
+        FROM edu_student_links l
+        JOIN student_activities a ON a.student_id = l.student_id
         JOIN activity_types at ON a.activity_type_id = at.activity_type_id
         JOIN edu_students es   ON a.student_id = es.student_id
         JOIN edu_users eu       ON es.user_id = eu.user_id
         LEFT JOIN teacher_activity_reviews r
-               ON r.activity_id = a.activity_id AND r.teacher_id = ?
-        WHERE a.student_id IN (
-            SELECT DISTINCT l.student_id FROM edu_student_links l
-            WHERE l.user_id = ? AND l.relation = 'teacher' AND l.is_active = 1
-        )
-        ORDER BY a.created_at DESC
-    """, (teacher_user_id, teacher_user_id)).fetchall()
+               ON r.activity_id = a.activity_id AND r.teacher_id = l.user_id
+        WHERE l.user_id = ? AND l.relation = 'teacher' AND l.is_active = 1
+"""
+_TEACHER_ACTIVITY_TABLES = ('student_activities', 'activity_types', 'teacher_activity_reviews',
+                            'edu_student_links', 'edu_users')
+REVIEW_STATUSES = ('pending', 'approved', 'rejected')
+
+
+def get_pending_activities_for_teacher(teacher_user_id):
+    con = get_connection()
+    rows = con.execute(_TEACHER_ACTIVITY_SQL + " ORDER BY a.created_at DESC", (teacher_user_id,)).fetchall()
     con.close()
     return [dict(r) for r in rows]
 
 
+def get_pending_activities_for_teacher_page(teacher_user_id, student_id=None, limit=20, cursor=None):
+    """
+    담당 학생 활동 한 페이지 (최근 순, 검토 상태 포함). student_id 를 주면 그 학생 활동만.
+    반환: (행 리스트, 다음 커서 또는 None)
+    """
+    return get_review_queue(teacher_user_id, status=None, student_id=student_id, limit=limit, cursor=cursor)
+
+
+# ─────────────────────────────────────────────────────────
+# 교사 활동 검토 대기열
+#
+# - 상태(pending/approved/rejected) · 학급 · 학생으로 거른 키셋 페이지
+#   검토 행이 없는 활동은 pending 으로 본다
+# - 승인/반려 상태는 (teacher_id, status, activity_id) 색인으로 바로 찾는다
+# - 일괄 검토는 한 트랜잭션으로 쓰고 캐시 무효화·활동 강도 재계산은 학생당 한 번
+# ─────────────────────────────────────────────────────────
+
+def _review_queue_filter(teacher_user_id, status=None, class_id=None, student_id=None):
+    sql, params = _TEACHER_ACTIVITY_SQL, [teacher_user_id]
+    if status == 'pending':
+        sql += " AND (r.status IS NULL OR r.status = 'pending')"
+    elif status is not None:
+        sql += " AND r.status = ?"
+        params.append(status)
+    if class_id is not None:
+        sql += " AND l.class_id = ?"
+        params.append(class_id)
+    if student_id is not None:
+        sql += " AND a.student_id = ?"
+        params.append(student_id)
+    return sql, params
+
+
+def get_review_queue(teacher_user_id, status='pending', class_id=None, student_id=None,
+                     limit=20, cursor=None):
+    """검토 대기열 한 페이지 (최근 활동 순). status=None 이면 전체. 반환: (행 리스트, 다음 커서 또는 None)"""
+    if status is not None and status not in REVIEW_STATUSES:
+        raise ValueError(f"알 수 없는 검토 상태: {status}")
+    sql, params = _review_queue_filter(teacher_user_id, status, class_id, student_id)
+    return cached_page(
+        DB_PATH, 'review_queue', _TEACHER_ACTIVITY_TABLES,
+        (teacher_user_id, status, class_id, student_id), limit, cursor,
+        lambda: keyset_page(_query_rows, sql, params,
+                            [("a.created_at", "created_at"), ("a.activity_id", "activity_id")], limit, cursor))
+
+
+def count_review_queue(teacher_user_id, class_id=None):
+    """상태별 활동 수 {'pending': n, 'approved': n, 'rejected': n}."""
+    sql = """
+        SELECT COALESCE(r.status, 'pending') AS status, COUNT(*) AS cnt
+        FROM edu_student_links l
+        JOIN student_activities a ON a.student_id = l.student_id
+        LEFT JOIN teacher_activity_reviews r
+               ON r.activity_id = a.activity_id AND r.teacher_id = l.user_id
+        WHERE l.user_id = ? AND l.relation = 'teacher' AND l.is_active = 1
+    """
+    params = [teacher_user_id]
+    if class_id is not None:
+        sql += " AND l.class_id = ?"
+        params.append(class_id)
+    rows = read_cache.cached_rows(DB_PATH, 'review_queue_counts', _TEACHER_ACTIVITY_TABLES,
+                                  (teacher_user_id, class_id),
+                                  lambda: _query_rows(sql + " GROUP BY 1", params))
+    counts = dict.fromkeys(REVIEW_STATUSES, 0)
+    counts.update({r['status']: r['cnt'] for r in rows})
+    return counts
+
+
+def get_teacher_classes(teacher_user_id):
+    """담당 학생이 속한 학급 목록."""
+    return read_cache.cached_rows(DB_PATH, 'teacher_classes', ('edu_student_links', 'classes'),
+                                  (teacher_user_id,), lambda: _query_rows("""
+        SELECT DISTINCT l.class_id, COALESCE(c.class_name, l.class_id || '반') AS class_name
+        FROM edu_student_links l LEFT JOIN classes c ON c.class_id = l.class_id
+        WHERE l.user_id = ? AND l.relation = 'teacher' AND l.is_active = 1 AND l.class_id IS NOT NULL
+        ORDER BY l.class_id
+    """, (teacher_user_id,)))
+
+
+def bulk_review_activities(teacher_user_id, activity_ids, status, score=None, comment=None):
+    """
+    여러 활동을 한 번에 승인/반려. 담당 학생의 활동만 기록된다.
+    score/comment 가 None 이면 기존 값 유지.
+    반환: {student_id: 갱신된 활동 강도}
+    """
+    if status not in REVIEW_STATUSES:
+        raise ValueError(f"알 수 없는 검토 상태: {status}")
+    ids = sorted({int(i) for i in activity_ids})
+    if not ids:
+        return {}
+    con = get_connection()
+    student_ids = set()
+    with con:
+        for i in range(0, len(ids), 500):          # SQLite 변수 개수 제한
+            chunk = ids[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            owned = f"""
+                FROM student_activities a
+                JOIN edu_student_links l
+                  ON l.student_id = a.student_id AND l.user_id = ? AND l.relation = 'teacher' AND l.is_active = 1
+                WHERE a.activity_id IN ({marks})
+            """
+            student_ids.update(r[0] for r in con.execute(
+                "SELECT DISTINCT a.student_id " + owned, [teacher_user_id, *chunk]))
+            con.execute(f"""
+                INSERT INTO teacher_activity_reviews (activity_id, teacher_id, status, score, comment, reviewed_at)
+                SELECT a.activity_id, ?, ?, ?, ?, CURRENT_TIMESTAMP {owned}
+                ON CONFLICT(activity_id, teacher_id) DO UPDATE SET
+                    status=excluded.status,
+                    score=COALESCE(excluded.score, teacher_activity_reviews.score),
+                    comment=COALESCE(excluded.comment, teacher_activity_reviews.comment),
+                    reviewed_at=CURRENT_TIMESTAMP
+            """, [teacher_user_id, status, score, comment, teacher_user_id, *chunk])
+    con.close()
+    read_cache.bump('teacher_activity_reviews')
+    return {sid: get_activity_strength(sid) for sid in sorted(student_ids)}
+
+
 # ─────────────────────────────────────────────────────────
 # 매일 기록
 # ─────────────────────────────────────────────────────────
@@ -883,6 +1201,7 @@ def save_learning_log(student_id, date, study_minutes, subject_ids, study_type):
     """, (student_id, date, study_minutes, json.dumps(subject_ids), study_type))
     con.commit()
     con.close()
+    read_cache.bump('daily_learning_logs')
 
 
 def save_state_check(student_id, date, focus, stress, fatigue, motivation):
@@ -896,6 +1215,7 @@ def save_state_check(student_id, date, focus, stress, fatigue, motivation):
     """, (student_id, date, focus, stress, fatigue, motivation))
     con.commit()
     con.close()
+    read_cache.bump('daily_state_checks')
 
 
 def save_self_assessment(student_id, date, performance_level, understanding_level):
@@ -909,6 +1229,7 @@ def save_self_assessment(student_id, date, performance_level, understanding_leve
     """, (student_id, date, performance_level, understanding_level))
     con.commit()
     con.close()
+    read_cache.bump('daily_self_assessments')
 
 
 def get_learning_logs(student_id, days=30):
@@ -977,6 +1298,11 @@ def check_today_logs(student_id):
 # ─────────────────────────────────────────────────────────
 
 def get_universities(degree_type=None, region_code=None):
+    return read_cache.cached_rows(DB_PATH, 'universities', ('universities',), (degree_type, region_code),
+                                  lambda: _load_universities(degree_type, region_code))
+
+
+def _load_universities(degree_type, region_code):
     con = get_connection()
     q = "SELECT * FROM universities WHERE 1=1"
     params = []
@@ -988,10 +1314,16 @@ def get_universities(degree_type=None, region_code=None):
         params.append(region_code)
     rows = con.execute(q, params).fetchall()
     con.close()
-    return [dict(r) for r in rows]
+    return rows
 
 
 def get_departments(university_id=None, category=None):
+    return read_cache.cached_rows(DB_PATH, 'departments', ('departments', 'universities'),
+                                  (university_id, category),
+                                  lambda: _load_departments(university_id, category))
+
+
+def _load_departments(university_id, category):
     con = get_connection()
     q = "SELECT d.*, u.name as university_name, u.degree_type, u.region_code, u.homepage_url FROM departments d JOIN universities u ON d.university_id=u.university_id WHERE 1=1"
     params = []
@@ -1003,23 +1335,155 @@ def get_departments(university_id=None, category=None):
         params.append(category)
     rows = con.execute(q, params).fetchall()
     con.close()
-    return [dict(r) for r in rows]
+    return rows
+
+
+CUTOFF_METRICS = {'naesin': ('naesin_avg', None), 'holistic': ('activity_score_min', 50)}   # (값 키, 없을 때 기본)
+CUTOFF_BOUNDS = {'naesin': (1.0, 9.0), 'holistic': (0.0, 100.0)}
 
 
-def get_cutoffs(department_id, admission_type, year=2024):
+def _parse_cutoff_row(row):
+    d = dict(row)
+    try:
+        d['cutoff_value'] = json.loads(d['cutoff_value'])
+    except Exception:
+        d['cutoff_value'] = {}
+    return d
+
+
+def get_cutoffs(department_id, admission_type, year=None, as_of=None):
+    """
+    한 학과의 컷. year 를 주면 그 연도, as_of 를 주면 그 연도 이하 중 가장 최근, 둘 다 없으면 최근 연도.
+    """
     con = get_connection()
-    row = con.execute(
-        "SELECT * FROM admissions_cutoffs WHERE department_id=? AND admission_type=? AND year=?",
-        (department_id, admission_type, year)
-    ).fetchone()
+    if year is not None:
+        row = con.execute(
+            "SELECT * FROM admissions_cutoffs WHERE department_id=? AND admission_type=? AND year=?",
+            (department_id, admission_type, year)
+        ).fetchone()
+    else:
+        row = con.execute("""
+            SELECT * FROM admissions_cutoffs WHERE department_id=? AND admission_type=? AND year<=?
+            ORDER BY year DESC LIMIT 1
+        """, (department_id, admission_type, 9999 if as_of is None else as_of)).fetchone()
     con.close()
-    if row:
-        d = dict(row)
-        try:
-            d['cutoff_value'] = json.loads(d['cutoff_value'])
-        except Exception:
-            d['cutoff_value'] = {}
-        return d
+    return _parse_cutoff_row(row) if row else None
+
+
+def get_cutoff_table(admission_type, as_of=None):
+    """
+    학과별로 as_of 연도 이하 가장 최근 컷 (학과·대학 정보 + year + cutoff_value dict, department_id 순).
+    as_of=None 이면 최근 연도. '그 해 기준으로는 어땠나' 조회용 — 추천은 get_cutoff_trends 의 예상 컷을 쓴다.
+    """
+    return read_cache.cached_rows(DB_PATH, 'cutoff_table', ('admissions_cutoffs', 'departments', 'universities'),
+                                  (admission_type, as_of),
+                                  lambda: _load_cutoff_table(admission_type, as_of))
+
+
+def _load_cutoff_table(admission_type, as_of):
+    rows = _query_rows("""
+        SELECT d.*, u.name as university_name, u.degree_type, u.region_code, u.homepage_url,
+               c.year, c.cutoff_value
+        FROM admissions_cutoffs c
+        JOIN departments d ON d.department_id = c.department_id
+        JOIN universities u ON u.university_id = d.university_id
+        WHERE c.admission_type=? AND c.year = (
+            SELECT MAX(c2.year) FROM admissions_cutoffs c2
+            WHERE c2.department_id = c.department_id AND c2.admission_type = c.admission_type AND c2.year <= ?
+        )
+        ORDER BY d.department_id
+    """, (admission_type, 9999 if as_of is None else as_of))
+    return [_parse_cutoff_row(r) for r in rows]
+
+
+def get_cutoff_years(admission_type):
+    return [r['year'] for r in read_cache.cached_rows(
+        DB_PATH, 'cutoff_years', ('admissions_cutoffs',), (admission_type,), lambda: _query_rows(
+            "SELECT DISTINCT year FROM admissions_cutoffs WHERE admission_type=? ORDER BY year",
+            (admission_type,)))]
+
+
+# ── 컷 추세 (cutoff_trends) ──
+# 학과별 연도 이력 → 최소제곱 기울기, 최근 값, 다음 전형 연도 예상 컷
+# 추천은 이 표 한 번만 읽는다 (요청마다 이력을 훑지 않음). 컷 Import 때 해당 전형만 다시 계산.
+
+def get_cutoff_trends(admission_type):
+    """
+    추세 표 + 학과·대학 정보 (department_id 순). 추천/시뮬레이터의 비교 기준 = projected_value.
+    반환값은 캐시에 든 불변 tuple 그대로 — 행은 dict(row) 로 읽는다 (같은 데이터면 같은 객체).
+    """
+    return read_cache.cached_value(DB_PATH, 'cutoff_trends', ('cutoff_trends', 'departments', 'universities'),
+                                   (admission_type,),
+                                   lambda: read_cache.freeze_rows(_query_rows("""
+        SELECT d.*, u.name as university_name, u.degree_type, u.region_code, u.homepage_url,
+               t.year_count, t.first_year, t.last_year, t.last_value, t.slope, t.step_rms,
+               t.target_year, t.projected_value
+        FROM cutoff_trends t
+        JOIN departments d ON d.department_id = t.department_id
+        JOIN universities u ON u.university_id = d.university_id
+        WHERE t.admission_type=?
+        ORDER BY d.department_id
+    """, (admission_type,))))
+
+
+def _rebuild_cutoff_trends(con, admission_types=None):
+    """admission_types(기본: 값 키가 있는 전형 전부)의 추세를 이력으로 다시 계산 (호출한 트랜잭션 안에서)."""
+    for admission_type in admission_types or list(CUTOFF_METRICS):
+        if admission_type not in CUTOFF_METRICS:
+            continue
+        key, default = CUTOFF_METRICS[admission_type]
+        lo, hi = CUTOFF_BOUNDS[admission_type]
+        history = {}
+        for r in con.execute("""
+            SELECT department_id, year, cutoff_value FROM admissions_cutoffs
+            WHERE admission_type=? ORDER BY department_id, year
+        """, (admission_type,)):
+            value = _parse_cutoff_row(r)['cutoff_value'].get(key, default)
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                continue
+            history.setdefault(r['department_id'], []).append((r['year'], value))
+
+        con.execute("DELETE FROM cutoff_trends WHERE admission_type=?", (admission_type,))
+        if not history:
+            continue
+        target_year = max(y for points in history.values() for y, _ in points) + 1
+        rows = []
+        for dept_id, points in history.items():
+            years = [y for y, _ in points]
+            values = [v for _, v in points]
+            n = len(points)
+            last_year, last_value = points[-1]
+            slope, step_rms = 0.0, None
+            if n >= 2:
+                my, mv = sum(years) / n, sum(values) / n
+                slope = (sum((y - my) * (v - mv) for y, v in points)
+                         / sum((y - my) ** 2 for y in years))
+                steps = [(b - a) / (yb - ya) for (ya, a), (yb, b) in zip(points, points[1:])]
+                step_rms = (sum(d * d for d in steps) / len(steps)) ** 0.5
+            projected = min(max(last_value + slope * (target_year - last_year), lo), hi)
+            rows.append((dept_id, admission_type, n, years[0], last_year, last_value,
+                         round(slope, 4), step_rms, target_year, round(projected, 2)))
+        con.executemany("""
+            INSERT INTO cutoff_trends
+                (department_id, admission_type, year_count, first_year, last_year, last_value,
+                 slope, step_rms, target_year, projected_value)
+            VALUES (?,?,?,?,?,?,?,?,?,?)
+        """, rows)
+
+
+def get_grade_totals(student_id):
+    """이수단위 가중 합계 (weighted_sum, credit_sum) — 성적 없으면 None. 가상 성적 계산의 출발점."""
+    return read_cache.cached_value(DB_PATH, 'grade_totals', ('student_grades',), (student_id,),
+                                   lambda: _load_grade_totals(student_id))
+
+
+def _load_grade_totals(student_id):
+    rows = _query_rows("SELECT weighted_sum, credit_sum FROM grade_student_stats WHERE student_id=?",
+                       (student_id,))
+    if rows and rows[0]['credit_sum']:
+        return rows[0]['weighted_sum'], rows[0]['credit_sum']
     return None
 
 
@@ -1039,6 +1503,7 @@ def save_snapshot(student_id, track, results_list, filters_dict=None, mode='demo
           json.dumps(results_list, ensure_ascii=False)))
     con.commit()
     con.close()
+    read_cache.bump('student_recommendation_snapshots')
 
 
 def get_latest_snapshot(student_id, track, date=None):
@@ -1080,6 +1545,7 @@ def save_forecast(student_id, metric, window, value_dict, confidence, disclaimer
           json.dumps(value_dict, ensure_ascii=False), confidence, disclaimer))
     con.commit()
     con.close()
+    read_cache.bump('student_forecasts')
 
 
 def get_latest_forecasts(student_id):
@@ -1168,7 +1634,7 @@ def compute_policy_aggregates(region_code=None, school_id=None):
     ).fetchone()['c']
 
     avg_grade_row = con.execute(
-        f"SELECT AVG(grade_level_num) as avg FROM student_grades WHERE student_id IN ({ph})",
+        f"SELECT SUM(weighted_sum) / SUM(credit_sum) as avg FROM grade_student_stats WHERE student_id IN ({ph})",
         student_ids
     ).fetchone()
     avg_grade = round(avg_grade_row['avg'], 2) if avg_grade_row and avg_grade_row['avg'] else None
@@ -1247,6 +1713,7 @@ def save_policy_aggregate(region_code, school_id, metrics):
     )
     con.commit()
     con.close()
+    read_cache.bump('policy_aggregates_daily')
 
 
 # ─────────────────────────────────────────────────────────
@@ -1268,6 +1735,7 @@ def import_universities_from_df(df):
             pass
     con.commit()
     con.close()
+    read_cache.bump('universities')
     return inserted
 
 
@@ -1290,12 +1758,36 @@ def import_departments_from_df(df):
             pass
     con.commit()
     con.close()
+    read_cache.bump('departments')
     return inserted
 
 
+def _normalize_cutoff_sheet(df):
+    """
+    가로형(연도 열: 2022, 2023, ... 에 컷 값) → 세로형(year, value). 세로형(year 열)은 그대로.
+    한 학과의 여러 해 이력을 한 행으로 넣을 수 있게 한다.
+    """
+    year_cols = [c for c in df.columns if str(c).strip().isdigit() and len(str(c).strip()) == 4]
+    if 'year' in df.columns or not year_cols:
+        return df
+    keep = [c for c in df.columns if c not in year_cols]
+    long = df.melt(id_vars=keep, value_vars=year_cols, var_name='year', value_name='value')
+    long['year'] = long['year'].map(lambda y: int(str(y).strip()))
+    return long[long['value'].notna()]
+
+
 def import_cutoffs_from_df(df):
+    """
+    컷 이력 일괄 등록 (세로형 year 열 또는 가로형 연도 열). 같은 학과·전형·연도는 새 값으로 갱신.
+    값 열: 전형별 값 키(naesin_avg / activity_score_min) → value 순으로 찾고, 값이 없는 행은 건너뛴다
+    (기본값으로 채우면 그대로 컷 추세·추천에 섞이므로).
+    등록 후 해당 전형의 컷 추세를 다시 계산.
+    """
+    import pandas as pd
+    df = _normalize_cutoff_sheet(df)
     con = get_connection()
     inserted = 0
+    types = set()
     for _, row in df.iterrows():
         try:
             dept = con.execute("""
@@ -1305,16 +1797,170 @@ def import_cutoffs_from_df(df):
             """, (str(row.get('university_name', '')), str(row.get('department_name', '')))).fetchone()
             if not dept:
                 continue
-            val = json.dumps({'naesin_avg': float(row.get('naesin_avg', 3.0)),
-                              'notes': str(row.get('notes', ''))})
-            con.execute(
-                "INSERT OR IGNORE INTO admissions_cutoffs (department_id,admission_type,year,cutoff_value,source) VALUES (?,?,?,?,'manual')",
-                (dept['department_id'], str(row.get('admission_type', 'naesin')),
-                 int(row.get('year', 2024)), val)
-            )
+            admission_type = str(row.get('admission_type', 'naesin'))
+            key = CUTOFF_METRICS.get(admission_type, ('naesin_avg', None))[0]
+            value = next((row.get(c) for c in (key, 'value')
+                          if c in row and pd.notna(row.get(c))), None)
+            if value is None:
+                continue
+            notes = row.get('notes', '')
+            val = json.dumps({key: float(value), 'notes': '' if pd.isna(notes) else str(notes)})
+            con.execute("""
+                INSERT INTO admissions_cutoffs (department_id,admission_type,year,cutoff_value,source)
+                VALUES (?,?,?,?,'manual')
+                ON CONFLICT(department_id,admission_type,year) DO UPDATE SET
+                    cutoff_value=excluded.cutoff_value, source=excluded.source
+            """, (dept['department_id'], admission_type, int(row.get('year', 2024)), val))
             inserted += 1
+            types.add(admission_type)
         except Exception:
             pass
+    _rebuild_cutoff_trends(con, types)
     con.commit()
     con.close()
+    read_cache.bump('admissions_cutoffs', 'cutoff_trends')
     return inserted
+
+
+# ── 내신 성적 일괄 입력 (NEIS 성적표 형식) ──
+# 한 행 = 학생 1명 × 과목 1개 (세로형) 또는 한 행 = 학생 1명, 과목별 등급 열 (가로형)
+# 학생은 학생ID 또는 성명(담당 학생 중 동명이인 없을 때)으로, 학기는 학년도/학년/학기 열 또는 선택한 학기로 찾는다.
+# 검증은 표 단위(merge)로 한 번에 하고, 통과한 행만 한 트랜잭션으로 upsert (교사 입력·확인 완료로 기록)
+
+GRADE_IMPORT_COLUMNS = {
+    'student_id': ('student_id', '학생ID', '학생번호'),
+    'student_name': ('student_name', '성명', '이름', '학생명'),
+    'school_year': ('school_year', '학년도'),
+    'grade_level': ('grade_level', '학년'),
+    'semester': ('semester', '학기'),
+    'subject_name': ('subject_name', '과목', '과목명'),
+    'grade_level_num': ('grade_level_num', '석차등급', '등급', '성취도등급'),
+    'raw_score': ('raw_score', '원점수'),
+    'rank_in_class': ('rank_in_class', '석차'),
+    'credit_units': ('credit_units', '이수단위', '단위수'),
+}
+
+
+def _normalize_grade_sheet(df, subject_names):
+    """열 이름을 표준 이름으로 바꾸고, 가로형(과목별 열)이면 세로형으로 편다."""
+    alias = {a: std for std, names in GRADE_IMPORT_COLUMNS.items() for a in names}
+    df = df.rename(columns=lambda c: alias.get(str(c).strip(), str(c).strip()))
+    if 'subject_name' not in df.columns:
+        subject_cols = [c for c in df.columns if c in subject_names]
+        id_cols = [c for c in df.columns
+                   if c in ('row', 'student_id', 'student_name', 'school_year', 'grade_level', 'semester')]
+        df = df.melt(id_vars=id_cols, value_vars=subject_cols,
+                     var_name='subject_name', value_name='grade_level_num')
+        df = df[df['grade_level_num'].notna()]
+    return df.reset_index(drop=True)
+
+
+def import_grades_from_df(df, teacher_user_id, term_id=None):
+    """
+    성적표 DataFrame → 담당 학생 성적 일괄 upsert.
+    term_id: 학년도/학년/학기 열이 없을 때 쓸 학기.
+    반환: {'imported': 건수, 'errors': 거부된 행 DataFrame(사유 포함), 'averages': {student_id: 이수단위 가중 평균}}
+    """
+    import pandas as pd
+
+    subjects = pd.DataFrame([dict(r) for r in get_subjects()], columns=['subject_id', 'subject_name'])
+    terms = pd.DataFrame([dict(r) for r in get_terms()],
+                         columns=['term_id', 'school_year', 'grade_level', 'semester'])
+    students = pd.DataFrame(get_class_students(teacher_user_id), columns=['student_id', 'student_name'])
+
+    df = df.assign(row=range(2, len(df) + 2))      # 엑셀 행 번호 (머리글 1행)
+    df = _normalize_grade_sheet(df, set(subjects['subject_name']))
+    df['error'] = ''
+
+    def reject(mask, reason):
+        df.loc[mask & (df['error'] == ''), 'error'] = reason
+
+    # 학생: 학생ID 우선, 없으면 성명 (담당 학생 안에서 유일해야 함)
+    if 'student_id' in df.columns:
+        df['student_id'] = pd.to_numeric(df['student_id'], errors='coerce')
+        reject(~df['student_id'].isin(students['student_id']), '담당 학생이 아닌 학생ID')
+    elif 'student_name' in df.columns:
+        unique_names = students.drop_duplicates('student_name', keep=False)
+        df['student_name'] = df['student_name'].astype(str).str.strip()
+        df = df.merge(unique_names, on='student_name', how='left')
+        reject(df['student_name'].isin(students['student_name']) & df['student_id'].isna(),
+               '동명이인 (학생ID 열 필요)')
+        reject(df['student_id'].isna(), '담당 학생 명단에 없는 이름')
+    else:
+        raise ValueError("학생ID 또는 성명 열이 필요합니다.")
+
+    # 과목
+    df['subject_name'] = df['subject_name'].astype(str).str.replace(r'\s+', '', regex=True)
+    df = df.merge(subjects.assign(subject_name=subjects['subject_name'].str.replace(r'\s+', '', regex=True)),
+                  on='subject_name', how='left')
+    reject(df['subject_id'].isna(), '등록되지 않은 과목')
+
+    # 학기
+    term_cols = ['school_year', 'grade_level', 'semester']
+    if all(c in df.columns for c in term_cols):
+        for c in term_cols:
+            df[c] = pd.to_numeric(df[c], errors='coerce')
+        df = df.merge(terms, on=term_cols, how='left')
+        if term_id is not None:     # 학기 칸이 빈 행은 선택한 학기로
+            df.loc[df[term_cols].isna().any(axis=1), 'term_id'] = term_id
+        reject(df['term_id'].isna(), '등록되지 않은 학기')
+    elif term_id is not None:
+        df['term_id'] = term_id
+    else:
+        raise ValueError("학년도/학년/학기 열이 없으면 학기를 선택해야 합니다.")
+
+    # 값
+    df['grade_level_num'] = pd.to_numeric(df['grade_level_num'], errors='coerce')
+    reject(~df['grade_level_num'].between(1, 9) | (df['grade_level_num'] % 1 != 0), '등급은 1~9 정수')
+    df['raw_score'] = pd.to_numeric(df['raw_score'], errors='coerce') if 'raw_score' in df.columns else None
+    if 'rank_in_class' in df.columns:     # NEIS 석차 표기 "3(2)/30" → 3
+        df['rank_in_class'] = pd.to_numeric(
+            df['rank_in_class'].astype(str).str.extract(r'(\d+)', expand=False), errors='coerce')
+    else:
+        df['rank_in_class'] = None
+    if 'credit_units' in df.columns:
+        df['credit_units'] = pd.to_numeric(df['credit_units'], errors='coerce')
+        reject(df['credit_units'] <= 0, '이수단위는 0보다 커야 함')
+    else:
+        df['credit_units'] = None
+
+    key = ['student_id', 'term_id', 'subject_id']
+    ok = df[df['error'] == ''].drop_duplicates(key, keep='last')   # 같은 학생·학기·과목은 마지막 행
+    errors = df.loc[df['error'] != '', [c for c in ('row', 'student_id', 'student_name', 'subject_name',
+                                                     'grade_level_num', 'error') if c in df.columns]]
+
+    rows = [
+        (int(r.student_id), int(r.term_id), int(r.subject_id), int(r.grade_level_num),
+         None if pd.isna(r.raw_score) else float(r.raw_score),
+         None if pd.isna(r.rank_in_class) else int(r.rank_in_class))
+        for r in ok[key + ['grade_level_num', 'raw_score', 'rank_in_class']].itertuples(index=False)
+    ]
+    credits = [
+        (int(r.student_id), int(r.term_id), int(r.subject_id), float(r.credit_units))
+        for r in ok[key + ['credit_units']].itertuples(index=False) if not pd.isna(r.credit_units)
+    ]
+    averages = {}
+    if rows:
+        student_ids = sorted({r[0] for r in rows})
+        con = get_connection()
+        with con:
+            con.executemany("""
+                INSERT INTO student_grades (student_id,term_id,subject_id,grade_level_num,raw_score,rank_in_class,
+                                            entered_by,verified_by_teacher,verified_at)
+                VALUES (?,?,?,?,?,?,'teacher',1,CURRENT_TIMESTAMP)
+                ON CONFLICT(student_id,term_id,subject_id) DO UPDATE SET
+                    grade_level_num=excluded.grade_level_num,
+                    raw_score=excluded.raw_score,
+                    rank_in_class=excluded.rank_in_class,
+                    entered_by='teacher',
+                    verified_by_teacher=1,
+                    verified_at=CURRENT_TIMESTAMP
+            """, rows)
+            con.executemany(
+                "INSERT OR REPLACE INTO grade_credits (student_id,term_id,subject_id,credit_units) VALUES (?,?,?,?)",
+                credits)
+            _refresh_grade_stats(con, student_ids)
+        con.close()
+        read_cache.bump('student_grades')
+        averages = get_naesin_avgs(student_ids)
+    return {'imported': len(rows), 'errors': errors.reset_index(drop=True), 'averages': averages}
@@ -1,6 +1,10 @@
 import datetime
 import json
+
+import numpy as np
+
 import naesin_database as db
+import read_cache
 
 DISCLAIMER = (
     "※ 이 예측은 현재 입력된 데이터를 기반으로 한 참고용 정보이며, 실제 입시 결과와 다를 수 있습니다. "
@@ -60,21 +64,28 @@ def _shortfall_desc(sf, track='naesin'):
         return f'활동점수 {abs(sf):.0f}점 {"부족" if sf < 0 else "여유"}'
 
 
-def _evidence_naesin(student_avg, cutoff):
+def _cutoff_basis(dept):
+    """컷 추세 행 → '2025 예상 · 2024 2.8, 3년 추세' / '2024 기준'"""
+    if dept['year_count'] >= 2:
+        return f"{dept['target_year']} 예상 · {dept['last_year']} {dept['last_value']:.1f}, {dept['year_count']}년 추세"
+    return f"{dept['last_year']} 기준"
+
+
+def _evidence_naesin(student_avg, cutoff, dept):
     ev = []
     if student_avg is not None:
         ev.append(f'학생 내신 평균 {student_avg:.2f}등급')
     if cutoff:
-        ev.append(f'해당 학과 내신 컷 {cutoff:.1f}등급(2024 기준)')
+        ev.append(f'해당 학과 내신 컷 {cutoff:.1f}등급({_cutoff_basis(dept)})')
     ev.append('전형 세부 조건은 대학 입학처 확인 필수')
     return ev
 
 
-def _evidence_holistic(strength, cutoff_score):
+def _evidence_holistic(strength, cutoff_score, dept):
     ev = []
     ev.append(f'학생 활동점수 산출값 {strength:.1f}/100')
     if cutoff_score:
-        ev.append(f'해당 학과 학종 활동점수 기준 {cutoff_score}점')
+        ev.append(f'해당 학과 학종 활동점수 기준 {cutoff_score:g}점({_cutoff_basis(dept)})')
     ev.append('교사 검증 완료 활동 수 반영')
     ev.append('전형 세부 조건은 대학 입학처 확인 필수')
     return ev
@@ -91,27 +102,30 @@ def _option_filter(sf, option):
         return True
 
 
+def _filter_departments(cutoff_trends, degree_filter=None, region_filter=None, category_filter=None):
+    """컷 추세 표(db.get_cutoff_trends) 행 중 필터에 맞는 학과를 dict 로."""
+    for row in cutoff_trends:
+        dept = dict(row)
+        if degree_filter and dept['degree_type'] != degree_filter:
+            continue
+        if region_filter and dept['region_code'] != region_filter:
+            continue
+        if category_filter and dept['category'] != category_filter:
+            continue
+        yield dept
+
+
 def recommend_naesin(student_id, option='B', degree_filter=None, region_filter=None,
                      category_filter=None, limit=10):
     student_avg = db.get_naesin_avg(student_id)
     if student_avg is None:
         return [], '내신 성적 데이터가 없습니다. 내신 성적을 먼저 입력해주세요.'
 
-    departments = db.get_departments(
-        university_id=None,
-        category=category_filter
-    )
-    if degree_filter:
-        departments = [d for d in departments if d['degree_type'] == degree_filter]
-    if region_filter:
-        departments = [d for d in departments if d['region_code'] == region_filter]
-
+    probs = admission_probabilities(student_id, 'naesin')
     results = []
-    for dept in departments:
-        cutoff_row = db.get_cutoffs(dept['department_id'], 'naesin', 2024)
-        if not cutoff_row:
-            continue
-        cutoff_avg = cutoff_row['cutoff_value'].get('naesin_avg')
+    for dept in _filter_departments(db.get_cutoff_trends('naesin'),
+                                    degree_filter, region_filter, category_filter):
+        cutoff_avg = dept['projected_value']
         sf = _shortfall_naesin(student_avg, cutoff_avg)
 
         if not _option_filter(sf, option):
@@ -120,7 +134,7 @@ def recommend_naesin(student_id, option='B', degree_filter=None, region_filter=N
         zone = _zone_from_shortfall(sf)
         possibility = _possibility_from_shortfall(sf)
         shortfall_desc = _shortfall_desc(sf, 'naesin')
-        evidence = _evidence_naesin(student_avg, cutoff_avg)
+        evidence = _evidence_naesin(student_avg, cutoff_avg, dept)
 
         results.append({
             'university': dept['university_name'],
@@ -130,6 +144,7 @@ def recommend_naesin(student_id, option='B', degree_filter=None, region_filter=N
             'category': dept['category'],
             'zone': zone,
             'possibility': possibility,
+            'probability': probs.get(dept['department_id']),
             'shortfall': shortfall_desc,
             'evidence': evidence,
             'cutoff_naesin': cutoff_avg,
@@ -156,21 +171,11 @@ def recommend_holistic(student_id, option='B', degree_filter=None, region_filter
     reviews = db.get_activity_reviews_for_student(student_id)
     pending_count = sum(1 for r in reviews if r['status'] == 'pending')
 
-    departments = db.get_departments(
-        university_id=None,
-        category=category_filter
-    )
-    if degree_filter:
-        departments = [d for d in departments if d['degree_type'] == degree_filter]
-    if region_filter:
-        departments = [d for d in departments if d['region_code'] == region_filter]
-
+    probs = admission_probabilities(student_id, 'holistic')
     results = []
-    for dept in departments:
-        cutoff_row = db.get_cutoffs(dept['department_id'], 'holistic', 2024)
-        if not cutoff_row:
-            continue
-        score_min = cutoff_row['cutoff_value'].get('activity_score_min', 50)
+    for dept in _filter_departments(db.get_cutoff_trends('holistic'),
+                                    degree_filter, region_filter, category_filter):
+        score_min = dept['projected_value']
         sf = round(score_min - strength, 1)
 
         if option == 'A' and sf > -10:
@@ -191,7 +196,7 @@ def recommend_holistic(student_id, option='B', degree_filter=None, region_filter
             possibility = '낮음'
 
         shortfall_desc = _shortfall_desc(-sf, 'holistic')
-        evidence = _evidence_holistic(strength, score_min)
+        evidence = _evidence_holistic(strength, score_min, dept)
 
         pending_note = f' (교사 검증 대기 {pending_count}건)' if pending_count > 0 else ''
 
@@ -203,6 +208,7 @@ def recommend_holistic(student_id, option='B', degree_filter=None, region_filter
             'category': dept['category'],
             'zone': zone,
             'possibility': possibility,
+            'probability': probs.get(dept['department_id']),
             'shortfall': shortfall_desc + pending_note,
             'evidence': evidence,
             'activity_strength': strength,
@@ -222,6 +228,211 @@ def recommend_holistic(student_id, option='B', degree_filter=None, region_filter
     return results[:limit], None
 
 
+# ─────────────────────────────────────────────────────────
+# 학과 컷 배열 (numpy)
+#
+# - 컷 추세 표(db.get_cutoff_trends)를 전형별 numpy 배열로 한 번 만들어 두고
+#   표 객체가 바뀔 때(=컷·학과 데이터 변경)만 다시 만든다. 비교 기준 컷 = 예상 컷(projected_value)
+# - drift: 학과별 연도 간 컷 변동 크기. 추세 표의 연도 간 변화 제곱평균(step_rms)에
+#   기본값을 관측 하나로 섞어 둠 → 이력이 1년뿐이면 기본값, 쌓일수록 실제 변동으로
+# ─────────────────────────────────────────────────────────
+
+CUTOFF_DRIFT_DEFAULT = {'naesin': 0.2, 'holistic': 3.0}      # 등급 / 활동점수
+
+_cutoff_arrays = {}
+
+
+def _track_cutoff_arrays(track):
+    """전형별 학과 배열. 다 만든 뒤 한 번에 바꿔 끼운다."""
+    table = db.get_cutoff_trends(track)
+    arr = _cutoff_arrays.get(track)
+    if arr is None or arr['table'] is not table:
+        depts = [dict(r) for r in table]
+        prior = CUTOFF_DRIFT_DEFAULT[track]
+        steps = np.array([d['year_count'] - 1 for d in depts], dtype=np.float64)
+        rms = np.array([d['step_rms'] or 0.0 for d in depts], dtype=np.float64)
+        arr = _cutoff_arrays[track] = {
+            'table': table,
+            'depts': depts,
+            'ids': np.array([d['department_id'] for d in depts], dtype=np.int64),
+            'cutoff': np.array([d['projected_value'] for d in depts], dtype=np.float64),
+            'drift': np.sqrt((rms ** 2 * steps + prior ** 2) / (steps + 1)),
+            'degree': np.array([d['degree_type'] for d in depts], dtype=object),
+            'region': np.array([d['region_code'] for d in depts], dtype=object),
+            'category': np.array([d['category'] for d in depts], dtype=object),
+        }
+    return arr
+
+
+def _filter_mask(arr, degree_filter=None, region_filter=None, category_filter=None):
+    mask = np.ones(len(arr['depts']), dtype=bool)
+    if degree_filter:
+        mask &= arr['degree'] == degree_filter
+    if region_filter:
+        mask &= arr['region'] == region_filter
+    if category_filter:
+        mask &= arr['category'] == category_filter
+    return mask
+
+
+# ─────────────────────────────────────────────────────────
+# 가상 성적 시뮬레이션 (What-if)
+#
+# - 성적을 바꾸지 않고 "수학 3→2등급이면?" 을 계산 (student_grades·스냅샷에 쓰지 않음)
+# - 평균: 집계 테이블의 가중 합계에서 바뀐 칸의 (등급×이수단위)만 빼고 더함 → 성적 행 재조회 없음
+# - 구간: 내신 컷 배열로 전 학과의 shortfall/구간을 한 번에 계산 → 슬라이더로 매번 불러도 수 ms
+# - 구간 기준은 _zone_from_shortfall 과 같다 (0.3 이상 안정, -0.3 이상 적정, 그 밖 도전)
+# ─────────────────────────────────────────────────────────
+
+ZONE_NAMES = ('안정', '적정', '도전', '알수없음')
+
+
+def _zone_codes(avg, cutoff):
+    """ZONE_NAMES 번호 배열. avg 가 None 이거나 컷이 없으면 3(알수없음)."""
+    if avg is None:
+        return np.full(len(cutoff), 3, dtype=np.int8)
+    sf = np.round(cutoff - avg, 2)
+    codes = np.where(sf >= 0.3, 0, np.where(sf >= -0.3, 1, 2)).astype(np.int8)
+    codes[np.isnan(cutoff)] = 3
+    return codes
+
+
+def simulate_naesin(student_id, edits, degree_filter=None, region_filter=None, category_filter=None):
+    """
+    edits: [{'term_id', 'subject_id', 'grade', 'credit_units'(선택)}, ...] 가상 성적.
+           grade=None 이면 그 과목을 뺀 경우. credit_units 가 없으면 기존 이수단위(없으면 기본값).
+    반환: base_avg / new_avg, 구간별 학과 수(before/after),
+          changed = 구간이 바뀐 학과 [{university, department, ..., zone_before, zone_after}]
+    """
+    totals = db.get_grade_totals(student_id)
+    weighted, credits = totals if totals else (0.0, 0)
+    base_avg = round(weighted / credits, 2) if credits else None
+
+    cells = {(g['term_id'], g['subject_id']): g for g in db.get_grades(student_id)} if edits else {}
+    for e in edits:
+        key = (e['term_id'], e['subject_id'])
+        old = cells.get(key)
+        unit = e.get('credit_units') or (old['credit_units'] if old else db.DEFAULT_CREDIT_UNITS)
+        if old:
+            weighted -= old['grade_level_num'] * old['credit_units']
+            credits -= old['credit_units']
+        if e.get('grade') is not None:
+            weighted += e['grade'] * unit
+            credits += unit
+        cells[key] = None if e.get('grade') is None else {'grade_level_num': e['grade'], 'credit_units': unit}
+    new_avg = round(weighted / credits, 2) if credits > 0 else None
+
+    arr = _track_cutoff_arrays('naesin')
+    mask = _filter_mask(arr, degree_filter, region_filter, category_filter)
+    cutoff = arr['cutoff'][mask]
+    before = _zone_codes(base_avg, cutoff)
+    after = _zone_codes(new_avg, cutoff)
+
+    idx = np.flatnonzero(mask)
+    moved = np.flatnonzero(before != after)
+    moved = moved[np.lexsort((cutoff[moved], after[moved]))]
+    changed = []
+    for i in moved.tolist():
+        dept = arr['depts'][idx[i]]
+        changed.append({
+            'university': dept['university_name'],
+            'department': dept['name'],
+            'degree_type': DEGREE_LABELS.get(dept['degree_type'], dept['degree_type']),
+            'region': REGION_LABELS.get(dept['region_code'], dept['region_code']),
+            'category': dept['category'],
+            'cutoff_naesin': dept['projected_value'],
+            'zone_before': ZONE_NAMES[before[i]],
+            'zone_after': ZONE_NAMES[after[i]],
+        })
+
+    return {
+        'base_avg': base_avg,
+        'new_avg': new_avg,
+        'zone_counts_before': dict(zip(ZONE_NAMES, np.bincount(before, minlength=4).tolist())),
+        'zone_counts_after': dict(zip(ZONE_NAMES, np.bincount(after, minlength=4).tolist())),
+        'changed': changed,
+    }
+
+
+# ─────────────────────────────────────────────────────────
+# 합격 확률 (Monte Carlo)
+#
+# - 구간/가능도는 shortfall 한 값에 대한 고정 기준 → 같은 '적정'이라도 확실도가 다름
+# - 학생 쪽 불확실성: 내신은 학기별 평균의 흩어짐(이수단위 가중 분산 / 학기 수),
+#                    학종은 활동점수 기본 폭에 검증 대기 활동 비율만큼 폭을 키움
+# - 컷 쪽 불확실성: 예상 컷(추세 표)을 중심으로 학과별 연도 간 컷 변동(drift) 폭
+# - 학생 값 MC_DRAWS 개 × 전 학과 컷 표본을 한 번의 배열 연산으로 비교해 합격 비율을 구한다
+#   (학과가 아주 많으면 MC_BLOCK 개씩 끊어 메모리 상한 유지)
+# - 결과는 read_cache 에 학생·컷 데이터 버전별로 보관, 난수 시드 = student_id (같은 데이터면 같은 값)
+# ─────────────────────────────────────────────────────────
+
+MC_DRAWS = 10_000
+MC_BLOCK = 512
+NAESIN_AVG_SIGMA_DEFAULT = 0.3    # 학기 기록이 1개뿐일 때 평균 불확실성 (등급)
+NAESIN_AVG_SIGMA_MIN = 0.1
+HOLISTIC_SIGMA_DEFAULT = 5.0      # 활동점수 불확실성 (점)
+
+_CUTOFF_TABLES = ('cutoff_trends', 'departments', 'universities')
+_PROBABILITY_TABLES = {
+    'naesin': ('student_grades', 'terms') + _CUTOFF_TABLES,
+    'holistic': ('student_activities', 'activity_types', 'teacher_activity_reviews') + _CUTOFF_TABLES,
+}
+
+
+def _student_distribution(student_id, track):
+    """학생 값의 (평균, 표준편차). 데이터가 없으면 None."""
+    if track == 'naesin':
+        mu = db.get_naesin_avg(student_id)
+        if mu is None:
+            return None
+        terms = [t for t in db.get_term_gpa(student_id) if t['weighted_avg'] is not None]
+        n = len(terms)
+        if n < 2:
+            return mu, NAESIN_AVG_SIGMA_DEFAULT
+        avgs = np.array([t['weighted_avg'] for t in terms], dtype=np.float64)
+        weights = np.array([t['credit_sum'] for t in terms], dtype=np.float64)
+        var = np.average((avgs - mu) ** 2, weights=weights) * n / (n - 1)
+        return mu, max(float(np.sqrt(var / n)), NAESIN_AVG_SIGMA_MIN)
+
+    acts = db.get_activities(student_id)
+    if not acts:
+        return None
+    reviews = db.get_activity_reviews_for_student(student_id)
+    pending = sum(1 for r in reviews if r['status'] == 'pending')
+    return db.get_activity_strength(student_id), HOLISTIC_SIGMA_DEFAULT * (1 + pending / len(acts))
+
+
+def admission_probabilities(student_id, track):
+    """{department_id: 합격 확률(0~1)} — 학생 데이터나 컷이 바뀔 때만 다시 뽑는다."""
+    return read_cache.cached_value(db.DB_PATH, 'admission_probabilities', _PROBABILITY_TABLES[track],
+                                   (student_id, track),
+                                   lambda: _sample_probabilities(student_id, track))
+
+
+def _sample_probabilities(student_id, track):
+    dist = _student_distribution(student_id, track)
+    arr = _track_cutoff_arrays(track)
+    n = len(arr['ids'])
+    if dist is None or not n:
+        return {}
+    mu, sigma = dist
+    rng = np.random.default_rng(student_id)
+    student = rng.normal(mu, sigma, size=(MC_DRAWS, 1)).astype(np.float32)
+    if track == 'holistic':
+        np.clip(student, 0, 100, out=student)
+
+    probs = np.empty(n, dtype=np.float64)
+    for lo in range(0, n, MC_BLOCK):
+        hi = min(lo + MC_BLOCK, n)
+        noise = rng.standard_normal((MC_DRAWS, hi - lo), dtype=np.float32)
+        cut = (arr['cutoff'][lo:hi] + noise * arr['drift'][lo:hi]).astype(np.float32)
+        # 내신: 학생 평균 ≤ 컷(등급 낮을수록 우수) / 학종: 활동점수 ≥ 기준
+        admitted = student <= cut if track == 'naesin' else student >= cut
+        probs[lo:hi] = admitted.mean(axis=0)
+
+    return dict(zip(arr['ids'].tolist(), np.round(probs, 3).tolist()))
+
+
 # ─────────────────────────────────────────────────────────
 # 변화 계산
 # ─────────────────────────────────────────────────────────
@@ -1,47 +1,90 @@
-import os
+import functools
+import queue
 import random
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
-from openai import OpenAI
 import config
+import ai_cache
+import ai_client
+import ai_governor
+import database as db
 
 client = None
 
 def _openai_enabled() -> bool:
-    """session_state 토글 우선, 없으면 config.USE_OPENAI 기본값 사용."""
-    if "student_use_openai" in st.session_state:
-        return bool(st.session_state["student_use_openai"])
+    """session_state 토글 우선, 없으면(또는 Streamlit 밖 부하 테스트 등) config.USE_OPENAI 기본값 사용."""
+    try:
+        if "student_use_openai" in st.session_state:
+            return bool(st.session_state["student_use_openai"])
+    except Exception:
+        pass
     return config.USE_OPENAI
 
+def _student_caller():
+    """사용량 집계/한도용 호출자 (스크립트 스레드 또는 컨텍스트가 전달된 스레드에서 호출)."""
+    try:
+        student = st.session_state.get("student")
+        return 'student', (student or {}).get('id')
+    except Exception:
+        return 'student', None
+
+def _as_student(fn):
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        with ai_governor.caller(*_student_caller()):
+            return fn(*args, **kwargs)
+    return run
+
 def init_openai():
+    """공용 클라이언트 팩토리에서 클라이언트를 받아온다 (키 파일은 프로세스당 1회만 읽음)."""
     global client
-    api_key = os.environ.get('OPENAI_API_KEY')
-    # Streamlit secrets (클라우드 배포용)
-    if not api_key:
-        try:
-            import streamlit as st
-            api_key = st.secrets.get("OPENAI_API_KEY")
-        except Exception:
-            pass
-    if not api_key:
-        for filename in ['.env', 'api_key.txt']:
-            try:
-                base_dir = os.path.dirname(os.path.abspath(__file__))
-                filepath = os.path.join(base_dir, filename)
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        if line.startswith('OPENAI_API_KEY='):
-                            api_key = line.strip().split('=', 1)[1]
-                            break
-                    if api_key:
-                        break
-            except:
-                pass
-
-    if api_key:
-        client = OpenAI(api_key=api_key)
-
+    client = ai_client.get_client()
     return client is not None
 
+def _chat(func, model, messages, temperature, max_tokens, timeout=ai_client.DEFAULT_TIMEOUT):
+    """응답 캐시를 거쳐 chat completion 본문 텍스트를 반환. 오류는 호출부로 전파."""
+    def call():
+        return ai_client.chat_text(
+            model,
+            messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=timeout,
+            func=func
+        )
+    return ai_cache.cached_call(func, model, messages, call)
+
+QUESTION_CHUNK_SIZE = 5
+MAX_PARALLEL_CHUNKS = 6
+
+# 문제 묶음 생성용 / 페이지 보조 작업용 풀을 분리 (중첩 대기로 인한 교착 방지)
+_chunk_executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_CHUNKS, thread_name_prefix="ai-chunk")
+_task_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ai-task")
+
+
+def _with_script_ctx(fn):
+    """Streamlit 세션 컨텍스트를 작업 스레드에 전달 (session_state 접근용)."""
+    try:
+        from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+        ctx = get_script_run_ctx()
+    except Exception:
+        return fn
+
+    def run(*args, **kwargs):
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(*args, **kwargs)
+    return run
+
+
+def submit(fn, *args, **kwargs):
+    """독립적인 AI 호출(동기부여 문구 등)을 백그라운드에서 실행하고 Future 반환."""
+    return _task_executor.submit(_with_script_ctx(fn), *args, **kwargs)
+
+
+@_as_student
 def generate_questions(subject, grade, page_start, page_end, difficulty, exam_type, num_questions):
     if not _openai_enabled():
         mock_questions = []
@@ -55,12 +98,47 @@ def generate_questions(subject, grade, page_start, page_end, difficulty, exam_ty
     
     if not client:
         return None
-    
+
+    if num_questions <= QUESTION_CHUNK_SIZE:
+        return _generate_chunk(subject, grade, page_start, page_end, difficulty, exam_type, num_questions)
+
+    # 약 5문제씩 나눠 동시에 생성 → 합치고 번호 재부여
+    sizes = [QUESTION_CHUNK_SIZE] * (num_questions // QUESTION_CHUNK_SIZE)
+    if num_questions % QUESTION_CHUNK_SIZE:
+        sizes.append(num_questions % QUESTION_CHUNK_SIZE)
+    futures = [
+        _chunk_executor.submit(ai_governor.bind(_generate_chunk), subject, grade, page_start, page_end,
+                               difficulty, exam_type, size, idx + 1, len(sizes))
+        for idx, size in enumerate(sizes)
+    ]
+
+    questions = []
+    seen = set()
+    for f in futures:
+        for q in f.result() or []:
+            norm = ' '.join(q.get('question_text', '').split())
+            if norm in seen:
+                continue
+            seen.add(norm)
+            questions.append(q)
+
+    if not questions:
+        return None
+    for i, q in enumerate(questions[:num_questions], 1):
+        q['question_number'] = i
+    return questions[:num_questions]
+
+def _question_messages(subject, grade, page_start, page_end, difficulty, exam_type, num_questions,
+                       chunk_no=1, chunk_total=1):
     difficulty_map = {
         '쉬움': '쉬운',
         '보통': '중간',
         '어려움': '어려운'
     }
+
+    chunk_note = ""
+    if chunk_total > 1:
+        chunk_note = f"\n이 요청은 전체 {chunk_total}개 묶음 중 {chunk_no}번째 묶음입니다. 다른 묶음과 겹치지 않도록 이 범위의 서로 다른 내용을 다뤄주세요.\n"
     
     prompt = f"""
 당신은 {subject} 교육 전문가입니다.
@@ -71,7 +149,7 @@ def generate_questions(subject, grade, page_start, page_end, difficulty, exam_ty
 - 교과서 페이지: {page_start}p ~ {page_end}p
 - 난이도: {difficulty_map.get(difficulty, difficulty)}
 - 시험 유형: {exam_type}
-
+{chunk_note}
 문제는 객관식, 주관식, 서술형을 혼합하여 출제하세요.
 
 각 문제는 반드시 다음 형식을 따라주세요:
@@ -90,19 +168,24 @@ def generate_questions(subject, grade, page_start, page_end, difficulty, exam_ty
 
 정확히 {num_questions}개의 문제를 생성해주세요.
 """
-    
+    return [
+        {"role": "system", "content": "당신은 교육 문제 출제 전문가입니다."},
+        {"role": "user", "content": prompt}
+    ]
+
+def _generate_chunk(subject, grade, page_start, page_end, difficulty, exam_type, num_questions,
+                    chunk_no=1, chunk_total=1):
+    messages = _question_messages(subject, grade, page_start, page_end, difficulty, exam_type,
+                                  num_questions, chunk_no, chunk_total)
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "당신은 교육 문제 출제 전문가입니다."},
-                {"role": "user", "content": prompt}
-            ],
+        content = _chat(
+            'generate_questions',
+            "gpt-3.5-turbo",
+            messages,
             temperature=0.7,
-            max_tokens=3000
+            max_tokens=min(3000, 400 * num_questions + 200),
+            timeout=60
         )
-        
-        content = response.choices[0].message.content
         questions = parse_questions(content)
         
         return questions[:num_questions]
@@ -111,71 +194,199 @@ def generate_questions(subject, grade, page_start, page_end, difficulty, exam_ty
         print(f"OpenAI API 오류: {e}")
         return None
 
-def parse_questions(content):
-    import re
-    questions = []
-    lines = content.strip().split('\n')
+def _stream_chunk(subject, grade, page_start, page_end, difficulty, exam_type, num_questions,
+                  chunk_no=1, chunk_total=1):
+    """stream=True 로 받아 문제 블록이 완성될 때마다 yield."""
+    messages = _question_messages(subject, grade, page_start, page_end, difficulty, exam_type,
+                                  num_questions, chunk_no, chunk_total)
+    parser = QuestionStreamParser()
+    emitted = 0
+    stream = ai_client.chat_completion(
+        "gpt-3.5-turbo",
+        messages,
+        temperature=0.7,
+        max_tokens=min(3000, 400 * num_questions + 200),
+        timeout=60,
+        stream=True,
+        func='generate_questions'
+    )
+    try:
+        for event in stream:
+            if not event.choices:
+                continue
+            delta = event.choices[0].delta.content
+            if not delta:
+                continue
+            for q in parser.feed(delta):
+                yield q
+                emitted += 1
+                if emitted >= num_questions:
+                    return
+    finally:
+        stream.close()  # 중간에 끝나도 거버너 슬롯 반환
+    for q in parser.close():
+        if emitted >= num_questions:
+            return
+        yield q
+        emitted += 1
+
+def generate_questions_stream(subject, grade, page_start, page_end, difficulty, exam_type, num_questions):
+    """
+    generate_questions 의 스트리밍 버전. 완성된 문제를 하나씩(번호 부여) 내보내는 iterator 반환.
+    AI ON/OFF 판단은 호출 시점(스크립트 스레드)에서 하므로 iterator 는 다른 스레드에서 소비해도 된다.
+    """
+    if not _openai_enabled():
+        return iter(generate_questions(subject, grade, page_start, page_end,
+                                       difficulty, exam_type, num_questions))
+    if not client:
+        return iter(())
+    return _stream_questions(subject, grade, page_start, page_end, difficulty, exam_type, num_questions,
+                             _student_caller())
+
+def _stream_questions(subject, grade, page_start, page_end, difficulty, exam_type, num_questions, who):
+    sizes = [QUESTION_CHUNK_SIZE] * (num_questions // QUESTION_CHUNK_SIZE)
+    if num_questions % QUESTION_CHUNK_SIZE:
+        sizes.append(num_questions % QUESTION_CHUNK_SIZE)
+
+    # 묶음별 스트림을 병렬로 돌리고, 먼저 완성된 문제부터 큐로 받는다
+    out = queue.Queue()
+    done_marker = object()
+
+    def pump(size, chunk_no):
+        try:
+            with ai_governor.caller(*who):
+                for q in _stream_chunk(subject, grade, page_start, page_end, difficulty, exam_type,
+                                       size, chunk_no, len(sizes)):
+                    out.put(q)
+        except Exception as e:
+            print(f"OpenAI API 오류: {e}")
+        finally:
+            out.put(done_marker)
 
-    current_question = None
-    current_text = []
+    for idx, size in enumerate(sizes):
+        _chunk_executor.submit(pump, size, idx + 1)
+
+    remaining = len(sizes)
+    number = 0
+    seen = set()
+    while remaining:
+        q = out.get()
+        if q is done_marker:
+            remaining -= 1
+            continue
+        norm = ' '.join(q.get('question_text', '').split())
+        if norm in seen or number >= num_questions:
+            continue
+        seen.add(norm)
+        number += 1
+        q['question_number'] = number
+        yield q
+
+class QuestionStreamParser:
+    """
+    parse_questions 의 증분 버전.
+    feed() 로 조각을 넣으면 '해설:' 줄까지 완성된 문제를 즉시 반환하고,
+    close() 는 남은 문제(해설 없이 끝난 문제 포함)를 반환한다.
+    정답 뒤의 태그 없는 줄은 임시 해설일 뿐이며, 뒤에 '해설:' 이 오면 덮어쓴다.
+    """
 
     # "문제 N" 또는 "**문제 N**" 또는 "문제N:" 등 다양한 형식 인식
-    question_header = re.compile(r'^\**문제\s*\d+\**[:\.]?\s*$', re.IGNORECASE)
+    _header = re.compile(r'^\**문제\s*\d+\**[:\.]?\s*$', re.IGNORECASE)
+
+    def __init__(self):
+        self._buf = ''
+        self._current = None
+        self._text = []
+        self._emitted = False
+        self._tagged_exp = False
+
+    def feed(self, chunk):
+        self._buf += chunk
+        out = []
+        while '\n' in self._buf:
+            line, self._buf = self._buf.split('\n', 1)
+            self._line(line, out)
+        return out
 
-    def flush():
-        nonlocal current_text
-        if current_question is not None:
-            txt = '\n'.join(t for t in current_text if t).strip()
+    def close(self):
+        out = []
+        if self._buf:
+            self._line(self._buf, out)
+            self._buf = ''
+        if self._current is not None and not self._emitted:
+            txt = '\n'.join(t for t in self._text if t).strip()
+            if txt and not self._current.get('question_text'):
+                self._current['question_text'] = txt
+            out.append(self._current)
+        self._current = None
+        self._text = []
+        return out
+
+    def _flush(self, out):
+        if self._current is not None and not self._emitted:
+            txt = '\n'.join(t for t in self._text if t).strip()
             if txt:
-                current_question['question_text'] = txt
-            questions.append(current_question)
-        current_text = []
+                self._current['question_text'] = txt
+            out.append(self._current)
+        self._text = []
 
-    for line in lines:
+    def _line(self, line, out):
         clean = line.strip()
         # 마크다운 볼드 제거
         clean_no_md = re.sub(r'\*+', '', clean).strip()
+        cur = self._current
 
         # 문제 헤더 감지: "문제 N" / "문제 N:" / "**문제 N**" 등
-        is_header = bool(question_header.match(clean_no_md)) or (
+        is_header = bool(self._header.match(clean_no_md)) or (
             re.match(r'^문제\s*\d+', clean_no_md) and (':' in clean or clean_no_md == re.match(r'^문제\s*\d+', clean_no_md).group())
         )
 
         if is_header:
-            if current_question is not None:
-                flush()
-            current_question = {'question_text': '', 'answer': '', 'explanation': ''}
-            current_text = []
-
-        elif re.match(r'^정답\s*:', clean_no_md):
-            if current_question is not None:
-                txt = '\n'.join(t for t in current_text if t).strip()
-                if txt:
-                    current_question['question_text'] = txt
-                current_text = []
-                current_question['answer'] = re.sub(r'^정답\s*:', '', clean_no_md).strip()
+            if cur is not None:
+                self._flush(out)
+            self._current = {'question_text': '', 'answer': '', 'explanation': ''}
+            self._text = []
+            self._emitted = False
+            self._tagged_exp = False
+            return
+
+        if cur is None or self._emitted:
+            return
+
+        if re.match(r'^정답\s*:', clean_no_md):
+            txt = '\n'.join(t for t in self._text if t).strip()
+            if txt:
+                cur['question_text'] = txt
+            self._text = []
+            cur['answer'] = re.sub(r'^정답\s*:', '', clean_no_md).strip()
 
         elif re.match(r'^해설\s*:', clean_no_md):
-            if current_question is not None:
-                exp = re.sub(r'^해설\s*:', '', clean_no_md).strip()
-                current_question['explanation'] = exp
-
-        else:
-            if current_question is not None:
-                if not current_question.get('answer'):
-                    current_text.append(clean)
-                elif not current_question.get('explanation') and clean:
-                    current_question['explanation'] = (current_question.get('explanation', '') + ' ' + clean).strip()
-
-    if current_question is not None:
-        txt = '\n'.join(t for t in current_text if t).strip()
-        if txt and not current_question.get('question_text'):
-            current_question['question_text'] = txt
-        questions.append(current_question)
+            cur['explanation'] = re.sub(r'^해설\s*:', '', clean_no_md).strip()
+            self._tagged_exp = True
+
+        elif not cur.get('answer'):
+            self._text.append(clean)
+        elif not cur.get('explanation') and clean:
+            cur['explanation'] = (cur.get('explanation', '') + ' ' + clean).strip()
+
+        # 정답과 '해설:' 줄이 모두 나와야 블록 완성 → 바로 내보냄 (임시 해설로는 내보내지 않음)
+        if cur.get('answer') and self._tagged_exp and cur.get('explanation'):
+            out.append(cur)
+            self._emitted = True
 
+def parse_questions(content):
+    parser = QuestionStreamParser()
+    questions = parser.feed(content.strip())
+    questions.extend(parser.close())
     return questions
 
+@_as_student
 def search_content(subject, search_term):
+    search_term = ai_cache.normalize_text(search_term)
+    # 학교 공용 설명 저장소에 있으면 API 호출 없이 바로 (AI OFF 여도 실제 설명 제공)
+    stored = db.get_definition(subject, search_term)
+    if stored:
+        return stored
     if not _openai_enabled():
         return f"[{subject}] '{search_term}'에 대한 테스트 설명입니다. OpenAI OFF 상태에서는 Mock 데이터가 표시됩니다."
     
@@ -197,21 +408,30 @@ def search_content(subject, search_term):
     prompt = f"{subject} 과목에서 '{search_term}'에 대해 학생이 이해하기 쉽게 간단명료하게 설명해주세요. ({context} 중심으로)"
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
+        content = _chat(
+            'search_content',
+            "gpt-3.5-turbo",
+            [
                 {"role": "system", "content": f"당신은 {subject} 교육 전문가입니다."},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.7,
-            max_tokens=300
+            max_tokens=300,
+            timeout=8
         )
         
-        return response.choices[0].message.content.strip()
+        content = content.strip()
+        db.save_definition(subject, search_term, content)
+        return content
     
+    except ai_governor.BudgetExceeded:
+        return f"[AI 사용 한도] 오늘 AI 검색 한도를 모두 사용했습니다. '{search_term}' 설명은 내일 다시 검색해 주세요."
+    except (ai_client.CircuitOpenError, ai_client.DeadlineExceeded):
+        return f"[AI 응답 지연] '{search_term}' 설명을 지금 가져오지 못했습니다. 잠시 후 다시 검색해 주세요."
     except Exception as e:
         return f"검색 오류: {e}"
 
+@_as_student
 def generate_motivation_message(context="시작"):
     if not _openai_enabled():
         mock_messages = [
@@ -232,21 +452,24 @@ def generate_motivation_message(context="시작"):
         prompt = "학생이 문제를 제출한 후 격려하고 동기부여하는 짧은 메시지를 하나 생성해주세요. (1-2문장)"
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
+        content = _chat(
+            'generate_motivation_message',
+            "gpt-3.5-turbo",
+            [
                 {"role": "system", "content": "당신은 학생을 격려하는 선생님입니다."},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.8,
-            max_tokens=100
+            max_tokens=100,
+            timeout=5
         )
         
-        return response.choices[0].message.content.strip()
+        return content.strip()
     
     except Exception as e:
         return "열심히 공부해봅시다!"
 
+@_as_student
 def generate_book_recommendations():
     if not _openai_enabled():
         return [
@@ -278,17 +501,17 @@ def generate_book_recommendations():
 """
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
+        content = _chat(
+            'generate_book_recommendations',
+            "gpt-3.5-turbo",
+            [
                 {"role": "system", "content": "당신은 도서 추천 전문가입니다."},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.7,
-            max_tokens=500
-        )
-        
-        content = response.choices[0].message.content.strip()
+            max_tokens=500,
+            timeout=15
+        ).strip()
         books = []
         
         for line in content.split('\n'):
@@ -9,9 +9,13 @@ if _root not in sys.path:
 
 import database as db
 import openai_helper as ai
+import question_bank as qb
+import question_similarity as qsim
+from pagination import lazy_rows, more_button
 import config
 from datetime import datetime, timedelta
 import sqlite3 as _sqlite3
+import time
 
 st.set_page_config(
     page_title="학생 (정시)",
@@ -34,6 +38,7 @@ if 'student_use_openai' not in st.session_state:
 
 db.init_database()
 ai_initialized = ai.init_openai()
+qsim.warm_up()
 
 # ── 태블릿/모바일 최적화 CSS ────────────────────────────────────
 st.markdown("""
@@ -172,7 +177,7 @@ def _get_week_progress(student_id, week_start, week_end):
     con = _sqlite3.connect(os.path.join(_root, "student_system.db"))
     rows = con.execute(
         """SELECT ss.subject, COUNT(q.id) as cnt
-           FROM study_sessions ss JOIN questions q ON q.session_id=ss.id
+           FROM study_sessions ss JOIN session_questions q ON q.session_id=ss.id
            WHERE ss.student_id=? AND substr(ss.created_at,1,10) BETWEEN ? AND ?
            GROUP BY ss.subject""",
         (student_id, week_start, week_end)
@@ -180,19 +185,6 @@ def _get_week_progress(student_id, week_start, week_end):
     con.close()
     return {r[0]: r[1] for r in rows}
 
-def _get_wrong_notes(student_id):
-    con = _sqlite3.connect(os.path.join(_root, "student_system.db"))
-    rows = con.execute(
-        """SELECT q.id, q.question_number, q.question_text, q.answer, q.explanation,
-                  ss.subject, ss.grade, substr(ss.created_at,1,10) as study_date
-           FROM questions q JOIN study_sessions ss ON ss.id=q.session_id
-           WHERE ss.student_id=? AND q.is_correct=0
-           ORDER BY ss.created_at DESC""",
-        (student_id,)
-    ).fetchall()
-    con.close()
-    return [dict(zip(["id","question_number","question_text","answer","explanation","subject","grade","study_date"], r)) for r in rows]
-
 def show_wrong_notes():
     student = st.session_state.student
     show_ai_status()
@@ -202,37 +194,80 @@ def show_wrong_notes():
         st.session_state.current_page = 'dashboard'
         st.rerun()
     st.divider()
-    wrongs = _get_wrong_notes(student['id'])
-    if not wrongs:
+    wrong_counts = db.count_wrong_notes(student['id'])
+    if not wrong_counts:
         st.success("🎉 오답 노트가 비어있습니다! 모든 문제를 맞혔어요.")
         return
-    st.info(f"총 **{len(wrongs)}개**의 오답이 있습니다. 하나씩 정복해봐요! 💪")
+    st.info(f"총 **{sum(wrong_counts.values())}개**의 오답이 있습니다. 하나씩 정복해봐요! 💪")
     SUBJECTS = ["국어","영어","수학","과학","사회","역사","한자"]
-    by_subject = {}
-    for w in wrongs:
-        s = w["subject"]
-        by_subject.setdefault(s, []).append(w)
-    tabs_labels = [f"{s} ({len(by_subject[s])}개)" for s in SUBJECTS if s in by_subject]
-    other = [w for w in wrongs if w["subject"] not in SUBJECTS]
-    if other:
-        tabs_labels.append(f"기타 ({len(other)}개)")
-    if not tabs_labels:
-        st.warning("오답 데이터가 없습니다.")
-        return
-    tabs = st.tabs(tabs_labels)
-    subj_list = [s for s in SUBJECTS if s in by_subject] + (["기타"] if other else [])
+
+    # 간격 반복: 오늘 복습할 차례가 된 오답만 (맞히면 간격이 늘어나고, 틀리면 내일 다시)
+    due_count = db.count_due_reviews(student['id'])
+    with st.container(border=True):
+        if due_count:
+            st.markdown(f"**📅 오늘의 복습** — 복습할 차례가 된 오답 **{due_count}개**")
+            if st.button("▶ 오늘 복습 시작 (최대 20문제)", use_container_width=True, key="due_review_start"):
+                session_id = db.create_due_review_session(student['id'], limit=20)
+                if session_id:
+                    _enter_solve(session_id)
+        else:
+            st.markdown("**📅 오늘의 복습** — 오늘 복습할 문제가 없습니다. 👍")
+
+    # 오답 복습 세션: 저장된 문항을 그대로 다시 출제 (AI 생성 없음, 바로 시작)
+    with st.container(border=True):
+        st.markdown("**🔄 오답 복습 세션** — 최근에 틀린 문제부터 다시 풀어봅니다.")
+        rc1, rc2, rc3 = st.columns(3)
+        with rc1:
+            retry_subject = st.selectbox("과목", ["전체"] + SUBJECTS, key="retry_subject")
+        with rc2:
+            retry_period = st.selectbox("기간", ["전체", "최근 7일", "최근 30일"], key="retry_period")
+        with rc3:
+            retry_count = st.number_input("문제 수", min_value=1, max_value=30, value=10, key="retry_count")
+        if st.button("▶ 바로 복습 시작", use_container_width=True, key="retry_start"):
+            days = {"최근 7일": 7, "최근 30일": 30}.get(retry_period)
+            session_id = db.create_retry_session(
+                student['id'],
+                subject=None if retry_subject == "전체" else retry_subject,
+                date_from=(datetime.now() - timedelta(days=days - 1)).strftime("%Y-%m-%d") if days else None,
+                limit=retry_count,
+            )
+            if session_id:
+                _enter_solve(session_id)
+            else:
+                st.warning("조건에 맞는 오답이 없습니다.")
+    # 과목 탭마다 최근 오답부터 한 페이지씩 ('더 보기'로 이어서)
+    subj_list = [s for s in SUBJECTS if s in wrong_counts] + sorted(s for s in wrong_counts if s not in SUBJECTS)
+    tabs = st.tabs([f"{s} ({wrong_counts[s]}개)" for s in subj_list])
     for tab, subj in zip(tabs, subj_list):
         with tab:
-            items = by_subject.get(subj, other if subj=="기타" else [])
+            items, has_more = lazy_rows(
+                f"wrong_notes_{subj}",
+                lambda n, c, subj=subj: db.get_wrong_notes_page(student['id'], subj, n, c),
+                reset_token=student['id'])
             for idx, w in enumerate(items):
                 with st.expander(f"❌ [{w['study_date']}] 문제 {w['question_number']} | {w['subject']} {w['grade']}"):
                     st.markdown(f"**문제:** {w['question_text'] or '(내용 없음)'}")
                     st.success(f"**정답:** {w['answer']}")
                     if w['explanation']:
                         st.info(f"**해설:** {w['explanation']}")
-                    if st.button("🔄 이 문제 다시 풀기", key=f"retry_{w['id']}_{idx}"):
-                        st.session_state['retry_question'] = w
-                        st.info("다시 풀기 기능: 새 학습 시작에서 같은 과목을 선택하세요.")
+                    bc1, bc2 = st.columns(2)
+                    with bc1:
+                        if st.button("🔄 이 문제 다시 풀기", key=f"retry_{w['id']}_{idx}"):
+                            session_id = db.create_retry_session(student['id'], question_ids=[w['id']])
+                            if session_id:
+                                _enter_solve(session_id)
+                    with bc2:
+                        if st.button("🔍 비슷한 문제 보기", key=f"similar_{w['id']}_{idx}"):
+                            st.session_state[f"show_similar_{w['id']}"] = True
+                    if st.session_state.get(f"show_similar_{w['id']}"):
+                        similar = qsim.similar_questions(w['id'], k=3)
+                        if not similar:
+                            st.caption("비슷한 지난 문제가 아직 없습니다.")
+                        for j, sq in enumerate(similar, 1):
+                            st.markdown(f"**비슷한 문제 {j}** (유사도 {sq['similarity']:.0%})")
+                            st.markdown(sq['question_text'] or '(내용 없음)')
+                            st.caption(f"정답: {sq['answer']} | 해설: {sq['explanation']}")
+            more_button(f"wrong_notes_{subj}", has_more)
 
 def show_study_goals():
     student = st.session_state.student
@@ -376,6 +411,19 @@ def show_dashboard():
 
 
 # ── 새로운 학습 ───────────────────────────────────────────────
+def _enter_solve(session_id):
+    st.session_state.current_session_id = session_id
+    st.session_state.questions = db.get_session_questions(session_id)
+    st.session_state.user_answers = {}
+    st.session_state.submitted = False
+    # 이전 검색 결과 초기화
+    for key in list(st.session_state.keys()):
+        if key.startswith("search_result_"):
+            del st.session_state[key]
+    st.session_state.current_page = 'solve'
+    st.rerun()
+
+
 def show_new_study():
     st.title("🆕 새로운 학습 시작")
 
@@ -383,6 +431,21 @@ def show_new_study():
 
     if not st.session_state.student_use_openai:
         st.info("AI OFF 상태: Mock 문제가 생성됩니다.")
+    else:
+        # 지난 풀이 중 미리 만들어 둔 다음 범위 세트 → 생성 대기 없이 시작
+        pending = qb.get_prefetched(st.session_state.student['id'])
+        if pending:
+            st.success(
+                f"⚡ 다음 학습이 준비되어 있습니다: {pending['subject']} {pending['grade']} · "
+                f"{pending['page_start']}~{pending['page_end']}p · {pending['difficulty']} · "
+                f"{pending['exam_type']} · {pending['num_questions']}문제"
+            )
+            if st.button("⚡ 준비된 문제로 바로 시작", use_container_width=True):
+                session_id = qb.start_prefetched_session(st.session_state.student['id'], pending['id'])
+                if session_id:
+                    _enter_solve(session_id)
+                else:
+                    st.warning("준비된 문제가 만료되었습니다. 아래에서 새로 생성해 주세요.")
 
     with st.form("study_form"):
         col1, col2 = st.columns(2)
@@ -405,44 +468,36 @@ def show_new_study():
             if page_end < page_start:
                 st.error("끝 페이지는 시작 페이지보다 커야 합니다.")
             else:
-                motivation = ai.generate_motivation_message("시작")
-                st.success(f"💬 {motivation}")
+                # 동기부여 문구는 문제 생성과 동시에 요청
+                motivation_future = ai.submit(ai.generate_motivation_message, "시작")
 
                 with st.spinner("문제를 생성하고 있습니다..."):
-                    raw_questions = ai.generate_questions(
+                    # 문제 은행에서 안 본 문제를 먼저 채우고 부족분만 스트리밍 생성
+                    question_iter = qb.stream_question_set(
+                        st.session_state.student['id'],
+                        subject, grade, page_start, page_end,
+                        difficulty, exam_type, num_questions,
+                        use_bank=st.session_state.student_use_openai
+                    )
+                    session_id = db.create_study_session(
+                        st.session_state.student['id'],
                         subject, grade, page_start, page_end,
                         difficulty, exam_type, num_questions
                     )
-
-                    if raw_questions and len(raw_questions) > 0:
-                        # question_text 키 통일
-                        questions = []
-                        for i, q in enumerate(raw_questions, 1):
-                            questions.append({
-                                "question_number": i,
-                                "question_text": q.get("question_text") or q.get("question", f"문제 {i}"),
-                                "answer": q.get("answer", ""),
-                                "explanation": q.get("explanation", ""),
-                            })
-
-                        session_id = db.create_study_session(
-                            st.session_state.student['id'],
-                            subject, grade, page_start, page_end,
-                            difficulty, exam_type, len(questions)
-                        )
-
-                        db.save_questions(session_id, questions)
-
-                        st.session_state.current_session_id = session_id
-                        st.session_state.questions = db.get_session_questions(session_id)
-                        st.session_state.user_answers = {}
-                        st.session_state.submitted = False
-                        # 이전 검색 결과 초기화
-                        for key in list(st.session_state.keys()):
-                            if key.startswith("search_result_"):
-                                del st.session_state[key]
-                        st.session_state.current_page = 'solve'
-                        st.rerun()
+                    # 완성된 문제부터 백그라운드에서 저장 → 첫 문제가 나오면 바로 풀이 화면으로
+                    qb.start_streaming_session(session_id, question_iter, num_questions)
+                    ready = qb.wait_first_question(session_id)
+                    if ready == 0:
+                        # 시간 초과/실패: 생성을 멈추고 세션을 지움 (그 사이 첫 문제가 나왔으면 그대로 진행)
+                        ready = qb.cancel_streaming_session(session_id)
+
+                    try:
+                        st.success(f"💬 {motivation_future.result(timeout=10)}")
+                    except Exception:
+                        pass
+
+                    if ready > 0:
+                        _enter_solve(session_id)
                     else:
                         st.error("문제 생성에 실패했습니다. 다시 시도해주세요.")
 
@@ -462,12 +517,31 @@ def show_solve_questions():
             st.rerun()
         return
 
+    # 스트리밍 생성 중이면 그 사이 저장된 문제를 이어서 불러옴
+    stream_job = qb.stream_status(st.session_state.current_session_id)
+    generating = bool(stream_job and not stream_job['done'])
+    if stream_job and stream_job['count'] != len(st.session_state.questions):
+        st.session_state.questions = db.get_session_questions(st.session_state.current_session_id)
+
     session_info = db.get_connection().execute(
         'SELECT * FROM study_sessions WHERE id = ?',
         (st.session_state.current_session_id,)
     ).fetchone()
 
     st.info(f"**과목**: {session_info['subject']} | **학년**: {session_info['grade']} | **난이도**: {session_info['difficulty']} | **문제 수**: {len(st.session_state.questions)}개")
+    if generating:
+        st.progress(stream_job['count'] / max(stream_job['total'], 1),
+                    text=f"문제 생성 중... {stream_job['count']}/{stream_job['total']}")
+    elif st.session_state.student_use_openai and session_info['exam_type'] != db.RETRY_EXAM_TYPE:
+        # 현재 세트 생성이 끝나면 다음 범위 세트를 백그라운드에서 미리 생성 (세션당 1회)
+        prefetch_flag = f"prefetch_started_{st.session_state.current_session_id}"
+        if prefetch_flag not in st.session_state:
+            st.session_state[prefetch_flag] = True
+            qb.submit_prefetch(st.session_state.student['id'],
+                               session_info['subject'], session_info['grade'],
+                               session_info['page_start'], session_info['page_end'],
+                               session_info['difficulty'], session_info['exam_type'],
+                               len(st.session_state.questions))
     st.divider()
 
     for q in st.session_state.questions:
@@ -557,7 +631,7 @@ def show_solve_questions():
     col_submit, col_back = st.columns([1, 1])
 
     with col_submit:
-        if st.button("✅ 제출하기", use_container_width=True):
+        if st.button("✅ 제출하기", use_container_width=True, disabled=generating):
             correct_count = db.submit_answers(
                 st.session_state.current_session_id,
                 st.session_state.user_answers
@@ -574,6 +648,11 @@ def show_solve_questions():
             st.session_state.questions = []
             st.rerun()
 
+    if generating:
+        # 나머지 문제가 저장되는 대로 화면에 추가
+        time.sleep(1)
+        st.rerun()
+
 
 # ── 결과 ─────────────────────────────────────────────────────
 def show_result():
@@ -591,8 +670,11 @@ def show_result():
     correct = st.session_state.correct_count
     score = round((correct / total) * 100, 1) if total > 0 else 0
 
-    motivation = ai.generate_motivation_message("완료")
-    st.success(f"💬 {motivation}")
+    # 결과 화면 재실행마다 API를 다시 부르지 않도록 세션 ID 기준으로 보관
+    motivation_key = f"result_motivation_{st.session_state.current_session_id}"
+    if motivation_key not in st.session_state:
+        st.session_state[motivation_key] = ai.generate_motivation_message("완료")
+    st.success(f"💬 {st.session_state[motivation_key]}")
 
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -673,18 +755,29 @@ def show_vocabulary():
     student_id = st.session_state.student['id']
     subjects = ['전체', '국어', '영어', '수학', '과학', '사회', '역사', '한자']
     selected_subject = st.selectbox("과목 선택", subjects)
-
-    if selected_subject == '전체':
-        history = db.get_search_history(student_id)
+    keyword = st.text_input("🔎 단어장 검색", placeholder="단어나 설명 속 표현 (여러 단어는 공백으로 구분)",
+                            key="vocab_search").strip()
+    subject_filter = None if selected_subject == '전체' else selected_subject
+
+    has_more = False
+    if keyword:
+        history = db.search_vocabulary(student_id, keyword, subject_filter)
+        st.caption(f"'{keyword}' 검색 결과 {len(history)}건 (관련도 순)")
     else:
-        history = db.get_search_history(student_id, selected_subject)
+        history, has_more = lazy_rows(
+            "vocabulary",
+            lambda n, c: db.get_search_history_page(student_id, subject_filter, n, c),
+            reset_token=(student_id, subject_filter))
 
     if not history:
-        st.info("저장된 단어가 없습니다.")
+        st.info("검색 결과가 없습니다." if keyword else "저장된 단어가 없습니다.")
     else:
         for item in history:
             with st.expander(f"[{item['subject']}] {item['search_term']} - {item['created_at'][:10]}"):
+                if keyword and item.get('snippet'):
+                    st.caption(item['snippet'])
                 st.write(item['result_text'])
+        more_button("vocabulary", has_more)
 
     if st.button("← 돌아가기"):
         st.session_state.current_page = 'dashboard'
@@ -696,7 +789,27 @@ def show_history():
     st.title("📊 학습 이력")
 
     student_id = st.session_state.student['id']
-    history = db.get_study_history(student_id)
+
+    # 지난 문제 검색 (문제/해설 전문 검색)
+    with st.container(border=True):
+        st.markdown("**🔎 지난 문제 검색**")
+        qc1, qc2 = st.columns([3, 1])
+        with qc1:
+            q_keyword = st.text_input("검색어", placeholder="예: 이차함수 꼭짓점", key="question_search").strip()
+        with qc2:
+            q_wrong_only = st.checkbox("오답만", key="question_search_wrong")
+        if q_keyword:
+            found = db.search_questions(student_id, q_keyword, wrong_only=q_wrong_only)
+            st.caption(f"'{q_keyword}' 검색 결과 {len(found)}건 (관련도 순)")
+            for q in found:
+                status = "✅" if q['is_correct'] else "❌"
+                with st.expander(f"{status} [{q['created_at'][:10]}] {q['subject']} 문제 {q['question_number']} — {q['snippet']}"):
+                    st.markdown(q['question_text'] or '(내용 없음)')
+                    st.write(f"**정답:** {q['answer']}")
+                    st.write(f"**해설:** {q['explanation']}")
+
+    history, has_more = lazy_rows(
+        "study_history", lambda n, c: db.get_study_history_page(student_id, n, c), reset_token=student_id)
 
     if not history:
         st.info("학습 이력이 없습니다.")
@@ -718,6 +831,7 @@ def show_history():
                     st.rerun()
 
             st.divider()
+        more_button("study_history", has_more)
 
         if 'view_session_id' in st.session_state:
             st.subheader("문제 상세")
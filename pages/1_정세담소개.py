@@ -164,11 +164,11 @@ def _safe_query(sql, params=()):
         return 0
 
 total_sessions = _safe_query("SELECT COUNT(*) FROM study_sessions")
-total_questions = _safe_query("SELECT COUNT(*) FROM questions")
-total_correct = _safe_query("SELECT SUM(CASE WHEN is_correct=1 THEN 1 ELSE 0 END) FROM questions")
+total_questions = _safe_query("SELECT COUNT(*) FROM session_questions")
+total_correct = _safe_query("SELECT SUM(CASE WHEN is_correct=1 THEN 1 ELSE 0 END) FROM session_questions")
 total_students = _safe_query("SELECT COUNT(*) FROM students")
 total_psych = _safe_query("SELECT COUNT(*) FROM psychological_tests")
-total_vocab = _safe_query("SELECT COUNT(*) FROM search_history")
+total_vocab = _safe_query("SELECT COUNT(*) FROM student_vocabulary")
 total_study_days = _safe_query("SELECT COUNT(DISTINCT substr(created_at,1,10) || '-' || student_id) FROM study_sessions")
 
 overall_rate = round(total_correct / total_questions * 100, 1) if total_questions > 0 else 0
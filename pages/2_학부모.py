@@ -180,9 +180,10 @@ def fetch_sessions(con, student_id: int, start_date: Optional[str] = None, end_d
             ss.subject          AS subject,
             ss.created_at       AS created_at,
             q.is_correct        AS is_correct,
-            q.question_text     AS concept
+            c.question_text     AS concept
         FROM study_sessions ss
-        LEFT JOIN questions q ON q.session_id = ss.id
+        LEFT JOIN session_questions q ON q.session_id = ss.id
+        LEFT JOIN question_content c ON c.id = q.content_id
         WHERE ss.student_id = ?
     """
     params: list = [student_id]
@@ -464,6 +465,10 @@ def set_monthly_books(parent_id: int, student_id: int, ym: str, force_refresh: b
 def today_key() -> str:
     return dt.date.today().isoformat()
 
+def batch_key() -> str:
+    """야간 일괄 생성(report_batch, 23:30)이 마지막으로 저장한 기준일 = 어제."""
+    return (dt.date.today() - dt.timedelta(days=1)).isoformat()
+
 def get_today_summary(student_id: int) -> Dict[str, Any]:
     con = get_conn()
     try:
@@ -619,6 +624,72 @@ def get_ai_log(parent_id: int, student_id: int, log_type: str, period_key: str)
     finally:
         con.close()
 
+# =========================
+# 오늘의 부모 섹션(5~8) 프롬프트
+# - 섹션별 버튼과 '한 번에 생성'이 같은 프롬프트를 사용
+# =========================
+def guide_prompt(today: Dict[str, Any], display_rows: List[Dict]) -> str:
+    return f"""
+너는 학부모를 돕는 교육 코치다. 통제/압박/낙인 금지. 동행/루틴/회복 관점.
+[오늘 요약]
+- 학습 기록 수: {today['sessions']}
+- 문항 수: {today['questions']}
+- 정답률: {today['correct_rate']}
+- 과목 수: {today['subjects']}
+[오늘 과목별 학습 현황] {", ".join([f"{r['과목']}({r['정답률(%)']}%)" for r in display_rows if r['총 문항 수'] > 0][:5]) if display_rows else "데이터 없음"}
+
+요구:
+1) 부모 행동 가이드 5개(각 1줄, 현실적)
+2) '오늘은 무엇을 하면 충분한지' 최소 기준 1개
+3) 압박 대신 지속을 만드는 문장 2개
+"""
+
+def talk_prompt(today: Dict[str, Any]) -> str:
+    return f"""
+학부모가 아이에게 '공부 압박' 없이 대화하기 위한 질문을 만들어라.
+오늘 문항수={today['questions']}, 정답률={today['correct_rate']}, 과목수={today['subjects']}
+요구:
+- 질문 6개 (칭찬형 2, 점검형 2, 회복형 2)
+- 말투는 단단하고 짧게
+"""
+
+def together_prompt() -> str:
+    return """
+오늘 학습을 기준으로 부모와 아이가 함께 할 수 있는 실생활 학습 행동을 제안해라.
+요구:
+- 5개 제안
+- 각 제안마다 '실생활 문제 예시 1개' 포함
+- 부담 없는 난이도, 10분~15분 단위
+"""
+
+def support_prompt() -> str:
+    return """
+학부모가 아이의 정서적 부담을 낮추도록 돕는 메시지를 작성해라.
+금지: 진단/낙인/비교/협박.
+요구:
+- 부모에게 주는 메시지 4문장
+- 아이에게 해줄 수 있는 말 3문장
+- '오늘은 여기까지만 해도 충분' 같은 마무리 1문장
+"""
+
+def generate_today_sections(parent_id: int, student_id: int, prompts: Dict[str, str], period_key: str) -> Dict[str, str]:
+    """
+    여러 섹션을 한 번의 AI 호출(JSON 응답)로 생성해 섹션별 parent_ai_log_v2 행으로 저장.
+    통합 호출이 불가하면(OFF/오류/검증 실패) 섹션별 생성으로 대체.
+    """
+    results = None
+    if st.session_state.get("use_openai", False):
+        try:
+            import parent_ai_helper  # type: ignore
+            results = parent_ai_helper.generate_ai_sections(prompts)
+        except Exception:
+            results = None
+    if not results:
+        results = {k: try_ai_generate(p) for k, p in prompts.items()}
+    for log_type, content in results.items():
+        upsert_ai_log(parent_id, student_id, log_type, period_key, content)
+    return results
+
 # =========================
 # 심리(요구사항: "심리학 항목" 기반)
 # - 기존 psychological_tests 테이블이 있으면 활용
@@ -713,7 +784,7 @@ def psych_today_and_week(student_id: int) -> Tuple[pd.DataFrame, pd.DataFrame]:
         con.close()
     return df_today, df_week
 
-def ai_analyze_psych(df_today: pd.DataFrame, df_week: pd.DataFrame) -> str:
+def psych_prompt(df_today: pd.DataFrame, df_week: pd.DataFrame) -> str:
     # 데이터 요약
     def summarize(df: pd.DataFrame) -> str:
         if df.empty:
@@ -736,7 +807,10 @@ def ai_analyze_psych(df_today: pd.DataFrame, df_week: pd.DataFrame) -> str:
 2) 오늘 부모가 할 행동 2개(현실적, 10분 단위)
 3) 위험/주의 같은 단어 대신 '지원 필요도' 관점 문장 1개
 """
-    return try_ai_generate(prompt)
+    return prompt
+
+def ai_analyze_psych(df_today: pd.DataFrame, df_week: pd.DataFrame) -> str:
+    return try_ai_generate(psych_prompt(df_today, df_week))
 
 # =========================
 # 대학 추천(필터+슬라이더/직접입력+여러 대학 리스트+링크)
@@ -1108,26 +1182,26 @@ else:
     st.dataframe(df_subj, use_container_width=True, hide_index=True)
     st.caption("70% 이상: 초록 / 70% 미만: 주황. 보강이 필요한 과목을 함께 살펴보세요.")
 
+# (5~8 + 심리 요약) 한 번에 생성: 같은 학생 데이터로 1회 호출 후 섹션별 로그로 분리 저장
+guide_key = today_key()
+if st.button("✨ 오늘 가이드 전체(5~8 + 심리 요약) 한 번에 생성", use_container_width=True):
+    section_prompts = {
+        "guide": guide_prompt(today, display_rows),
+        "talk": talk_prompt(today),
+        "together": together_prompt(),
+        "support": support_prompt(),
+    }
+    _psy_today, _psy_week = psych_today_and_week(STUDENT_ID)
+    if not (_psy_today.empty and _psy_week.empty):
+        section_prompts["psych_ai"] = psych_prompt(_psy_today, _psy_week)
+    with st.spinner("오늘 가이드를 생성하고 있습니다..."):
+        generate_today_sections(PARENT_ID, STUDENT_ID, section_prompts, guide_key)
+
 # (5) 오늘의 부모 행동 가이드(AI)
 st.markdown("#### 5) 오늘의 부모 행동 가이드")
-guide_key = today_key()
 cached = get_ai_log(PARENT_ID, STUDENT_ID, "guide", guide_key)
 if st.button("오늘 가이드 생성/갱신", use_container_width=True):
-    prompt = f"""
-너는 학부모를 돕는 교육 코치다. 통제/압박/낙인 금지. 동행/루틴/회복 관점.
-[오늘 요약]
-- 학습 기록 수: {today['sessions']}
-- 문항 수: {today['questions']}
-- 정답률: {today['correct_rate']}
-- 과목 수: {today['subjects']}
-[오늘 과목별 학습 현황] {", ".join([f"{r['과목']}({r['정답률(%)']}%)" for r in display_rows if r['총 문항 수'] > 0][:5]) if display_rows else "데이터 없음"}
-
-요구:
-1) 부모 행동 가이드 5개(각 1줄, 현실적)
-2) '오늘은 무엇을 하면 충분한지' 최소 기준 1개
-3) 압박 대신 지속을 만드는 문장 2개
-"""
-    content = try_ai_generate(prompt)
+    content = try_ai_generate(guide_prompt(today, display_rows))
     upsert_ai_log(PARENT_ID, STUDENT_ID, "guide", guide_key, content)
     cached = content
 
@@ -1140,14 +1214,7 @@ else:
 st.markdown("#### 6) 오늘 자녀와의 대화 질문")
 talk_cached = get_ai_log(PARENT_ID, STUDENT_ID, "talk", guide_key)
 if st.button("대화 질문 생성", use_container_width=True):
-    prompt = f"""
-학부모가 아이에게 '공부 압박' 없이 대화하기 위한 질문을 만들어라.
-오늘 문항수={today['questions']}, 정답률={today['correct_rate']}, 과목수={today['subjects']}
-요구:
-- 질문 6개 (칭찬형 2, 점검형 2, 회복형 2)
-- 말투는 단단하고 짧게
-"""
-    content = try_ai_generate(prompt)
+    content = try_ai_generate(talk_prompt(today))
     upsert_ai_log(PARENT_ID, STUDENT_ID, "talk", guide_key, content)
     talk_cached = content
 if talk_cached:
@@ -1157,14 +1224,7 @@ if talk_cached:
 st.markdown("#### 7) 학생과 부모가 함께 할 행동")
 together_cached = get_ai_log(PARENT_ID, STUDENT_ID, "together", guide_key)
 if st.button("함께 할 행동 제안 생성", use_container_width=True):
-    prompt = f"""
-오늘 학습을 기준으로 부모와 아이가 함께 할 수 있는 실생활 학습 행동을 제안해라.
-요구:
-- 5개 제안
-- 각 제안마다 '실생활 문제 예시 1개' 포함
-- 부담 없는 난이도, 10분~15분 단위
-"""
-    content = try_ai_generate(prompt)
+    content = try_ai_generate(together_prompt())
     upsert_ai_log(PARENT_ID, STUDENT_ID, "together", guide_key, content)
     together_cached = content
 if together_cached:
@@ -1174,15 +1234,7 @@ if together_cached:
 st.markdown("#### 8) 정서적 지원 팀 (지원 메시지)")
 support_cached = get_ai_log(PARENT_ID, STUDENT_ID, "support", guide_key)
 if st.button("정서 지원 메시지 생성", use_container_width=True):
-    prompt = f"""
-학부모가 아이의 정서적 부담을 낮추도록 돕는 메시지를 작성해라.
-금지: 진단/낙인/비교/협박.
-요구:
-- 부모에게 주는 메시지 4문장
-- 아이에게 해줄 수 있는 말 3문장
-- '오늘은 여기까지만 해도 충분' 같은 마무리 1문장
-"""
-    content = try_ai_generate(prompt)
+    content = try_ai_generate(support_prompt())
     upsert_ai_log(PARENT_ID, STUDENT_ID, "support", guide_key, content)
     support_cached = content
 if support_cached:
@@ -1381,22 +1433,14 @@ with tab_daily:
     st.caption("오늘 하루 기준으로 요약합니다.")
     daily_key = today_key()
     daily_cached = get_ai_log(PARENT_ID, STUDENT_ID, "daily_report", daily_key)
+    if not daily_cached:
+        daily_cached = get_ai_log(PARENT_ID, STUDENT_ID, "daily_report", batch_key())
+        if daily_cached:
+            st.caption(f"어젯밤 생성된 {batch_key()} 리포트입니다. 오늘 기준으로 보려면 생성/갱신을 누르세요.")
 
     if st.button("일간 리포트 생성/갱신", use_container_width=True):
-        # 과목별 학습 현황 요약
-        weak_text = ", ".join([f"{r['과목']}({r['정답률(%)']}%)" for r in display_rows if r['총 문항 수'] > 0][:5]) if display_rows else "데이터 없음"
-
-        prompt = f"""
-학부모에게 제공할 '일간 리포트'를 작성하라. 낙인/비교/압박 금지.
-구성:
-- 오늘 성과(짧게)
-- 취약 개념(가능하면)
-- 내일 목표(현실적)
-- 부모님께 제안하는 말(단단하게 2문장)
-데이터:
-문항={today['questions']}, 정답률={today['correct_rate']}, 과목수={today['subjects']}
-취약개념={weak_text if weak_text else "데이터 없음"}
-"""
+        from report_batch import daily_report_prompt  # 야간 일괄 생성과 같은 프롬프트
+        prompt = daily_report_prompt(today, display_rows)
         content = try_ai_generate(prompt)
         upsert_ai_log(PARENT_ID, STUDENT_ID, "daily_report", daily_key, content)
         daily_cached = content
@@ -1408,6 +1452,8 @@ with tab_monthly:
     st.caption("최근 30일(데이터가 하루 이상이면 월간으로 정의) 기준 요약.")
     ym = year_month_now()
     monthly_cached = get_ai_log(PARENT_ID, STUDENT_ID, "monthly_report", ym)
+    if not monthly_cached and batch_key()[:7] != ym:     # 월초: 지난달 마지막 밤 배치 결과
+        monthly_cached = get_ai_log(PARENT_ID, STUDENT_ID, "monthly_report", batch_key()[:7])
 
     if st.button("월간 리포트 생성/갱신", use_container_width=True):
         # 최근 30일 데이터
@@ -1426,16 +1472,8 @@ with tab_monthly:
         else:
             cr = round(df30["is_correct"].dropna().mean()*100, 1)
 
-        prompt = f"""
-학부모에게 제공할 '월간 리포트'를 작성하라. 낙인/비교/압박 금지.
-구성:
-- 이달의 성과
-- 취약 개념(가능하면)
-- 다음달 목표(현실적)
-- 부모님께 제안하는 말(단단하게 3문장)
-데이터:
-30일 문항={q}, 정답률={cr}, 과목수={subj}
-"""
+        from report_batch import monthly_report_prompt
+        prompt = monthly_report_prompt(q, cr, subj)
         content = try_ai_generate(prompt)
         upsert_ai_log(PARENT_ID, STUDENT_ID, "monthly_report", ym, content)
         monthly_cached = content
@@ -7,6 +7,8 @@ import re
 import os
 from typing import Optional, List, Dict, Any
 
+from pagination import keyset_page, lazy_rows, more_button
+
 # =====================================================
 # 페이지 설정 (학생/학부모 절대 건드리지 않음)
 # =====================================================
@@ -95,6 +97,7 @@ def ensure_teacher_tables():
         created_at DATETIME DEFAULT CURRENT_TIMESTAMP
     )
     """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_teacher_student_memo ON teacher_student_memo(teacher_id, student_id, created_at, id)")
 
     # 수업 계획 / 과제
     cur.execute("""
@@ -157,7 +160,7 @@ def get_student_summary(student_id: int) -> Dict:
             "SELECT * FROM study_sessions WHERE student_id=?", (student_id,)
         ).fetchall()
         q = con.execute(
-            """SELECT q.is_correct FROM questions q
+            """SELECT q.is_correct FROM session_questions q
                JOIN study_sessions ss ON ss.id = q.session_id
                WHERE ss.student_id=?""", (student_id,)
         ).fetchall()
@@ -195,7 +198,7 @@ def get_subject_stats(student_id: int) -> pd.DataFrame:
         rows = con.execute(
             """SELECT ss.subject, q.is_correct
                FROM study_sessions ss
-               LEFT JOIN questions q ON q.session_id = ss.id
+               LEFT JOIN session_questions q ON q.session_id = ss.id
                WHERE ss.student_id=?""", (student_id,)
         ).fetchall()
     finally:
@@ -246,16 +249,20 @@ def get_session_questions_detail(session_id: int) -> pd.DataFrame:
         return pd.DataFrame()
     return pd.DataFrame([dict(r) for r in rows])
 
-def get_psych_tests(student_id: int) -> List[Dict]:
+def _query(sql: str, params) -> List[sqlite3.Row]:
     con = get_conn()
     try:
-        rows = con.execute(
-            "SELECT * FROM psychological_tests WHERE student_id=? ORDER BY test_date DESC",
-            (student_id,)
-        ).fetchall()
+        return con.execute(sql, params).fetchall()
     finally:
         con.close()
-    return [dict(r) for r in rows]
+
+def get_psych_tests_page(student_id: int, limit: int = 10, cursor=None):
+    """심리 테스트 한 페이지 (최근 순). 반환: (행 리스트, 다음 커서)"""
+    return keyset_page(_query, "SELECT * FROM psychological_tests WHERE student_id=?", (student_id,),
+                       [("test_date", "test_date"), ("id", "id")], limit, cursor)
+
+def count_psych_tests(student_id: int) -> int:
+    return _query("SELECT COUNT(*) FROM psychological_tests WHERE student_id=?", (student_id,))[0][0]
 
 # 심리 문항 레이블
 PSY_LABELS = {
@@ -294,14 +301,11 @@ def calc_risk(score: int) -> str:
     if score >= 40: return "위험"
     return "고위험"
 
-def get_memos(teacher_id: int, student_id: int) -> List[Dict]:
-    con = get_conn()
-    rows = con.execute(
-        "SELECT id, memo, created_at FROM teacher_student_memo WHERE teacher_id=? AND student_id=? ORDER BY created_at DESC",
-        (teacher_id, student_id)
-    ).fetchall()
-    con.close()
-    return [dict(r) for r in rows]
+def get_memos_page(teacher_id: int, student_id: int, limit: int = 10, cursor=None):
+    """메모 한 페이지 (최근 순). 반환: (행 리스트, 다음 커서)"""
+    return keyset_page(_query,
+                       "SELECT id, memo, created_at FROM teacher_student_memo WHERE teacher_id=? AND student_id=?",
+                       (teacher_id, student_id), [("created_at", "created_at"), ("id", "id")], limit, cursor)
 
 def save_memo(teacher_id: int, student_id: int, memo: str):
     con = get_conn()
@@ -367,48 +371,47 @@ def upsert_ai_log(teacher_id: int, student_id: Optional[int], log_type: str, log
 # =====================================================
 # AI 생성 (OpenAI ON/OFF)
 # =====================================================
+TEMPLATE_RESPONSES = [
+    "학생의 최근 학습 패턴을 분석한 결과, 꾸준한 학습 루틴이 형성되고 있습니다. 특히 정답률이 높은 과목을 중심으로 자신감을 키워주세요.",
+    "오늘 학습 데이터 기반으로 보면, 풀어야 할 문항 양보다 '이해도 확인'이 우선입니다. 짧은 복습 시간을 추천합니다.",
+    "학생이 특정 과목에서 집중적인 학습을 하고 있습니다. 다른 과목 균형도 함께 점검해 주세요.",
+]
+
 def try_ai_generate(prompt: str) -> str:
     use_ai = st.session_state.get("teacher_use_openai", False)
     if use_ai:
         try:
-            from openai import OpenAI
-            api_key = os.environ.get("OPENAI_API_KEY") or ""
-            if not api_key:
-                for fname in [".env", "api_key.txt"]:
-                    try:
-                        base = os.path.dirname(os.path.abspath(__file__))
-                        fp = os.path.join(base, "..", fname)
-                        with open(fp, "r", encoding="utf-8") as f:
-                            for line in f:
-                                if line.startswith("OPENAI_API_KEY="):
-                                    api_key = line.strip().split("=", 1)[1]
-                                    break
-                        if api_key:
-                            break
-                    except Exception:
-                        pass
-            if not api_key:
+            import ai_client  # 공용 클라이언트 (키 1회 해석, keep-alive, timeout/재시도)
+            import ai_cache
+            import ai_governor
+            if not ai_client.is_configured():
                 return "[API 키 없음] 학생 페이지에서 API 키를 설정해 주세요."
-            client = OpenAI(api_key=api_key)
-            resp = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "당신은 교육 전문가입니다. 교사에게 학생 분석 리포트를 제공합니다."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=1200,
-            )
-            return resp.choices[0].message.content.strip()
+            model = "gpt-3.5-turbo"
+            messages = [
+                {"role": "system", "content": "당신은 교육 전문가입니다. 교사에게 학생 분석 리포트를 제공합니다."},
+                {"role": "user", "content": prompt}
+            ]
+            # 마감 30초. 실패/지연 시 같은 프롬프트의 마지막 응답 → 없으면 템플릿
+            with ai_governor.caller("teacher", st.session_state.get("teacher_id")):
+                content = ai_cache.cached_call(
+                    "teacher_ai_text", model, messages,
+                    lambda: ai_client.chat_text(model, messages, temperature=0.7, max_tokens=1200, timeout=30,
+                                                func="teacher_ai_text"),
+                )
+            return content.strip()
         except Exception as e:
+            try:
+                import ai_client
+                import ai_governor
+            except Exception:           # 모듈 자체를 못 불러온 경우 (설정/의존성 문제)
+                return f"[AI 오류] {e}"
+            if isinstance(e, (ai_client.DeadlineExceeded, ai_client.CircuitOpenError, ai_governor.QueueTimeout)):
+                return f"[AI 응답 지연 - 템플릿 응답]\n\n{random.choice(TEMPLATE_RESPONSES)}"
+            if isinstance(e, ai_governor.BudgetExceeded):
+                return "[AI 사용 한도] 오늘 AI 리포트 한도를 모두 사용했습니다. 내일 다시 생성해 주세요."
             return f"[AI 오류] {e}"
     else:
-        templates = [
-            "학생의 최근 학습 패턴을 분석한 결과, 꾸준한 학습 루틴이 형성되고 있습니다. 특히 정답률이 높은 과목을 중심으로 자신감을 키워주세요.",
-            "오늘 학습 데이터 기반으로 보면, 풀어야 할 문항 양보다 '이해도 확인'이 우선입니다. 짧은 복습 시간을 추천합니다.",
-            "학생이 특정 과목에서 집중적인 학습을 하고 있습니다. 다른 과목 균형도 함께 점검해 주세요.",
-        ]
-        return f"[AI OFF - 템플릿 응답]\n\n{random.choice(templates)}"
+        return f"[AI OFF - 템플릿 응답]\n\n{random.choice(TEMPLATE_RESPONSES)}"
 
 # =====================================================
 # 사이드바 로그인
@@ -660,29 +663,18 @@ if _show2:
 
     st.divider()
     st.markdown("#### AI 학습 분석 리포트")
-    report_key = f"analysis:{sel_id}:{dt.date.today().isoformat()}"
+    report_key = f"analysis:{sel_id}:{dt.date.today().isoformat()}"  # report_batch.teacher_report_key 와 동일
     cached_report = get_ai_log(TEACHER_ID, sel_id, "analysis", report_key)
+    if not cached_report:
+        # 야간 일괄 생성(23:30)은 그날 날짜로 저장 → 오늘 아침에는 어제 키에 있음
+        batch_day = (dt.date.today() - dt.timedelta(days=1)).isoformat()
+        cached_report = get_ai_log(TEACHER_ID, sel_id, "analysis", f"analysis:{sel_id}:{batch_day}")
+        if cached_report:
+            st.caption(f"어젯밤 생성된 {batch_day} 리포트입니다. 오늘 기준으로 보려면 생성/갱신을 누르세요.")
 
     if st.button("리포트 생성/갱신", use_container_width=True, key="gen_report"):
-        subj_text = ", ".join(
-            [f"{r['과목']}({r['정답률(%)']}%)" for _, r in df_subj.iterrows() if r["총 문항"] > 0]
-        ) if not df_subj.empty else "데이터 없음"
-        prompt = f"""
-교사에게 제공할 학생 학습 분석 리포트를 작성하라.
-[학생 정보]
-- 이름: {sel_name} / 학년: {sel_stu['grade']}
-- 총 문항: {summary['total_questions']} / 정답률: {summary['correct_rate']}%
-- 학습일: {summary['study_days']}일 / 레벨: {summary['level']}
-- 과목별 현황: {subj_text}
-
-요구사항:
-1. 학생의 현재 학습 수준 요약 (2문장)
-2. 강점 과목 / 보강 권장 과목 (각 1개)
-3. 교사 권장 행동 3가지 (짧고 실용적으로)
-4. 학생에게 전달할 응원 메시지 1개
-
-낙인/비교/압박 금지. 성장 관점으로 작성.
-"""
+        from report_batch import teacher_analysis_prompt  # 야간 일괄 생성과 같은 프롬프트
+        prompt = teacher_analysis_prompt(sel_name, sel_stu["grade"], summary, df_subj.to_dict(orient="records"))
         content = try_ai_generate(prompt)
         upsert_ai_log(TEACHER_ID, sel_id, "analysis", report_key, content)
         cached_report = content
@@ -701,7 +693,8 @@ if _show3:
 
     sel_psy_name = st.selectbox("학생 선택", stu_names, key="tab3_student")
     sel_psy_stu = next(s for s in all_students if s["name"] == sel_psy_name)
-    psy_tests = get_psych_tests(sel_psy_stu["id"])
+    psy_tests, psy_more = lazy_rows("psych_tests", lambda n, c: get_psych_tests_page(sel_psy_stu["id"], n, c),
+                                    page_size=10, reset_token=sel_psy_stu["id"])
 
     if not psy_tests:
         st.info(f"{sel_psy_name} 학생의 심리 테스트 데이터가 없습니다.")
@@ -754,9 +747,10 @@ if _show3:
 
         if len(psy_tests) > 1:
             st.divider()
-            st.markdown(f"#### 이전 테스트 이력 (총 {len(psy_tests)}회)")
+            st.markdown(f"#### 이전 테스트 이력 (총 {count_psych_tests(sel_psy_stu['id'])}회)")
             hist = [{"검사일": str(t.get("test_date",""))[:10], "총점": t.get("total_score", 0), "지원단계": calc_risk(int(t.get("total_score", 0)))} for t in psy_tests]
             st.dataframe(pd.DataFrame(hist), use_container_width=True, hide_index=True)
+            more_button("psych_tests", psy_more, "이전 이력 더 보기")
 
 # ─────────────────────────────────────────────────
 # TAB 4: 문제 이력 조회
@@ -826,7 +820,8 @@ if _show5:
 
     st.divider()
     st.markdown(f"#### {sel_memo_name} 학생 메모 이력")
-    memos = get_memos(TEACHER_ID, sel_memo_id)
+    memos, memo_more = lazy_rows("memos", lambda n, c: get_memos_page(TEACHER_ID, sel_memo_id, n, c),
+                                 page_size=10, reset_token=sel_memo_id)
 
     if not memos:
         st.info("저장된 메모가 없습니다.")
@@ -837,6 +832,7 @@ if _show5:
                 if st.button("🗑️ 삭제", key=f"del_memo_{m['id']}"):
                     delete_memo(m["id"])
                     st.rerun()
+        more_button("memos", memo_more, "이전 메모 더 보기")
 
     st.divider()
     st.markdown("#### AI 학생 피드백 초안 생성")
@@ -1321,7 +1317,7 @@ if _show9:
     try:
         subj_rows = con3.execute(
             """SELECT ss.subject, COUNT(q.id) as total, SUM(CASE WHEN q.is_correct=1 THEN 1 ELSE 0 END) as correct
-               FROM study_sessions ss JOIN questions q ON q.session_id=ss.id
+               FROM study_sessions ss JOIN session_questions q ON q.session_id=ss.id
                WHERE ss.student_id=?
                GROUP BY ss.subject""",
             (sel_radar_id,)
@@ -1387,7 +1383,7 @@ if _show9:
         try:
             r2 = con4.execute(
                 """SELECT COUNT(q.id) as total, SUM(CASE WHEN q.is_correct=1 THEN 1 ELSE 0 END) as correct
-                   FROM study_sessions ss JOIN questions q ON q.session_id=ss.id
+                   FROM study_sessions ss JOIN session_questions q ON q.session_id=ss.id
                    WHERE ss.student_id=? AND ss.subject=?""",
                 (stu["id"], compare_subj)
             ).fetchone()
@@ -37,7 +37,7 @@ def main():
     **정시 데이터와 완전히 분리**되어 있으며, 내신/수시 추천 엔진에서만 사용됩니다.
     """)
 
-    tab1, tab2, tab3, tab4 = st.tabs(["대학 Import", "학과 Import", "컷오프 Import", "현황 조회"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["대학 Import", "학과 Import", "컷오프 Import", "현황 조회", "AI 사용량"])
 
     with tab1:
         st.subheader("대학 데이터 Import")
@@ -97,18 +97,34 @@ def main():
 
     with tab3:
         st.subheader("컷오프 데이터 Import")
-        st.markdown("**CSV 컬럼:** `university_name`, `department_name`, `admission_type`(naesin/holistic/suneung), `year`, `naesin_avg`, `notes`")
+        st.markdown("**CSV 컬럼:** `university_name`, `department_name`, `admission_type`(naesin/holistic/suneung), `year`, "
+                    "`naesin_avg`(내신) 또는 `activity_score_min`(학종), `notes`")
+        st.markdown("여러 해 이력은 연도별로 한 행씩 넣거나, `year` 대신 연도 열(`2022`, `2023`, `2024` …)에 값을 넣는 "
+                    "가로형으로 한 번에 올릴 수 있습니다. 같은 학과·전형·연도는 새 값으로 갱신되고, "
+                    "등록 후 학과별 컷 추세(예상 컷)가 다시 계산됩니다.")
 
         with st.expander("CSV 양식 예시 보기"):
             sample_cutoff = pd.DataFrame([
                 {'university_name': '서울대학교', 'department_name': '컴퓨터공학부', 'admission_type': 'naesin', 'year': 2024, 'naesin_avg': 1.1, 'notes': '내신 평균 기준'},
-                {'university_name': '연세대학교', 'department_name': '경영학과', 'admission_type': 'holistic', 'year': 2024, 'naesin_avg': 70, 'notes': '활동점수 기준'},
+                {'university_name': '연세대학교', 'department_name': '경영학과', 'admission_type': 'holistic', 'year': 2024, 'activity_score_min': 70, 'notes': '활동점수 기준'},
             ])
             st.dataframe(sample_cutoff)
             csv_sample3 = sample_cutoff.to_csv(index=False, encoding='utf-8-sig')
             st.download_button("양식 다운로드", data=csv_sample3.encode('utf-8-sig'),
                                file_name="cutoff_template.csv", mime="text/csv")
 
+            st.markdown("**가로형 (여러 해 이력)**")
+            sample_history = pd.DataFrame([
+                {'university_name': '서울대학교', 'department_name': '컴퓨터공학부', 'admission_type': 'naesin',
+                 '2022': 1.2, '2023': 1.15, '2024': 1.1},
+                {'university_name': '연세대학교', 'department_name': '경영학과', 'admission_type': 'holistic',
+                 '2022': 66, '2023': 68, '2024': 70},
+            ])
+            st.dataframe(sample_history)
+            st.download_button("가로형 양식 다운로드",
+                               data=sample_history.to_csv(index=False, encoding='utf-8-sig').encode('utf-8-sig'),
+                               file_name="cutoff_history_template.csv", mime="text/csv")
+
         uploaded3 = st.file_uploader("CSV 또는 Excel 파일 업로드", type=['csv', 'xlsx'], key='cutoff_upload')
         if uploaded3:
             try:
@@ -120,6 +136,7 @@ def main():
                 if st.button("컷오프 데이터 등록", type="primary", key='cutoff_import'):
                     count3 = db.import_cutoffs_from_df(df3)
                     st.success(f"{count3}건 등록 완료")
+                    st.caption("학과를 찾지 못했거나 컷 값이 빈 행은 등록하지 않습니다.")
             except Exception as e:
                 st.error(f"파일 읽기 오류: {e}")
 
@@ -143,6 +160,29 @@ def main():
             st.metric("총 학과 수", dept_cnt)
             st.metric("컷오프 데이터", cutoff_cnt)
 
+        st.markdown("#### 학과별 컷 추세")
+        trend_type = st.radio("전형", ['naesin', 'holistic'], horizontal=True, key='trend_type',
+                              format_func=lambda t: {'naesin': '내신(교과)', 'holistic': '학종'}[t])
+        years = db.get_cutoff_years(trend_type)
+        if years:
+            as_of = st.selectbox("기준 연도 (해당 연도 이하 가장 최근 컷)", ['예상(추세)'] + years[::-1], key='trend_as_of')
+            if as_of == '예상(추세)':
+                trends = [dict(r) for r in db.get_cutoff_trends(trend_type)]
+                st.dataframe(pd.DataFrame([{
+                    '대학': t['university_name'], '학과': t['name'],
+                    '연도 수': t['year_count'], '최근 연도': t['last_year'], '최근 컷': t['last_value'],
+                    '연간 변화': t['slope'], f"{t['target_year']} 예상 컷": t['projected_value'],
+                } for t in trends]), use_container_width=True, hide_index=True)
+            else:
+                key = db.CUTOFF_METRICS[trend_type][0]
+                rows = db.get_cutoff_table(trend_type, as_of=as_of)
+                st.dataframe(pd.DataFrame([{
+                    '대학': r['university_name'], '학과': r['name'],
+                    '연도': r['year'], '컷': r['cutoff_value'].get(key),
+                } for r in rows]), use_container_width=True, hide_index=True)
+        else:
+            st.info("등록된 컷 데이터가 없습니다.")
+
         st.markdown("#### 대학 목록")
         df_unis = pd.DataFrame([{
             '대학명': u['name'],
@@ -162,5 +202,68 @@ def main():
             key="dl_unis"
         )
 
+    with tab5:
+        show_ai_usage()
+
+
+def show_ai_usage():
+    import datetime
+    import ai_cache
+    import ai_client
+    import ai_governor
+
+    st.subheader("AI 사용량 / 호출 제한 현황")
+    st.caption(
+        f"동시 호출 상한 {ai_governor.MAX_CONCURRENT}건 · 분당 {ai_governor.TOKENS_PER_MINUTE:,} 토큰 · "
+        "하루 사용자 한도: " + ", ".join(
+            f"{role} {limit:,}" for role, limit in ai_governor.USER_DAILY_BUDGET.items() if limit
+        )
+    )
+
+    status = ai_governor.get_status()
+    metrics = ai_client.get_metrics()
+    c1, c2, c3, c4, c5 = st.columns(5)
+    c1.metric("진행 중", f"{status['in_flight']}건")
+    c2.metric("대기 중", f"{status['waiting']}건")
+    c3.metric("버킷 잔여 토큰", f"{status['bucket_tokens']:,}")
+    c4.metric("한도 초과 거절", f"{status['budget_rejections']}건")
+    c5.metric("응답 p95", f"{metrics['latency_p95']}초")
+    st.caption(f"평균 대기 {status['wait_avg']}초 · 대기 마감 초과 {status['queue_timeouts']}건 · "
+               f"서킷 브레이커 {metrics['breaker']['state']}")
+
+    day = st.date_input("조회일", value=datetime.date.today(), key="ai_usage_day").isoformat()
+
+    st.markdown("#### 함수별 사용량")
+    by_func = ai_governor.usage_by_function(day)
+    if by_func:
+        st.dataframe(pd.DataFrame(by_func).rename(columns={
+            'role': '역할', 'func': '함수', 'model': '모델', 'calls': '호출', 'errors': '오류',
+            'rejected': '한도 거절', 'prompt_tokens': '프롬프트 토큰', 'completion_tokens': '응답 토큰',
+            'avg_latency': '평균 지연(초)', 'avg_queue_wait': '평균 대기(초)',
+        }), use_container_width=True, hide_index=True)
+    else:
+        st.info("해당 날짜의 AI 호출 기록이 없습니다.")
+
+    st.markdown("#### 사용자별 사용량")
+    by_user = ai_governor.usage_by_user(day)
+    if by_user:
+        st.dataframe(pd.DataFrame(by_user).rename(columns={
+            'role': '역할', 'user_id': '사용자 ID', 'calls': '호출', 'tokens': '토큰',
+            'budget': '하루 한도', 'budget_used_pct': '사용률(%)',
+        }), use_container_width=True, hide_index=True)
+
+    st.markdown("#### 최근 14일 토큰 추이")
+    by_day = ai_governor.usage_by_day(14)
+    if by_day:
+        df_day = pd.DataFrame(by_day)
+        df_day['tokens'] = df_day['prompt_tokens'] + df_day['completion_tokens']
+        st.bar_chart(df_day.pivot_table(index='day', columns='role', values='tokens', aggfunc='sum').fillna(0))
+
+    cache_stats = ai_cache.get_stats()
+    if cache_stats:
+        st.markdown("#### 응답 캐시 적중률")
+        st.dataframe(pd.DataFrame([dict(func=k, **v) for k, v in cache_stats.items()]),
+                     use_container_width=True, hide_index=True)
+
 
 main()
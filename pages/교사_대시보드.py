@@ -6,6 +6,7 @@ import plotly.graph_objects as go
 import plotly.express as px
 import naesin_database as db
 import naesin_engine as eng
+from pagination import lazy_rows, more_button
 
 st.set_page_config(page_title="교사 내신/수시 대시보드", layout="wide", initial_sidebar_state="expanded")
 
@@ -123,11 +124,7 @@ def tab_class_overview(teacher_user_id):
     )
 
     st.markdown("#### 내신 등급 분포 (전체)")
-    all_grades = []
-    for sid in student_ids:
-        g = db.get_naesin_avg(sid)
-        if g:
-            all_grades.append(g)
+    all_grades = list(db.get_naesin_avgs(student_ids).values())
     if all_grades:
         import statistics
         st.metric("학급 내신 평균", f"{statistics.mean(all_grades):.2f}등급")
@@ -192,7 +189,7 @@ def _individual_naesin(student_id, student_name):
     df = pd.DataFrame([{
         '학년도': g['school_year'], '학기': g['semester'],
         '과목': g['subject_name'], '계열': g['category'],
-        '등급': g['grade_level_num'], '원점수': g['raw_score'] or '-',
+        '등급': g['grade_level_num'], '원점수': g['raw_score'] or '-', '이수단위': g['credit_units'],
         '교사확인': '완료' if g['verified_by_teacher'] else '미확인',
         'grade_id': g['grade_id'],
     } for g in grades])
@@ -231,8 +228,10 @@ def _individual_naesin(student_id, student_name):
 def _individual_holistic(student_id, student_name, teacher_user_id):
     st.markdown(f"#### {student_name} 학종 활동 검증")
 
-    activities = db.get_pending_activities_for_teacher(teacher_user_id)
-    student_acts = [a for a in activities if a['student_id'] == student_id]
+    student_acts, has_more = lazy_rows(
+        f"holistic_{student_id}",
+        lambda n, c: db.get_pending_activities_for_teacher_page(teacher_user_id, student_id, n, c),
+        page_size=10, reset_token=teacher_user_id)
 
     if not student_acts:
         st.info("검증할 활동이 없습니다.")
@@ -276,6 +275,8 @@ def _individual_holistic(student_id, student_name, teacher_user_id):
                     st.success("검증 저장 완료!")
                     st.rerun()
 
+    more_button(f"holistic_{student_id}", has_more, "활동 더 보기")
+
 
 def _individual_daily(student_id, student_name):
     st.markdown(f"#### {student_name} 일일 기록")
@@ -364,6 +365,7 @@ def _individual_forecast(student_id, student_name):
             '대학': r['university'], '학과': r['department'],
             '학위': r['degree_type'], '지역': r['region'],
             '구분': r['zone'], '가능도': r['possibility'],
+            '합격 확률': f"{r['probability']:.0%}" if r.get('probability') is not None else '-',
             '부족분': r['shortfall'], '링크': r['homepage_url'],
         } for r in rn]), use_container_width=True)
     elif en:
@@ -376,6 +378,7 @@ def _individual_forecast(student_id, student_name):
             '대학': r['university'], '학과': r['department'],
             '학위': r['degree_type'], '지역': r['region'],
             '구분': r['zone'], '가능도': r['possibility'],
+            '합격 확률': f"{r['probability']:.0%}" if r.get('probability') is not None else '-',
             '부족분': r['shortfall'], '링크': r['homepage_url'],
         } for r in rh]), use_container_width=True)
     elif eh:
@@ -388,6 +391,141 @@ def _individual_forecast(student_id, student_name):
 # 메인
 # ─────────────────────────────────────────────────────────
 
+# ─────────────────────────────────────────────────────────
+# 탭 3: 활동 검토 대기열
+# ─────────────────────────────────────────────────────────
+
+REVIEW_LABEL = {'pending': '미검토', 'approved': '승인', 'rejected': '반려'}
+
+
+def tab_review_queue(teacher_user_id):
+    st.subheader("학종 활동 검토 대기열")
+    if 'rq_result' in st.session_state:
+        label, n, strengths = st.session_state.pop('rq_result')
+        st.success(f"{n}건 {label} 완료 · 학생 {len(strengths)}명 활동 강도 갱신")
+
+    classes = db.get_teacher_classes(teacher_user_id)
+    class_options = {'전체 학급': None}
+    class_options.update({c['class_name']: c['class_id'] for c in classes})
+
+    col_f1, col_f2 = st.columns(2)
+    with col_f1:
+        class_label = st.selectbox("학급", list(class_options.keys()), key="rq_class")
+    class_id = class_options[class_label]
+    counts = db.count_review_queue(teacher_user_id, class_id)
+    with col_f2:
+        status = st.radio("상태", list(REVIEW_LABEL.keys()), horizontal=True, key="rq_status",
+                          format_func=lambda s: f"{REVIEW_LABEL[s]} ({counts[s]})")
+
+    queue_key = "review_queue"
+    acts, has_more = lazy_rows(
+        queue_key,
+        lambda n, c: db.get_review_queue(teacher_user_id, status, class_id, limit=n, cursor=c),
+        reset_token=(teacher_user_id, status, class_id))
+    if not acts:
+        st.info("해당 상태의 활동이 없습니다.")
+        return
+
+    select_all = st.checkbox(f"불러온 {len(acts)}건 모두 선택", key=f"rq_all_{status}_{class_id}")
+    selected = []
+    for act in acts:
+        aid = act['activity_id']
+        c1, c2 = st.columns([1, 12])
+        with c1:
+            if st.checkbox("선택", key=f"rq_sel_{aid}", disabled=select_all,
+                           label_visibility="collapsed") or select_all:
+                selected.append(aid)
+        with c2:
+            with st.expander(f"{act['student_name']} · [{act['type_name']}] {act['title']} — {str(act['created_at'])[:10]}"):
+                st.markdown(f"**요약:** {act.get('summary') or '-'}")
+                st.markdown(f"**배운점:** {act.get('learned') or '-'}")
+                st.markdown(f"**역할:** {act.get('role', '-')} | **전공연계:** {'Y' if act.get('major_related') else 'N'}"
+                            f" | **시간:** {act.get('hours') or 0}h")
+                if act.get('review_comment'):
+                    st.caption(f"코멘트: {act['review_comment']}")
+    more_button(queue_key, has_more)
+
+    st.divider()
+    st.markdown(f"**선택한 활동 {len(selected)}건 일괄 처리**")
+    col_s, col_c = st.columns([1, 2])
+    with col_s:
+        apply_score = st.checkbox("점수 일괄 적용 (끄면 기존 점수 유지)", key="rq_apply_score")
+        bulk_score = st.slider("점수 (0~100)", 0, 100, 60, key="rq_score", disabled=not apply_score)
+    with col_c:
+        bulk_comment = st.text_input("코멘트 (비우면 기존 코멘트 유지)", key="rq_comment")
+    col_a, col_r = st.columns(2)
+    for col, new_status, label in [(col_a, 'approved', "✅ 일괄 승인"), (col_r, 'rejected', "❌ 일괄 반려")]:
+        with col:
+            if st.button(label, key=f"rq_{new_status}", use_container_width=True, disabled=not selected,
+                         type="primary" if new_status == 'approved' else "secondary"):
+                strengths = db.bulk_review_activities(teacher_user_id, selected, new_status,
+                                                      bulk_score if apply_score else None,
+                                                      bulk_comment.strip() or None)
+                for aid in selected:
+                    st.session_state.pop(f"rq_sel_{aid}", None)
+                st.session_state['rq_result'] = (REVIEW_LABEL[new_status], len(selected), strengths)
+                st.rerun()
+
+
+# ─────────────────────────────────────────────────────────
+# 탭 4: 성적 일괄 입력 (NEIS 성적표 CSV/Excel)
+# ─────────────────────────────────────────────────────────
+
+def tab_grade_import(teacher_user_id):
+    st.subheader("내신 성적 일괄 입력")
+    st.markdown(
+        "**세로형 열:** `학년도`, `학년`, `학기`, `학생ID` 또는 `성명`, `과목`, `석차등급`, "
+        "`원점수`(선택), `석차`(선택), `이수단위`(선택)  \n"
+        "**가로형:** `학생ID`/`성명` + 과목명 열마다 등급 (학기 열이 없으면 아래에서 학기 선택)"
+    )
+    st.caption("교사 입력 성적은 확인 완료로 저장되며, 같은 학생·학기·과목 성적은 덮어씁니다.")
+
+    with st.expander("양식 예시 보기"):
+        sample = pd.DataFrame([
+            {'학년도': 2025, '학년': 2, '학기': 1, '성명': '홍길동', '과목': '국어', '석차등급': 2, '원점수': 91, '석차': '5/30', '이수단위': 4},
+            {'학년도': 2025, '학년': 2, '학기': 1, '성명': '홍길동', '과목': '수학', '석차등급': 3, '원점수': 84, '석차': '9/30', '이수단위': 3},
+        ])
+        st.dataframe(sample, hide_index=True)
+        st.download_button("양식 다운로드", data=sample.to_csv(index=False).encode('utf-8-sig'),
+                           file_name="grade_template.csv", mime="text/csv")
+
+    terms = db.get_terms()
+    term_options = {'파일의 학년도/학년/학기 사용': None}
+    term_options.update({f"{t['school_year']}년 {t['grade_level']}학년 {t['semester']}학기": t['term_id'] for t in terms})
+    term_label = st.selectbox("학기", list(term_options.keys()), key="gi_term")
+
+    uploaded = st.file_uploader("CSV 또는 Excel 파일 업로드", type=['csv', 'xlsx'], key='grade_upload')
+    if not uploaded:
+        return
+    try:
+        if uploaded.name.endswith('.xlsx'):
+            df = pd.read_excel(uploaded)
+        else:
+            df = pd.read_csv(uploaded, encoding='utf-8-sig')
+    except Exception as e:
+        st.error(f"파일 읽기 오류: {e}")
+        return
+    st.dataframe(df.head(10), hide_index=True)
+    st.caption(f"총 {len(df)}행")
+
+    if st.button("성적 일괄 등록", type="primary", key='grade_import'):
+        try:
+            result = db.import_grades_from_df(df, teacher_user_id, term_options[term_label])
+        except ValueError as e:
+            st.error(str(e))
+            return
+        st.success(f"{result['imported']}건 등록 완료 · 학생 {len(result['averages'])}명 내신 평균 갱신")
+        if result['averages']:
+            names = {s['student_id']: s['student_name'] for s in db.get_class_students(teacher_user_id)}
+            st.dataframe(pd.DataFrame([{'학생': names.get(sid, sid), '내신 평균': avg}
+                                       for sid, avg in result['averages'].items()]), hide_index=True)
+        if len(result['errors']):
+            st.warning(f"{len(result['errors'])}행은 등록하지 않았습니다.")
+            st.dataframe(result['errors'].rename(columns={
+                'row': '행', 'student_id': '학생ID', 'student_name': '성명', 'subject_name': '과목',
+                'grade_level_num': '등급', 'error': '사유'}), hide_index=True)
+
+
 def main():
     top_nav()
 
@@ -402,12 +540,16 @@ def main():
             st.session_state.pop('edu_teacher', None)
             st.rerun()
 
-    tab1, tab2 = st.tabs(["학급 전체 대시보드", "학생 개인 상세"])
+    tab1, tab2, tab3, tab4 = st.tabs(["학급 전체 대시보드", "학생 개인 상세", "활동 검토 대기열", "성적 일괄 입력"])
 
     with tab1:
         tab_class_overview(teacher['user_id'])
     with tab2:
         tab_individual(teacher['user_id'])
+    with tab3:
+        tab_review_queue(teacher['user_id'])
+    with tab4:
+        tab_grade_import(teacher['user_id'])
 
 
 main()
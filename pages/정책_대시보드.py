@@ -390,8 +390,9 @@ def main():
     con6.close()
 
     mismatch_count = 0
+    avgs = db.get_naesin_avgs(sids)
     for sid in sids:
-        avg = db.get_naesin_avg(sid)
+        avg = avgs.get(sid)
         acts = db.get_activities(sid)
         major_related = [a for a in acts if a['major_related']]
         if avg and avg <= 3.0 and not major_related:
@@ -77,6 +77,7 @@ def render_reco_table_parent(results, err, label):
             '계열': r['category'],
             '구분': r['zone'],
             '가능도': r['possibility'],
+            '합격 확률': f"{r['probability']:.0%}" if r.get('probability') is not None else '-',
             '부족분/여유': r['shortfall'],
             '근거': ' | '.join(r['evidence'][:2]),
             '홈페이지': r['homepage_url'],
@@ -133,6 +134,18 @@ def section_naesin(student_id, student_name):
         df_show = df_all
     st.dataframe(df_show, use_container_width=True)
 
+    term_gpa = db.get_term_gpa(student_id)
+    if len(term_gpa) >= 2:
+        st.markdown("#### 학기별 평균 등급 추이")
+        df_gpa = pd.DataFrame([{
+            '학기': f"{t['school_year']}-{t['grade_level']}학년 {t['semester']}학기",
+            '평균 등급(이수단위 가중)': t['weighted_avg'],
+            '단순 평균': t['avg'],
+        } for t in term_gpa])
+        fig_gpa = px.line(df_gpa, x='학기', y=['평균 등급(이수단위 가중)', '단순 평균'], markers=True)
+        fig_gpa.update_yaxes(autorange='reversed', title='등급')
+        st.plotly_chart(fig_gpa, use_container_width=True)
+
     st.markdown("#### 과목별 등급 추세")
     if len(grades) >= 2:
         fig = px.line(df_all, x='학기', y='등급', color='과목',
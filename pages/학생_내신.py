@@ -115,6 +115,7 @@ def render_reco_table(results, err, label):
             '계열': r['category'],
             '구분': r['zone'],
             '가능도': r['possibility'],
+            '합격 확률': f"{r['probability']:.0%}" if r.get('probability') is not None else '-',
             '부족분/여유': r['shortfall'],
             '근거': ' | '.join(r['evidence'][:2]),
             '홈페이지': r['homepage_url'],
@@ -156,20 +157,23 @@ def tab_naesin_input(student_id):
         selected_subj = st.selectbox("과목 선택", list(subj_options.keys()))
         selected_subj_id = subj_options[selected_subj]
 
-    col3, col4, col5 = st.columns(3)
+    col3, col4, col5, col6 = st.columns(4)
     with col3:
         grade_num = st.selectbox("등급 (1~9)", list(range(1, 10)), index=2)
     with col4:
         raw_score = st.number_input("원점수 (선택)", min_value=0.0, max_value=100.0, value=0.0, step=0.5)
     with col5:
         rank_in_class = st.number_input("반석차 (선택)", min_value=0, value=0, step=1)
+    with col6:
+        credit_units = st.number_input("이수단위", min_value=1, max_value=10, value=db.DEFAULT_CREDIT_UNITS, step=1)
 
     if st.button("저장", key="save_grade", use_container_width=True, type="primary"):
         db.save_grade(
             student_id, selected_term_id, selected_subj_id, grade_num,
             raw_score if raw_score > 0 else None,
             rank_in_class if rank_in_class > 0 else None,
-            'student'
+            'student',
+            credit_units
         )
         st.success(f"{selected_term_label} / {selected_subj} / {grade_num}등급 저장 완료")
         st.rerun()
@@ -198,6 +202,7 @@ def tab_naesin_input(student_id):
             '등급': g['grade_level_num'],
             '원점수': g['raw_score'] or '-',
             '반석차': g['rank_in_class'] or '-',
+            '이수단위': g['credit_units'],
             '교사확인': '완료' if g['verified_by_teacher'] else '미확인',
         } for g in show_grades])
 
@@ -211,10 +216,89 @@ def tab_naesin_input(student_id):
             )
             fig.update_yaxes(autorange='reversed', title='등급 (낮을수록 우수)')
             st.plotly_chart(fig, use_container_width=True)
+
+        term_gpa = db.get_term_gpa(student_id)
+        if len(term_gpa) >= 2:
+            df_gpa = pd.DataFrame([{
+                '학기': f"{t['school_year']}-{t['grade_level']}학년 {t['semester']}학기",
+                '평균 등급': t['weighted_avg'],
+            } for t in term_gpa])
+            fig_gpa = px.line(df_gpa, x='학기', y='평균 등급', markers=True,
+                              title='학기별 평균 등급 추이 (이수단위 가중)')
+            fig_gpa.update_yaxes(autorange='reversed')
+            st.plotly_chart(fig_gpa, use_container_width=True)
+
+        st.divider()
+        section_whatif(student_id, term_options, subj_options, grades)
     else:
         st.info("입력된 내신 기록이 없습니다.")
 
 
+def section_whatif(student_id, term_options, subj_options, grades):
+    """가상 성적으로 평균·추천 구간이 어떻게 바뀌는지 (실제 성적/스냅샷은 그대로)."""
+    st.subheader("가상 성적 시뮬레이션")
+    st.caption("성적을 바꿨다고 가정했을 때 내신 평균과 학과별 구간(안정/적정/도전) 변화를 봅니다. 실제 성적은 저장되지 않습니다.")
+
+    edits = st.session_state.setdefault('whatif_edits', [])
+    current = {(g['term_id'], g['subject_id']): g for g in grades}
+    term_names = {v: k for k, v in term_options.items()}
+    subj_names = {v: k for k, v in subj_options.items()}
+
+    w1, w2, w3, w4 = st.columns([2, 2, 3, 1])
+    with w1:
+        w_term = term_options[st.selectbox("학기", list(term_options.keys()), key='whatif_term')]
+    with w2:
+        w_subj = subj_options[st.selectbox("과목", list(subj_options.keys()), key='whatif_subj')]
+    cur = current.get((w_term, w_subj))
+    with w3:
+        w_grade = st.slider("가정 등급", 1, 9, cur['grade_level_num'] if cur else 3,
+                            key=f'whatif_grade_{w_term}_{w_subj}',
+                            help=f"현재 {cur['grade_level_num']}등급" if cur else "입력된 성적 없음 (새 과목으로 추가)")
+    with w4:
+        w_units = st.number_input("이수단위", min_value=1, max_value=10,
+                                  value=cur['credit_units'] if cur else db.DEFAULT_CREDIT_UNITS,
+                                  key=f'whatif_units_{w_term}_{w_subj}')
+
+    draft = {'term_id': w_term, 'subject_id': w_subj, 'grade': w_grade, 'credit_units': w_units}
+    b1, b2, b3 = st.columns([2, 2, 3])
+    if b1.button("가정 추가", key='whatif_add', use_container_width=True):
+        edits[:] = [e for e in edits if (e['term_id'], e['subject_id']) != (w_term, w_subj)] + [draft]
+    if b2.button("가정 초기화", key='whatif_reset', use_container_width=True):
+        edits.clear()
+    region = b3.selectbox("지역", ['전체'] + list(eng.REGION_LABELS.keys()), key='whatif_region',
+                          format_func=lambda k: eng.REGION_LABELS.get(k, k))
+
+    # 슬라이더 값(draft)은 추가하지 않아도 바로 반영
+    scenario = [e for e in edits if (e['term_id'], e['subject_id']) != (w_term, w_subj)] + [draft]
+    sim = eng.simulate_naesin(student_id, scenario, region_filter=None if region == '전체' else region)
+
+    if edits:
+        st.markdown("**적용 중인 가정:** " + ", ".join(
+            f"{term_names.get(e['term_id'], e['term_id'])} {subj_names.get(e['subject_id'], e['subject_id'])} "
+            f"{e['grade']}등급({e['credit_units']}단위)" for e in edits))
+
+    m1, m2, m3, m4 = st.columns(4)
+    base, new = sim['base_avg'], sim['new_avg']
+    m1.metric("가정 내신 평균", f"{new:.2f}등급" if new is not None else "-",
+              delta=f"{new - base:+.2f}" if new is not None and base is not None else None,
+              delta_color="inverse")
+    for col, zone in zip((m2, m3, m4), ('안정', '적정', '도전')):
+        after = sim['zone_counts_after'][zone]
+        col.metric(f"{zone} 학과", after, delta=after - sim['zone_counts_before'][zone] or None)
+
+    if sim['changed']:
+        st.dataframe(pd.DataFrame([{
+            '대학': c['university'],
+            '학과': c['department'],
+            '지역': c['region'],
+            '내신 컷': c['cutoff_naesin'],
+            '현재 구간': c['zone_before'],
+            '가정 구간': c['zone_after'],
+        } for c in sim['changed']]), use_container_width=True)
+    else:
+        st.info("구간이 바뀌는 학과가 없습니다.")
+
+
 # ─────────────────────────────────────────────────────────
 # 탭 2: 활동(학종) 입력
 # ─────────────────────────────────────────────────────────
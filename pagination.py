@@ -0,0 +1,70 @@
+import read_cache
+
+# ─────────────────────────────────────────────────────────
+# 키셋(커서) 페이지네이션
+#
+# - 정렬 키(예: created_at, id)를 모두 내림차순으로 두고, 마지막 행의 키 값을 커서로 쓴다
+#   → 다음 페이지는 WHERE (키...) < (커서...) 로 인덱스 위치에서 바로 이어 읽음 (OFFSET 없음)
+# - 마지막 정렬 키는 고유해야 한다 (같은 시각 행이 페이지 경계에서 빠지거나 겹치지 않도록)
+# - 페이지 단위로 read_cache 에 보관 → 쓰기(bump) 후에는 새로 읽음
+# - lazy_rows/more_button: 화면에서는 '더 보기'로 연 페이지 수만 세션에 기억
+# ─────────────────────────────────────────────────────────
+
+DEFAULT_PAGE_SIZE = 20
+
+
+def keyset_page(query_rows, sql, params, order, limit, cursor=None):
+    """
+    sql: ORDER BY/LIMIT 없이 WHERE 절까지 쓴 SELECT (WHERE 가 반드시 있어야 함).
+    order: [(SQL 식, 결과 키), ...] 정렬 키. 모두 내림차순.
+    반환: (dict 리스트, 다음 커서 또는 None)
+    """
+    exprs = [expr for expr, _ in order]
+    params = list(params)
+    if cursor:
+        sql += f" AND ({', '.join(exprs)}) < ({', '.join('?' * len(exprs))})"
+        params += list(cursor)
+    sql += " ORDER BY " + ", ".join(f"{expr} DESC" for expr in exprs) + " LIMIT ?"
+    rows = [dict(r) for r in query_rows(sql, params + [int(limit) + 1])]
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, tuple(rows[-1][key] for _, key in order)
+
+
+def cached_page(db_path, name, tables, args, limit, cursor, loader):
+    """keyset_page 결과를 read_cache 에 페이지 단위로 보관."""
+    frozen, next_cursor = read_cache.cached_value(
+        db_path, name, tables, (*args, limit, cursor),
+        lambda: _freeze(loader()))
+    return read_cache.thaw_rows(frozen), next_cursor
+
+
+def _freeze(page):
+    rows, next_cursor = page
+    return read_cache.freeze_rows(rows), next_cursor
+
+
+def lazy_rows(key, fetch_page, page_size=DEFAULT_PAGE_SIZE, reset_token=None):
+    """
+    fetch_page(limit, cursor) → (rows, next_cursor) 를 '더 보기'로 연 페이지 수만큼 이어 붙인다.
+    reset_token 이 바뀌면(학생/필터 변경 등) 첫 페이지부터 다시. 반환: (rows, 더 있는지)
+    """
+    import streamlit as st
+    state = st.session_state.setdefault(f"_lazy_{key}", {'pages': 1, 'token': reset_token})
+    if state['token'] != reset_token:
+        state.update(pages=1, token=reset_token)
+    rows, cursor = [], None
+    for _ in range(state['pages']):
+        page, cursor = fetch_page(page_size, cursor)
+        rows.extend(page)
+        if cursor is None:
+            break
+    return rows, cursor is not None
+
+
+def more_button(key, has_more, label="더 보기"):
+    import streamlit as st
+    if has_more and st.button(label, key=f"_lazy_more_{key}", use_container_width=True):
+        st.session_state[f"_lazy_{key}"]['pages'] += 1
+        st.rerun()
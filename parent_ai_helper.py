@@ -1,62 +1,138 @@
-import os
+import json
+
 import streamlit as st
 
-from openai import OpenAI
+import ai_cache
+import ai_client
+import ai_governor
 
 
 def _get_api_key() -> str:
-    """
-    API 키 우선순위:
-    1) 환경변수 OPENAI_API_KEY
-    2) 프로젝트 루트 api_key.txt (OPENAI_API_KEY=... 형식)
-    """
-    key = os.getenv("OPENAI_API_KEY", "").strip()
-    if key:
-        return key
+    """API 키는 공용 클라이언트 팩토리(ai_client)에서 한 번만 해석."""
+    if not ai_client.is_configured():
+        return ""
+    return ai_client.resolve_api_key() or ai_client.LOCAL_PLACEHOLDER_KEY
+
 
+def _parent_caller():
     try:
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        key_file = os.path.join(base_dir, "api_key.txt")
-        with open(key_file, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if line.startswith("OPENAI_API_KEY="):
-                    return line.split("=", 1)[1].strip()
+        return 'parent', st.session_state.get("parent_id")
     except Exception:
-        pass
+        return 'parent', None
 
-    return ""
 
-
-def generate_ai_text(prompt: str) -> str | None:
+def generate_ai_text(prompt: str, force: bool = False) -> str | None:
     """
     AI ON/OFF 토글(st.session_state["use_openai"])에 따라 동작.
     - OFF → None 반환 (호출 없음, 비용 0)
     - ON  → OpenAI 호출 후 텍스트 반환
+    - force=True → 토글과 무관하게 호출 (페이지 밖 야간 일괄 생성용)
     - 오류 발생 시 절대 프로그램 중단하지 않고 None 반환
     """
 
-    if not st.session_state.get("use_openai", False):
+    if not force and not st.session_state.get("use_openai", False):
         return None
 
     api_key = _get_api_key()
     if not api_key:
         return None
 
-    try:
-        client = OpenAI(api_key=api_key)
-
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "너는 학부모/학생을 돕는 루틴 코치다. 낙인/압박 금지. 실행 가능한 조언만."},
-                {"role": "user", "content": prompt},
-            ],
+    model = "gpt-4o-mini"
+    messages = [
+        {"role": "system", "content": "너는 학부모/학생을 돕는 루틴 코치다. 낙인/압박 금지. 실행 가능한 조언만."},
+        {"role": "user", "content": prompt},
+    ]
+
+    def call():
+        return ai_client.chat_text(
+            model,
+            messages,
             max_tokens=400,
             temperature=0.7,
+            timeout=15,
+            func="parent_ai_text",
+        )
+
+    try:
+        with ai_governor.caller(*_parent_caller()):
+            content = ai_cache.cached_call("parent_ai_text", model, messages, call)
+        return content.strip() if content else None
+
+    except Exception:
+        return None
+
+
+def generate_ai_sections(section_prompts: dict) -> dict | None:
+    """
+    여러 섹션을 한 번의 호출로 생성 (JSON 스키마 응답).
+    section_prompts: {섹션키: 섹션별 요구사항 프롬프트}
+    - 모든 키가 비어있지 않은 문자열로 채워졌을 때만 {섹션키: 텍스트} 반환
+    - OFF / 키 없음 / 오류 / 검증 실패 → None (호출부에서 섹션별 생성으로 대체)
+    """
+
+    if not st.session_state.get("use_openai", False) or not section_prompts:
+        return None
+
+    if not _get_api_key():
+        return None
+
+    keys = list(section_prompts.keys())
+    body = "\n\n".join(f"### [{k}]\n{p.strip()}" for k, p in section_prompts.items())
+    prompt = (
+        "아래 각 섹션의 요구사항에 맞춰 답을 작성하고, "
+        f"키가 {', '.join(keys)} 인 JSON 객체 하나로만 응답하라. "
+        "각 값은 해당 섹션의 본문(줄바꿈 포함 문자열)이다.\n\n" + body
+    )
+
+    model = "gpt-4o-mini"
+    messages = [
+        {"role": "system", "content": "너는 학부모/학생을 돕는 루틴 코치다. 낙인/압박 금지. 실행 가능한 조언만."},
+        {"role": "user", "content": prompt},
+    ]
+    response_format = {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "parent_sections",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {k: {"type": "string"} for k in keys},
+                "required": keys,
+                "additionalProperties": False,
+            },
+        },
+    }
+
+    def call():
+        content = ai_client.chat_text(
+            model,
+            messages,
+            max_tokens=400 * len(keys),
+            temperature=0.7,
+            timeout=30,
+            response_format=response_format,
+            func="parent_ai_sections",
         )
+        _validate_sections(content, keys)  # 검증 실패한 응답은 캐시에 남기지 않음
+        return content
 
-        return response.choices[0].message.content.strip()
+    try:
+        with ai_governor.caller(*_parent_caller()):
+            content = ai_cache.cached_call("parent_ai_sections", model, messages, call)
+        return _validate_sections(content, keys)
 
     except Exception:
         return None
+
+
+def _validate_sections(content, keys) -> dict:
+    data = json.loads(content or "")
+    if not isinstance(data, dict):
+        raise ValueError("JSON 객체가 아님")
+    out = {}
+    for k in keys:
+        v = data.get(k)
+        if not isinstance(v, str) or not v.strip():
+            raise ValueError(f"섹션 누락: {k}")
+        out[k] = v.strip()
+    return out
@@ -0,0 +1,372 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import ai_governor
+import database as db
+import openai_helper as ai
+import question_similarity as qsim
+
+# ─────────────────────────────────────────────────────────
+# 문제 은행
+#
+# 같은 (과목, 학년, 페이지 범위, 난이도, 시험 유형) 요청은 은행 풀에서
+# 학생이 아직 안 본 문제로 먼저 채우고, 부족한 개수만 AI로 생성한다.
+# 생성된 문제는 내용 해시로 은행에 쌓여 다음 학생이 재사용한다.
+# 학생이 이미 받은 문제와 거의 같은 문제(n-gram 유사도)는 출제하지 않는다.
+# ─────────────────────────────────────────────────────────
+
+_lock = threading.Lock()
+stats = {
+    'requests': 0,
+    'full_hits': 0,        # 은행만으로 충족
+    'partial_hits': 0,     # 일부 생성
+    'misses': 0,           # 전부 생성
+    'served_from_bank': 0,
+    'generated': 0,
+    'prefetched': 0,       # 풀이 중 미리 만든 다음 세트
+    'prefetch_used': 0,    # 그중 실제로 시작된 세트
+    'near_duplicates': 0,  # 이미 본 문제와 거의 같아 뺀 문제
+}
+
+
+def _stat(**kw):
+    with _lock:
+        for k, v in kw.items():
+            stats[k] += v
+
+
+def get_stats():
+    with _lock:
+        out = dict(stats)
+    served = out['served_from_bank'] + out['generated']
+    out['question_hit_rate'] = round(out['served_from_bank'] / served, 3) if served else 0.0
+    out['request_hit_rate'] = round(out['full_hits'] / out['requests'], 3) if out['requests'] else 0.0
+    return out
+
+
+def _collect_set(student_id, bank_key, subject, grade, page_start, page_end,
+                 difficulty, exam_type, num_questions):
+    """
+    은행의 안 본 문제 + 부족분 생성으로 세트를 모은다 (출제 기록은 남기지 않음).
+    반환: (content_hash 가 붙은 문제 리스트, 은행에서 가져온 수, 새로 생성한 수)
+    """
+    from_bank = _unseen_from_bank(student_id, bank_key, num_questions)
+    picked = [{'question_text': q['question_text'], 'answer': q['answer'],
+               'explanation': q['explanation'], 'content_hash': q['content_hash']} for q in from_bank]
+    hashes = {q['content_hash'] for q in picked}
+
+    shortfall = num_questions - len(picked)
+    generated_count = 0
+    if shortfall > 0:
+        generated = ai.generate_questions(subject, grade, page_start, page_end,
+                                          difficulty, exam_type, shortfall) or []
+        if generated:
+            new_hashes = db.bank_add_questions(bank_key, generated)   # 비슷해도 은행에는 쌓음 (다른 학생용)
+            fresh, dropped = qsim.filter_near_duplicates(
+                student_id, [dict(q, content_hash=h) for q, h in zip(generated, new_hashes)], accepted=picked)
+            _stat(near_duplicates=dropped)
+            for q in fresh:
+                if q['content_hash'] in hashes:
+                    continue
+                picked.append(q)
+                hashes.add(q['content_hash'])
+                generated_count += 1
+    return picked[:num_questions], len(from_bank), generated_count
+
+
+def _unseen_from_bank(student_id, bank_key, limit):
+    """은행의 안 본 문제 중 이미 본 문제와 거의 같은 것을 뺀 목록."""
+    from_bank = db.bank_get_unseen(student_id, bank_key, limit)
+    fresh, dropped = qsim.filter_near_duplicates(student_id, from_bank)
+    _stat(near_duplicates=dropped)
+    return fresh
+
+
+def _strip_hash(questions):
+    return [{k: v for k, v in q.items() if k != 'content_hash'} for q in questions]
+
+
+def get_question_set(student_id, subject, grade, page_start, page_end,
+                     difficulty, exam_type, num_questions, use_bank=True):
+    """
+    문제 세트를 반환 (question_text/answer/explanation dict 리스트).
+    use_bank=False(AI OFF, Mock) 이면 은행을 거치지 않고 바로 생성한다.
+    생성 실패 시 은행에서 확보한 문제만 반환하며, 둘 다 없으면 None.
+    """
+    if not use_bank:
+        return ai.generate_questions(subject, grade, page_start, page_end,
+                                     difficulty, exam_type, num_questions)
+
+    bank_key = db.make_bank_key(subject, grade, page_start, page_end, difficulty, exam_type)
+    picked, from_bank, generated_count = _collect_set(student_id, bank_key, subject, grade,
+                                                      page_start, page_end, difficulty, exam_type,
+                                                      num_questions)
+    shortfall = num_questions - from_bank
+    _stat(requests=1,
+          full_hits=1 if shortfall <= 0 else 0,
+          partial_hits=1 if 0 < shortfall < num_questions else 0,
+          misses=1 if shortfall >= num_questions else 0,
+          served_from_bank=from_bank,
+          generated=generated_count)
+
+    if not picked:
+        return None
+    db.bank_mark_served(student_id, bank_key, [q['content_hash'] for q in picked])
+    return _strip_hash(picked)
+
+
+def stream_question_set(student_id, subject, grade, page_start, page_end,
+                        difficulty, exam_type, num_questions, use_bank=True):
+    """
+    get_question_set 의 스트리밍 버전. 은행 문제를 먼저, 이어서 생성되는 문제를
+    완성되는 대로 내보내는 iterator 를 반환한다. (AI ON/OFF 판단은 호출 시점)
+    """
+    if not use_bank:
+        return ai.generate_questions_stream(subject, grade, page_start, page_end,
+                                            difficulty, exam_type, num_questions)
+
+    bank_key = db.make_bank_key(subject, grade, page_start, page_end, difficulty, exam_type)
+    from_bank = _unseen_from_bank(student_id, bank_key, num_questions)
+    shortfall = num_questions - len(from_bank)
+    generated_iter = iter(())
+    if shortfall > 0:
+        generated_iter = ai.generate_questions_stream(subject, grade, page_start, page_end,
+                                                      difficulty, exam_type, shortfall)
+    return _stream_with_bank(student_id, bank_key, from_bank, generated_iter, num_questions)
+
+
+def _stream_with_bank(student_id, bank_key, from_bank, generated_iter, num_questions):
+    hashes = []
+    served = list(from_bank)
+    generated_count = 0
+    try:
+        for q in from_bank:
+            hashes.append(q['content_hash'])
+            yield {'question_text': q['question_text'], 'answer': q['answer'],
+                   'explanation': q['explanation']}
+        for q in generated_iter:
+            if len(hashes) >= num_questions:
+                break
+            h = db.bank_add_questions(bank_key, [q])[0]
+            if h in hashes:
+                continue
+            if not qsim.filter_near_duplicates(student_id, [q], accepted=served)[0]:
+                _stat(near_duplicates=1)
+                continue
+            served.append(q)
+            hashes.append(h)
+            generated_count += 1
+            yield q
+    finally:
+        shortfall = num_questions - len(from_bank)
+        _stat(requests=1,
+              full_hits=1 if shortfall <= 0 else 0,
+              partial_hits=1 if 0 < shortfall < num_questions else 0,
+              misses=1 if shortfall >= num_questions else 0,
+              served_from_bank=len(from_bank),
+              generated=generated_count)
+        if hashes:
+            db.bank_mark_served(student_id, bank_key, hashes)
+
+
+# ─────────────────────────────────────────────────────────
+# 세션 점진 채우기 (백그라운드 스레드)
+#
+# 세션을 먼저 만들고, 문제가 완성될 때마다 questions 테이블에 저장한다.
+# 페이지는 첫 문제가 저장되는 즉시 풀이 화면으로 넘어가고,
+# stream_status() 로 진행 상황을 확인해 나머지를 이어서 불러온다.
+# 첫 문제를 기다리다 포기하면 cancel_streaming_session() 으로 작업을 멈추고 세션을 지운다
+# (실패했다고 안내한 세션이 나중에 채워져 학습 기록에 남지 않도록).
+# ─────────────────────────────────────────────────────────
+
+_jobs = {}
+_jobs_cond = threading.Condition()
+JOB_RETENTION_SECONDS = 3600
+
+
+def start_streaming_session(session_id, question_iter, num_questions):
+    job = {'count': 0, 'total': num_questions, 'done': False, 'error': None, 'started': time.time(),
+           'cancelled': False, 'lock': threading.Lock()}
+    with _jobs_cond:
+        for sid in [k for k, v in _jobs.items() if v['done'] and time.time() - v['started'] > JOB_RETENTION_SECONDS]:
+            del _jobs[sid]
+        _jobs[session_id] = job
+
+    def run():
+        try:
+            for q in question_iter:
+                number = job['count'] + 1
+                with job['lock']:           # 취소(세션 삭제)와 저장이 엇갈리지 않게
+                    if job['cancelled']:
+                        break
+                    db.save_questions(session_id, [{
+                        'question_number': number,
+                        'question_text': q.get('question_text') or q.get('question', f'문제 {number}'),
+                        'answer': q.get('answer', ''),
+                        'explanation': q.get('explanation', ''),
+                    }])
+                with _jobs_cond:
+                    job['count'] = number
+                    _jobs_cond.notify_all()
+                if number >= num_questions:
+                    break
+        except Exception as e:
+            job['error'] = str(e)
+        finally:
+            close = getattr(question_iter, 'close', None)
+            if close:
+                close()
+            if job['cancelled']:
+                pass                        # 세션은 cancel_streaming_session 이 이미 지움
+            elif job['count'] != num_questions:
+                if job['count']:
+                    db.update_session_total(session_id, job['count'])
+                else:
+                    db.delete_study_session(session_id)
+            with _jobs_cond:
+                job['done'] = True
+                _jobs_cond.notify_all()
+
+    threading.Thread(target=run, name=f"question-stream-{session_id}", daemon=True).start()
+    return job
+
+
+def wait_first_question(session_id, timeout=60):
+    """첫 문제가 저장되거나 작업이 끝날 때까지 대기. 저장된 문제 수 반환."""
+    deadline = time.time() + timeout
+    with _jobs_cond:
+        job = _jobs.get(session_id)
+        while job and job['count'] == 0 and not job['done']:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            _jobs_cond.wait(remaining)
+        return job['count'] if job else 0
+
+
+def cancel_streaming_session(session_id):
+    """
+    첫 문제가 아직 없으면 작업을 멈추고 세션을 지운다 (진행 중인 생성 결과는 저장하지 않음).
+    그 사이 문제가 저장됐으면 그대로 둔다. 반환: 남은(저장된) 문제 수 — 0 이면 세션 없음.
+    """
+    with _jobs_cond:
+        job = _jobs.get(session_id)
+    if not job:
+        return 0
+    with job['lock']:
+        if job['count'] == 0 and not job['cancelled']:
+            job['cancelled'] = True
+            db.delete_study_session(session_id)
+        return job['count']
+
+
+def stream_status(session_id):
+    with _jobs_cond:
+        job = _jobs.get(session_id)
+        return dict(job) if job else None
+
+
+# ─────────────────────────────────────────────────────────
+# 다음 세트 미리 생성 (풀이 중 백그라운드)
+#
+# 풀이 화면에 들어오면 같은 과목/학년/난이도로 페이지 범위를 한 칸 넘긴 세트를
+# 미리 만들어 prefetched_sets 에 대기시킨다. '새로운 학습'에서 바로 시작하면
+# 그때 학습 세션으로 옮기고 은행 출제 기록을 남긴다.
+# - 호출자는 'prefetch' 역할 → 학생 하루 AI 한도에 포함되지 않음
+# - 쓰이지 않은 세트는 PREFETCH_TTL_SECONDS 후 만료 (은행에 쌓인 문제는 다른 학생이 재사용)
+# - 전용 풀(PREFETCH_WORKERS)에서 실행 → 동기부여 문구 등 페이지 보조 작업(openai_helper.submit)을
+#   막지 않는다. 학생당 1건, 전체 대기+실행 PREFETCH_MAX_QUEUED 건을 넘으면 새 요청은 버림
+# ─────────────────────────────────────────────────────────
+
+PREFETCH_TTL_SECONDS = 3 * 3600
+PREFETCH_WORKERS = 2
+PREFETCH_MAX_QUEUED = 8
+_prefetching = set()          # 대기 중이거나 실행 중인 학생
+_prefetch_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="ai-prefetch")
+
+
+def next_page_range(page_start, page_end):
+    span = max(int(page_end) - int(page_start) + 1, 1)
+    return int(page_end) + 1, int(page_end) + span
+
+
+def submit_prefetch(student_id, *args, **kwargs):
+    """
+    prefetch_next_set 을 전용 풀에 넣고 Future 반환.
+    그 학생 것이 이미 대기/실행 중이거나 전체 대기가 가득 차면 넣지 않고 None.
+    """
+    with _lock:
+        if student_id in _prefetching or len(_prefetching) >= PREFETCH_MAX_QUEUED:
+            return None
+        _prefetching.add(student_id)
+    try:
+        return _prefetch_executor.submit(ai._with_script_ctx(_prefetch_claimed), student_id, *args, **kwargs)
+    except Exception:
+        with _lock:
+            _prefetching.discard(student_id)
+        raise
+
+
+def prefetch_next_set(student_id, subject, grade, page_start, page_end,
+                      difficulty, exam_type, num_questions, use_bank=True):
+    """다음 범위 세트를 만들어 대기시킨다. 이미 같은 세트가 대기 중이거나 생성 중이면 건너뜀."""
+    with _lock:
+        if student_id in _prefetching:
+            return None
+        _prefetching.add(student_id)
+    return _prefetch_claimed(student_id, subject, grade, page_start, page_end,
+                             difficulty, exam_type, num_questions, use_bank)
+
+
+def _prefetch_claimed(student_id, subject, grade, page_start, page_end,
+                      difficulty, exam_type, num_questions, use_bank=True):
+    """_prefetching 에 학생을 올린 뒤 호출 — 끝나면 내린다."""
+    next_start, next_end = next_page_range(page_start, page_end)
+    bank_key = db.make_bank_key(subject, grade, next_start, next_end, difficulty, exam_type)
+    try:
+        db.expire_prefetched_sets(student_id)
+        pending = db.get_pending_prefetch(student_id)
+        if pending and pending['bank_key'] == bank_key and pending['num_questions'] >= num_questions:
+            return pending['id']
+
+        with ai_governor.caller('prefetch', student_id):
+            if use_bank:
+                questions, _, _ = _collect_set(student_id, bank_key, subject, grade, next_start, next_end,
+                                               difficulty, exam_type, num_questions)
+            else:
+                questions = ai.generate_questions(subject, grade, next_start, next_end,
+                                                  difficulty, exam_type, num_questions) or []
+        if not questions:
+            return None
+        prefetch_id = db.save_prefetched_set(student_id, bank_key, subject, grade, next_start, next_end,
+                                             difficulty, exam_type, questions, PREFETCH_TTL_SECONDS)
+        _stat(prefetched=1)
+        return prefetch_id
+    finally:
+        with _lock:
+            _prefetching.discard(student_id)
+
+
+def get_prefetched(student_id):
+    """시작 가능한 대기 세트 정보 (없으면 None)."""
+    db.expire_prefetched_sets(student_id)
+    return db.get_pending_prefetch(student_id)
+
+
+def start_prefetched_session(student_id, prefetch_id):
+    """대기 세트로 학습 세션을 만들고 session_id 반환. 이미 사용/만료됐으면 None."""
+    pending = db.get_pending_prefetch(student_id)
+    if not pending or pending['id'] != prefetch_id or not db.claim_prefetched_set(prefetch_id):
+        return None
+    questions = pending['questions']
+    session_id = db.create_study_session(
+        student_id, pending['subject'], pending['grade'], pending['page_start'], pending['page_end'],
+        pending['difficulty'], pending['exam_type'], len(questions)
+    )
+    db.save_questions(session_id, [dict(q, question_number=i) for i, q in enumerate(_strip_hash(questions), 1)])
+    hashes = [q['content_hash'] for q in questions if q.get('content_hash')]
+    if hashes:
+        db.bank_mark_served(student_id, pending['bank_key'], hashes)
+    _stat(prefetch_used=1)
+    return session_id
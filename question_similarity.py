@@ -0,0 +1,304 @@
+import math
+import re
+import threading
+from array import array
+from collections import Counter
+
+import numpy as np
+
+import database as db
+
+# ─────────────────────────────────────────────────────────
+# 유사 문제 색인 (문자 n-gram TF-IDF, 메모리 역색인)
+#
+# - 문서 = questions.question_text (오답 복습 복사본 제외), 2·3-gram 문자 단위
+#   → 띄어쓰기/조사/보기 기호가 달라도 같은 문제를 잡아낸다
+# - n-gram 별 게시 목록(문서 번호 int32, log tf float32)을 array 로 쌓는 희소 행렬
+#   질의 시 해당 n-gram 들의 게시 목록만 numpy 로 합산 → 전체 문서 수와 무관하게 수 ms
+# - 코사인이 되려면 문서 길이(norm)와 질의 가중치가 같은 idf 를 써야 한다
+#   → idf 는 n-gram 별로 고정값(self.idf): renormalize() 때 현재 df 로 다시 잡고,
+#     그 사이 처음 나온 n-gram 은 처음 본 시점 값으로 고정. 문서 길이도 같은 값으로 계산
+# - 너무 흔한 n-gram(df 비율 MAX_DF_RATIO 초과)은 renormalize() 때 stop 으로 정해
+#   문서 길이·질의 양쪽에서 모두 뺀다 (idf 가 낮아 순위 영향 적음)
+# - sync() 가 마지막으로 색인한 id 이후의 새 문항만 추가 (질의 때마다 자동 호출,
+#   처음 전체 색인은 warm_up() 으로 백그라운드에서). 색인이 RENORM_GROWTH 배로 커지면
+#   renormalize() 로 idf·stop·문서 길이를 다시 계산 (rebuild() 는 처음부터 다시)
+#
+# 용도: 새로 만든 문제 중 학생이 이미 본 문제와 거의 같은 것 걸러내기,
+#       틀린 문제와 비슷한 지난 문제 추천
+# ─────────────────────────────────────────────────────────
+
+NGRAM_SIZES = (2, 3)
+DUP_THRESHOLD = 0.85          # 이 이상이면 사실상 같은 문제
+MAX_DF_RATIO = 0.02
+MIN_DOCS_FOR_PRUNE = 1000
+SYNC_BATCH = 2000
+RENORM_GROWTH = 2.0
+
+_NON_TEXT = re.compile(r'[^0-9a-z가-힣ㄱ-ㅎ一-鿿]+')
+
+
+def text_ngrams(text):
+    s = _NON_TEXT.sub('', str(text or '').lower())
+    grams = Counter()
+    for n in NGRAM_SIZES:
+        grams.update(s[i:i + n] for i in range(len(s) - n + 1))
+    return grams
+
+
+class NgramIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.postings = {}              # gram → (array('i') 문서 번호, array('f') 1+log tf)
+        self.doc_qid = array('q')       # 문서 번호 → questions.id
+        self.doc_student = array('q')
+        self.doc_subject = array('i')
+        self.doc_norm = array('f')
+        self.subject_codes = {}
+        self.last_id = 0
+        self.idf = {}                   # gram → 고정 idf (문서 길이·질의 공통)
+        self.stop = set()               # 너무 흔해 양쪽에서 빼는 gram
+        self.renorm_n = 0               # 마지막 renormalize() 때 문서 수
+
+    def __len__(self):
+        return len(self.doc_qid)
+
+    def _idf(self, df, n):
+        return math.log((1 + n) / (1 + df)) + 1.0
+
+    def _fixed_idf(self, g, df, n):
+        idf = self.idf.get(g)
+        if idf is None:
+            idf = self.idf[g] = self._idf(df, n)
+        return idf
+
+    def add(self, qid, student_id, subject, text):
+        grams = text_ngrams(text)
+        doc = len(self.doc_qid)
+        n = doc + 1
+        norm = 0.0
+        for g, tf in grams.items():
+            post = self.postings.get(g)
+            if post is None:
+                post = self.postings[g] = (array('i'), array('f'))
+            w = 1.0 + math.log(tf)
+            post[0].append(doc)
+            post[1].append(w)
+            if g not in self.stop:
+                norm += (w * self._fixed_idf(g, len(post[0]), n)) ** 2
+        self.doc_qid.append(qid)
+        self.doc_student.append(student_id)
+        self.doc_subject.append(self.subject_codes.setdefault(subject, len(self.subject_codes)))
+        self.doc_norm.append(math.sqrt(norm) or 1.0)
+        self.last_id = max(self.last_id, qid)
+
+    def renormalize(self):
+        """현재 df 로 idf·stop 을 다시 정하고 모든 문서 길이를 다시 계산. lock 안에서 호출."""
+        n = len(self.doc_qid)
+        max_df = MAX_DF_RATIO * n if n >= MIN_DOCS_FOR_PRUNE else n
+        self.idf, self.stop = {}, set()
+        ids, sq = [], []
+        for g, (docs, weights) in self.postings.items():
+            df = len(docs)
+            if df > max_df:
+                self.stop.add(g)
+                continue
+            idf = self.idf[g] = self._idf(df, n)
+            ids.append(np.frombuffer(docs, dtype=np.int32))
+            sq.append((np.frombuffer(weights, dtype=np.float32).astype(np.float64) * idf) ** 2)
+        if ids:
+            norms = np.sqrt(np.bincount(np.concatenate(ids), weights=np.concatenate(sq), minlength=n))
+            norms[norms == 0] = 1.0
+            self.doc_norm = array('f', norms.astype(np.float32).tobytes())
+        else:
+            self.doc_norm = array('f', [1.0] * n)
+        self.renorm_n = n
+
+    def scores(self, text):
+        """질의 문장 → (문서 번호 배열, 코사인 유사도 배열). lock 안에서 호출."""
+        grams = text_ngrams(text)
+        n = len(self.doc_qid)
+        if not grams or not n:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        ids, contrib = [], []
+        qnorm = 0.0
+        for g, tf in grams.items():
+            if g in self.stop:
+                continue
+            post = self.postings.get(g)
+            idf = self.idf.get(g) or self._idf(0, n)     # 색인에 없는 gram 은 질의 길이에만
+            w = (1.0 + math.log(tf)) * idf
+            qnorm += w * w
+            if not post:
+                continue
+            ids.append(np.frombuffer(post[0], dtype=np.int32).copy())
+            contrib.append(np.frombuffer(post[1], dtype=np.float32) * np.float32(w * idf))
+        if not ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        dot = np.bincount(np.concatenate(ids), weights=np.concatenate(contrib), minlength=n)
+        docs = np.flatnonzero(dot)
+        norms = np.frombuffer(self.doc_norm, dtype=np.float32)[docs]
+        return docs, (dot[docs] / (math.sqrt(qnorm) * norms)).astype(np.float32)
+
+
+_index = NgramIndex()
+_sync_lock = threading.Lock()
+_warm_started = False
+
+
+def sync(wait=True):
+    """
+    마지막 색인 이후 저장된 문항을 색인에 추가하고 추가한 수 반환.
+    wait=False 면 다른 스레드가 색인 중일 때 기다리지 않고 지금 색인을 그대로 쓴다.
+    """
+    if not _sync_lock.acquire(blocking=wait):
+        return 0
+    try:
+        index, added = _index, 0
+        while True:
+            rows = db._query_rows("""
+                SELECT q.id, q.question_text, ss.student_id, ss.subject
+                FROM questions q JOIN study_sessions ss ON ss.id = q.session_id
+                WHERE q.id > ? AND q.id NOT IN (SELECT question_id FROM retry_links)
+                ORDER BY q.id LIMIT ?
+            """, (index.last_id, SYNC_BATCH))
+            with index.lock:       # 묶음 단위로만 잡아 색인 중에도 질의가 오래 막히지 않게
+                for r in rows:
+                    index.add(r["id"], r["student_id"], r["subject"], r["question_text"])
+                if len(index) >= RENORM_GROWTH * max(index.renorm_n, 1):
+                    index.renormalize()
+            added += len(rows)
+            if len(rows) < SYNC_BATCH:
+                return added
+    finally:
+        _sync_lock.release()
+
+
+def warm_up():
+    """앱 시작 시 백그라운드로 색인을 채운다 (첫 질의가 전체 색인을 기다리지 않도록). 프로세스당 한 번."""
+    global _warm_started
+    with _sync_lock:
+        if _warm_started:
+            return
+        _warm_started = True
+    threading.Thread(target=sync, name="question-similarity-sync", daemon=True).start()
+
+
+def rebuild():
+    """색인을 처음부터 다시 만든다 (idf·stop·문서 길이까지 현재 데이터 기준으로)."""
+    global _index
+    with _sync_lock:
+        _index = NgramIndex()
+    added = sync()
+    with _index.lock:
+        _index.renormalize()
+    return added
+
+
+def _top(docs, sims, k, mask=None, min_sim=0.0):
+    keep = sims >= min_sim
+    if mask is not None:
+        keep &= mask
+    docs, sims = docs[keep], sims[keep]
+    if len(docs) > k:
+        part = np.argpartition(-sims, k - 1)[:k]
+        docs, sims = docs[part], sims[part]
+    order = np.argsort(-sims, kind='stable')
+    return docs[order], sims[order]
+
+
+def max_similarity_seen(student_id, text):
+    """학생이 이미 받은 문항 중 text 와 가장 비슷한 것의 유사도 (0~1)."""
+    sync(wait=False)
+    return _max_similarity_seen(student_id, text)
+
+
+def _max_similarity_seen(student_id, text):
+    with _index.lock:
+        docs, sims = _index.scores(text)
+        if not len(docs):
+            return 0.0
+        own = np.frombuffer(_index.doc_student, dtype=np.int64)[docs] == student_id
+        return float(sims[own].max()) if own.any() else 0.0
+
+
+def filter_near_duplicates(student_id, questions, threshold=DUP_THRESHOLD, accepted=()):
+    """
+    학생이 이미 본 문항, accepted(이번 세트에 이미 넣은 문항), 같은 묶음 안의 앞 문항과
+    거의 같은 문제를 뺀다. 반환: (남은 문항 리스트, 뺀 개수)
+    """
+    sync(wait=False)
+    kept = []
+    kept_grams = [text_ngrams(q.get('question_text') or q.get('question') or '') for q in accepted]
+    for q in questions:
+        text = q.get('question_text') or q.get('question') or ''
+        if _max_similarity_seen(student_id, text) >= threshold:
+            continue
+        grams = text_ngrams(text)
+        if any(_cosine(grams, other) >= threshold for other in kept_grams):
+            continue
+        kept.append(q)
+        kept_grams.append(grams)
+    return kept, len(questions) - len(kept)
+
+
+def _cosine(a, b):
+    """묶음 안 비교용 단순 tf 코사인 (색인 밖 문장끼리)."""
+    if not a or not b:
+        return 0.0
+    dot = sum(v * b.get(g, 0) for g, v in a.items())
+    return dot / (math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values())))
+
+
+def similar_questions(question_id=None, text=None, k=5, subject=None, student_id=None,
+                      min_sim=0.2):
+    """
+    question_id(또는 text)와 비슷한 지난 문항 상위 k개.
+    같은 문장(은행에서 여러 학생에게 나간 문제)은 한 번만, 자기 자신은 제외.
+    student_id 를 주면 그 학생이 받은 문항 안에서만 찾는다.
+    """
+    if text is None:
+        rows = db._query_rows("""
+            SELECT COALESCE(rl.source_question_id, q.id) AS root_id, root.question_text, rs.subject
+            FROM questions q LEFT JOIN retry_links rl ON rl.question_id = q.id
+            JOIN questions root ON root.id = COALESCE(rl.source_question_id, q.id)
+            JOIN study_sessions rs ON rs.id = root.session_id
+            WHERE q.id = ?
+        """, (question_id,))
+        if not rows:
+            return []
+        question_id, text = rows[0]["root_id"], rows[0]["question_text"]
+        subject = subject or rows[0]["subject"]
+    sync(wait=False)
+    with _index.lock:
+        docs, sims = _index.scores(text)
+        mask = np.ones(len(docs), dtype=bool)
+        if subject is not None:
+            code = _index.subject_codes.get(subject, -1)
+            mask &= np.frombuffer(_index.doc_subject, dtype=np.int32)[docs] == code
+        if student_id is not None:
+            mask &= np.frombuffer(_index.doc_student, dtype=np.int64)[docs] == student_id
+        docs, sims = _top(docs, sims, k * 4 + 1, mask, min_sim)
+        qids = np.frombuffer(_index.doc_qid, dtype=np.int64)[docs].tolist()
+        sims = sims.tolist()
+    if not qids:
+        return []
+
+    marks = ",".join("?" * len(qids))
+    found = {r["id"]: dict(r) for r in db._query_rows(f"""
+        SELECT q.id, q.question_text, q.answer, q.explanation, ss.subject, ss.grade, ss.student_id
+        FROM questions q JOIN study_sessions ss ON ss.id = q.session_id WHERE q.id IN ({marks})
+    """, qids)}
+    out, seen_texts = [], {re.sub(r'\s+', ' ', str(text or '')).strip()}
+    for qid, sim in zip(qids, sims):
+        row = found.get(qid)       # 삭제된 세션의 문항은 여기서 빠짐
+        if not row or qid == question_id:
+            continue
+        norm = re.sub(r'\s+', ' ', str(row["question_text"] or '')).strip()
+        if norm in seen_texts:
+            continue
+        seen_texts.add(norm)
+        out.append(dict(row, similarity=round(sim, 3)))
+        if len(out) >= k:
+            break
+    return out
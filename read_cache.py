@@ -0,0 +1,111 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# ─────────────────────────────────────────────────────────
+# 읽기 캐시 (테이블 버전 + PRAGMA data_version)
+#
+# - 쓰기 함수는 커밋 후 bump(테이블...) 호출 → 해당 테이블 버전 증가
+# - 캐시 키 = (이름, 인자, 의존 테이블 버전들, 외부 epoch)
+# - 감시용 연결의 PRAGMA data_version 이 바뀌면(다른 연결/프로세스 커밋)
+#   epoch 를 올려 모든 항목을 무효화 → 쓰기 이후 stale 값은 절대 반환하지 않음
+# - 값은 tuple 로 고정 저장하고, 호출자에게는 매번 새 dict 리스트를 돌려줌
+# ─────────────────────────────────────────────────────────
+
+MAX_ENTRIES = 2048
+
+_lock = threading.RLock()
+_versions = {}
+_entries = OrderedDict()
+_watchers = {}
+_epoch = 0
+
+stats = {'hits': 0, 'misses': 0, 'external_invalidations': 0}
+
+
+def bump(*tables):
+    with _lock:
+        for t in tables:
+            _versions[t] = _versions.get(t, 0) + 1
+
+
+def clear():
+    global _epoch
+    with _lock:
+        _entries.clear()
+        _epoch += 1
+
+
+def _check_external(db_path):
+    """감시 연결의 data_version 이 바뀌었으면 epoch 증가."""
+    global _epoch
+    with _lock:
+        w = _watchers.get(db_path)
+        if w is None:
+            con = sqlite3.connect(db_path, check_same_thread=False)
+            _watchers[db_path] = [con, con.execute("PRAGMA data_version").fetchone()[0]]
+            _epoch += 1
+            return
+        try:
+            v = w[0].execute("PRAGMA data_version").fetchone()[0]
+        except sqlite3.Error:
+            _watchers.pop(db_path, None)
+            _epoch += 1
+            return
+        if v != w[1]:
+            w[1] = v
+            _epoch += 1
+            stats['external_invalidations'] += 1
+
+
+def freeze_rows(rows):
+    return tuple(tuple(dict(r).items()) for r in rows)
+
+
+def thaw_rows(frozen):
+    return [dict(items) for items in frozen]
+
+
+def cached_rows(db_path, name, tables, args, loader):
+    """
+    loader() 는 sqlite3.Row 리스트(또는 dict 리스트)를 반환.
+    결과는 불변 tuple 로 보관되고 호출 시마다 dict 리스트 사본을 반환한다.
+    """
+    _check_external(db_path)
+    with _lock:
+        key = (db_path, name, args, tuple(_versions.get(t, 0) for t in tables), _epoch)
+        frozen = _entries.get(key)
+        if frozen is not None:
+            _entries.move_to_end(key)
+            stats['hits'] += 1
+            return thaw_rows(frozen)
+        stats['misses'] += 1
+
+    frozen = freeze_rows(loader())
+
+    with _lock:
+        _entries[key] = frozen
+        _entries.move_to_end(key)
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+    return thaw_rows(frozen)
+
+
+def cached_value(db_path, name, tables, args, loader):
+    """스칼라/불변 값 캐시 (예: 평균 등급)."""
+    _check_external(db_path)
+    with _lock:
+        key = (db_path, '$' + name, args, tuple(_versions.get(t, 0) for t in tables), _epoch)
+        if key in _entries:
+            _entries.move_to_end(key)
+            stats['hits'] += 1
+            return _entries[key]
+        stats['misses'] += 1
+
+    value = loader()
+
+    with _lock:
+        _entries[key] = value
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+    return value
@@ -0,0 +1,421 @@
+import argparse
+import datetime as dt
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import ai_cache
+import ai_client
+import ai_governor
+import database as db
+import parent_ai_helper
+
+# ─────────────────────────────────────────────────────────
+# 리포트 야간 일괄 생성
+#
+# - 연결된 학부모-학생 쌍(parent_student): 일간 리포트 / 월간 리포트
+# - 교사-학생 쌍(교사 페이지는 모든 교사가 전체 학생을 조회): 학습 분석 리포트
+# - 결과는 페이지와 같은 로그 테이블(parent_ai_log_v2 / teacher_ai_log)에 기준일(그날) 키로 저장
+#   → 다음 날 아침 페이지는 오늘 행이 없으면 어제(배치 기준일) 행을 보여 줌
+#     (자정 이후에 돌리면 '오늘'이 빈 날이 되므로 기준일 당일 밤, 자정 전에 실행)
+# - 항목별 진행 상태를 report_batch_items 에 기록 → 중단 후 재실행 시 완료 항목은 건너뜀
+# - 항목 하나가 실패해도 나머지는 계속 진행 (실패 항목은 다음 실행에서 재시도)
+#
+# 실행: python report_batch.py [--date YYYY-MM-DD] [--workers 4] [--only parent|teacher] [--force]
+# (예: 매일 23:30 cron / 작업 스케줄러 — 자정 전에 끝나도록)
+# ─────────────────────────────────────────────────────────
+
+DB_PATH = "student_system.db"
+MAX_WORKERS = 4
+
+# 학부모 페이지 (4) 과목별 학습 분석 / 교사 페이지 과목별 분석과 같은 과목 순서
+PARENT_SUBJECTS = ["국어", "영어", "수학", "과학", "사회", "한자"]
+TEACHER_SUBJECTS = ["국어", "영어", "수학", "과학", "사회", "한자", "역사"]
+
+TEACHER_MODEL = "gpt-3.5-turbo"
+TEACHER_SYSTEM = "당신은 교육 전문가입니다. 교사에게 학생 분석 리포트를 제공합니다."
+
+
+def get_conn():
+    con = sqlite3.connect(DB_PATH, timeout=10)
+    con.row_factory = sqlite3.Row
+    return con
+
+
+def ensure_batch_table():
+    con = get_conn()
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS report_batch_items (
+        run_date    TEXT NOT NULL,      -- YYYY-MM-DD
+        kind        TEXT NOT NULL,      -- daily_report | monthly_report | analysis
+        owner_id    INTEGER NOT NULL,   -- parent_id 또는 teacher_id
+        student_id  INTEGER NOT NULL,
+        status      TEXT NOT NULL,      -- done | failed
+        error       TEXT,
+        elapsed     REAL,
+        finished_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (run_date, kind, owner_id, student_id)
+    )
+    """)
+    con.commit()
+    con.close()
+
+
+# ─────────────────────────────────────────────────────────
+# 프롬프트 (페이지의 생성/갱신 버튼과 공용)
+# ─────────────────────────────────────────────────────────
+
+def daily_report_prompt(today, display_rows):
+    weak_text = ", ".join(
+        [f"{r['과목']}({r['정답률(%)']}%)" for r in display_rows if r['총 문항 수'] > 0][:5]
+    ) if display_rows else "데이터 없음"
+    return f"""
+학부모에게 제공할 '일간 리포트'를 작성하라. 낙인/비교/압박 금지.
+구성:
+- 오늘 성과(짧게)
+- 취약 개념(가능하면)
+- 내일 목표(현실적)
+- 부모님께 제안하는 말(단단하게 2문장)
+데이터:
+문항={today['questions']}, 정답률={today['correct_rate']}, 과목수={today['subjects']}
+취약개념={weak_text if weak_text else "데이터 없음"}
+"""
+
+
+def monthly_report_prompt(q, cr, subj):
+    return f"""
+학부모에게 제공할 '월간 리포트'를 작성하라. 낙인/비교/압박 금지.
+구성:
+- 이달의 성과
+- 취약 개념(가능하면)
+- 다음달 목표(현실적)
+- 부모님께 제안하는 말(단단하게 3문장)
+데이터:
+30일 문항={q}, 정답률={cr}, 과목수={subj}
+"""
+
+
+def teacher_analysis_prompt(name, grade, summary, subj_rows):
+    subj_text = ", ".join(
+        [f"{r['과목']}({r['정답률(%)']}%)" for r in subj_rows if r["총 문항"] > 0]
+    ) if subj_rows else "데이터 없음"
+    return f"""
+교사에게 제공할 학생 학습 분석 리포트를 작성하라.
+[학생 정보]
+- 이름: {name} / 학년: {grade}
+- 총 문항: {summary['total_questions']} / 정답률: {summary['correct_rate']}%
+- 학습일: {summary['study_days']}일 / 레벨: {summary['level']}
+- 과목별 현황: {subj_text}
+
+요구사항:
+1. 학생의 현재 학습 수준 요약 (2문장)
+2. 강점 과목 / 보강 권장 과목 (각 1개)
+3. 교사 권장 행동 3가지 (짧고 실용적으로)
+4. 학생에게 전달할 응원 메시지 1개
+
+낙인/비교/압박 금지. 성장 관점으로 작성.
+"""
+
+
+def teacher_report_key(student_id, day):
+    return f"analysis:{student_id}:{day}"
+
+
+# ─────────────────────────────────────────────────────────
+# 데이터 집계 (페이지의 요약 함수와 같은 기준, streamlit 없이 SQL 로)
+# ─────────────────────────────────────────────────────────
+
+def _answer_rows(con, student_id, start=None, end=None):
+    """study_sessions LEFT JOIN questions 행 (학부모 페이지 fetch_sessions 와 동일 기준)."""
+    sql = """
+        SELECT ss.subject AS subject, date(ss.created_at) AS day, q.is_correct AS is_correct
+        FROM study_sessions ss
+        LEFT JOIN session_questions q ON q.session_id = ss.id
+        WHERE ss.student_id = ?
+    """
+    params = [student_id]
+    if start:
+        sql += " AND date(ss.created_at) >= date(?)"
+        params.append(start)
+    if end:
+        sql += " AND date(ss.created_at) <= date(?)"
+        params.append(end)
+    return con.execute(sql, params).fetchall()
+
+
+def _rate(values):
+    valid = [v for v in values if v is not None]
+    return round(sum(valid) / len(valid) * 100, 1) if valid else None
+
+
+def _period_summary(rows):
+    questions = len(rows)
+    return {
+        "sessions": questions,
+        "questions": questions,
+        "correct_rate": _rate([r["is_correct"] for r in rows]),
+        "subjects": len({r["subject"] or "미분류" for r in rows}),
+    }
+
+
+def _subject_rows(rows, subjects, count_label):
+    by_subj = {}
+    for r in rows:
+        by_subj.setdefault(r["subject"] or "미분류", []).append(r["is_correct"])
+    out = []
+    for subj in subjects:
+        vals = by_subj.get(subj, [])
+        out.append({"과목": subj, count_label: len(vals), "정답률(%)": _rate(vals) or 0.0})
+    return out
+
+
+def _teacher_summary(question_rows, session_rows):
+    total_q = len(question_rows)
+    correct = sum(1 for r in question_rows if r["is_correct"] == 1)
+    days = {r["day"] for r in session_rows if r["day"]}
+    if total_q <= 50:
+        level = "Beginner"
+    elif total_q <= 200:
+        level = "Basic"
+    elif total_q <= 500:
+        level = "Intermediate"
+    else:
+        level = "Advanced"
+    return {
+        "total_questions": total_q,
+        "correct_rate": round(correct / total_q * 100, 1) if total_q > 0 else 0.0,
+        "study_days": len(days),
+        "level": level,
+    }
+
+
+def _question_rows(con, student_id):
+    """교사 페이지 get_student_summary 와 같은 기준(실제 문항 행만)."""
+    return con.execute("""
+        SELECT ss.subject AS subject, date(ss.created_at) AS day, q.is_correct AS is_correct
+        FROM session_questions q JOIN study_sessions ss ON ss.id = q.session_id
+        WHERE ss.student_id = ?
+    """, (student_id,)).fetchall()
+
+
+# ─────────────────────────────────────────────────────────
+# 항목 처리
+# ─────────────────────────────────────────────────────────
+
+def _teacher_ai_text(prompt):
+    """교사 페이지 try_ai_generate 와 같은 모델/메시지 → 응답 캐시를 공유."""
+    messages = [
+        {"role": "system", "content": TEACHER_SYSTEM},
+        {"role": "user", "content": prompt},
+    ]
+    content = ai_cache.cached_call(
+        "teacher_ai_text", TEACHER_MODEL, messages,
+        lambda: ai_client.chat_text(TEACHER_MODEL, messages, temperature=0.7, max_tokens=1200, timeout=30,
+                                    func="teacher_ai_text"),
+    )
+    return content.strip() if content else None
+
+
+def _save_parent_log(parent_id, student_id, log_type, period_key, content):
+    con = get_conn()
+    try:
+        con.execute("""
+        INSERT INTO parent_ai_log_v2(parent_id, student_id, log_type, period_key, content)
+        VALUES(?,?,?,?,?)
+        ON CONFLICT(parent_id, student_id, log_type, period_key) DO UPDATE SET
+          content=excluded.content,
+          created_at=CURRENT_TIMESTAMP
+        """, (parent_id, student_id, log_type, period_key, content))
+        con.commit()
+    finally:
+        con.close()
+
+
+def _save_teacher_logs(teacher_ids, student_id, log_key, content):
+    con = get_conn()
+    try:
+        con.executemany("""
+        INSERT INTO teacher_ai_log(teacher_id, student_id, log_type, log_key, content, updated_at)
+        VALUES(?,?,?,?,?,CURRENT_TIMESTAMP)
+        ON CONFLICT(teacher_id, student_id, log_type, log_key)
+        DO UPDATE SET content=excluded.content, updated_at=excluded.updated_at
+        """, [(tid, student_id, "analysis", log_key, content) for tid in teacher_ids])
+        con.commit()
+    finally:
+        con.close()
+
+
+def _run_parent_daily(parent_id, student_id, day):
+    con = get_conn()
+    try:
+        today = _period_summary(_answer_rows(con, student_id, day, day))
+        display_rows = _subject_rows(_answer_rows(con, student_id), PARENT_SUBJECTS, "총 문항 수")
+    finally:
+        con.close()
+    content = parent_ai_helper.generate_ai_text(daily_report_prompt(today, display_rows), force=True)
+    if not content:
+        raise RuntimeError("AI 응답 없음")
+    _save_parent_log(parent_id, student_id, "daily_report", day, content)
+
+
+def _run_parent_monthly(parent_id, student_id, day):
+    d = dt.date.fromisoformat(day)
+    start = (d - dt.timedelta(days=29)).isoformat()
+    con = get_conn()
+    try:
+        s = _period_summary(_answer_rows(con, student_id, start, day))
+    finally:
+        con.close()
+    content = parent_ai_helper.generate_ai_text(
+        monthly_report_prompt(s["questions"], s["correct_rate"], s["subjects"]), force=True
+    )
+    if not content:
+        raise RuntimeError("AI 응답 없음")
+    _save_parent_log(parent_id, student_id, "monthly_report", day[:7], content)
+
+
+def _run_teacher_analysis(teacher_ids, student, day):
+    # 프롬프트가 교사와 무관하므로 학생당 1회 생성해 모든 교사 행에 저장
+    con = get_conn()
+    try:
+        all_rows = _answer_rows(con, student["id"])
+        summary = _teacher_summary(_question_rows(con, student["id"]), all_rows)
+        subj_rows = _subject_rows(all_rows, TEACHER_SUBJECTS, "총 문항")
+    finally:
+        con.close()
+    prompt = teacher_analysis_prompt(student["name"], student["grade"], summary, subj_rows)
+    content = _teacher_ai_text(prompt)
+    if not content:
+        raise RuntimeError("AI 응답 없음")
+    _save_teacher_logs(teacher_ids, student["id"], teacher_report_key(student["id"], day), content)
+
+
+# ─────────────────────────────────────────────────────────
+# 일괄 실행
+# ─────────────────────────────────────────────────────────
+
+def _table_exists(con, name):
+    return con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+    ).fetchone() is not None
+
+
+def _load_pairs(con):
+    parent_pairs = []
+    if _table_exists(con, "parent_student"):
+        parent_pairs = [(r["parent_id"], r["student_id"]) for r in con.execute(
+            "SELECT DISTINCT parent_id, student_id FROM parent_student ORDER BY parent_id, student_id"
+        )]
+    teacher_ids = []
+    if _table_exists(con, "teachers"):
+        teacher_ids = [r["id"] for r in con.execute("SELECT id FROM teachers ORDER BY id")]
+    students = [dict(r) for r in con.execute("SELECT id, name, grade FROM students ORDER BY id")]
+    return parent_pairs, teacher_ids, students
+
+
+def _done_items(run_date):
+    con = get_conn()
+    rows = con.execute(
+        "SELECT kind, owner_id, student_id FROM report_batch_items WHERE run_date=? AND status='done'",
+        (run_date,)
+    ).fetchall()
+    con.close()
+    return {(r["kind"], r["owner_id"], r["student_id"]) for r in rows}
+
+
+def _mark(run_date, item, status, error, elapsed):
+    kind, owner_id, student_id = item
+    con = get_conn()
+    con.execute("""
+    INSERT INTO report_batch_items(run_date, kind, owner_id, student_id, status, error, elapsed, finished_at)
+    VALUES(?,?,?,?,?,?,?,CURRENT_TIMESTAMP)
+    ON CONFLICT(run_date, kind, owner_id, student_id) DO UPDATE SET
+      status=excluded.status, error=excluded.error, elapsed=excluded.elapsed, finished_at=excluded.finished_at
+    """, (run_date, kind, owner_id, student_id, status, error, elapsed))
+    con.commit()
+    con.close()
+
+
+def build_items(day, only=None):
+    """(항목 키, 실행 함수) 목록. 교사 분석은 owner_id=0 으로 학생당 1개."""
+    con = get_conn()
+    try:
+        parent_pairs, teacher_ids, students = _load_pairs(con)
+    finally:
+        con.close()
+
+    # 로그 테이블은 각 페이지가 처음 열릴 때 만든다 → 아직 없으면 해당 리포트는 건너뜀
+    con = get_conn()
+    try:
+        has_parent_log = _table_exists(con, "parent_ai_log_v2")
+        has_teacher_log = _table_exists(con, "teacher_ai_log")
+    finally:
+        con.close()
+
+    items = []
+    if only in (None, "parent") and has_parent_log:
+        for pid, sid in parent_pairs:
+            items.append((("daily_report", pid, sid), lambda p=pid, s=sid: _run_parent_daily(p, s, day)))
+            items.append((("monthly_report", pid, sid), lambda p=pid, s=sid: _run_parent_monthly(p, s, day)))
+    if only in (None, "teacher") and has_teacher_log and teacher_ids:
+        for stu in students:
+            items.append((("analysis", 0, stu["id"]),
+                          lambda s=stu: _run_teacher_analysis(teacher_ids, s, day)))
+    return items
+
+
+def run_batch(day=None, workers=MAX_WORKERS, only=None, force=False, log=print):
+    """
+    day 기준 리포트를 생성. 이미 완료된 항목은 건너뛰고(force=True 면 다시 생성),
+    동시에 최대 workers 개만 AI 를 호출한다. 결과 요약 dict 반환.
+    """
+    day = day or dt.date.today().isoformat()
+    db.init_database()
+    ensure_batch_table()
+    if not ai_client.is_configured():
+        raise RuntimeError("OpenAI API 키가 설정되지 않았습니다.")
+
+    items = build_items(day, only)
+    done = set() if force else _done_items(day)
+    todo = [(key, fn) for key, fn in items if key not in done]
+    summary = {"date": day, "total": len(items), "skipped": len(items) - len(todo),
+               "done": 0, "failed": 0, "errors": []}
+    lock = threading.Lock()
+
+    def run_one(key, fn):
+        started = time.perf_counter()
+        try:
+            with ai_governor.caller("batch"):  # 배치는 하루 한도 없이 동시 호출 상한/토큰 버킷만 적용
+                fn()
+        except Exception as e:
+            elapsed = time.perf_counter() - started
+            _mark(day, key, "failed", str(e)[:500], elapsed)
+            with lock:
+                summary["failed"] += 1
+                summary["errors"].append((key, str(e)))
+            log(f"[실패] {key}: {e}")
+            return
+        _mark(day, key, "done", None, time.perf_counter() - started)
+        with lock:
+            summary["done"] += 1
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="report-batch") as pool:
+        futures = [pool.submit(run_one, key, fn) for key, fn in todo]
+        for _ in as_completed(futures):
+            pass
+
+    log(f"[{day}] 전체 {summary['total']} / 완료 {summary['done']} / "
+        f"건너뜀 {summary['skipped']} / 실패 {summary['failed']}")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="학부모/교사 리포트 야간 일괄 생성")
+    parser.add_argument("--date", default=None, help="기준일 YYYY-MM-DD (기본: 오늘)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="동시 AI 호출 수")
+    parser.add_argument("--only", choices=["parent", "teacher"], default=None)
+    parser.add_argument("--force", action="store_true", help="완료 항목도 다시 생성")
+    args = parser.parse_args()
+    result = run_batch(args.date, args.workers, args.only, args.force)
+    raise SystemExit(1 if result["failed"] else 0)
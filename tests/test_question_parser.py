@@ -0,0 +1,45 @@
+import pytest
+
+pytest.importorskip("streamlit")
+
+import openai_helper as oh
+
+# 정답과 해설: 사이에 태그 없는 줄이 끼어 있는 응답
+CONTENT = (
+    "문제 1\n"
+    "광합성이 일어나는 곳은?\n"
+    "① 핵 ② 미토콘드리아 ③ 엽록체\n"
+    "정답: ③\n"
+    "(보기 ③이 맞음)\n"
+    "해설: 광합성은 엽록체에서 일어난다.\n"
+    "문제 2\n"
+    "1+1=?\n"
+    "정답: 2\n"
+    "해설:\n"
+    "두 수를 더한다.\n"
+)
+
+# 스트리밍 파서 도입 전 parse_questions 의 출력
+EXPECTED = [
+    {"question_text": "광합성이 일어나는 곳은?\n① 핵 ② 미토콘드리아 ③ 엽록체",
+     "answer": "③", "explanation": "광합성은 엽록체에서 일어난다."},
+    {"question_text": "1+1=?", "answer": "2", "explanation": "두 수를 더한다."},
+]
+
+
+def test_tagged_explanation_overrides_untagged_line():
+    assert oh.parse_questions(CONTENT) == EXPECTED
+
+
+def test_streaming_matches_parse_questions():
+    parser = oh.QuestionStreamParser()
+    out = []
+    for ch in CONTENT:
+        out.extend(parser.feed(ch))
+    out.extend(parser.close())
+    assert out == EXPECTED
+
+
+def test_untagged_line_kept_when_no_tagged_explanation():
+    out = oh.parse_questions("문제 1\nQ\n정답: A\n추가 설명\n")
+    assert out == [{"question_text": "Q", "answer": "A", "explanation": "추가 설명"}]
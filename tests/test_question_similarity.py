@@ -0,0 +1,49 @@
+import random
+
+import pytest
+
+import question_similarity as qs
+
+WORDS = ["다음", "중", "옳은", "것은", "함수", "방정식", "그래프", "넓이", "확률", "수열", "극한", "미분",
+         "적분", "벡터", "원의", "삼각형", "값을", "구하시오", "보기", "에서", "고른", "모두", "실수", "정수"]
+
+
+def _question(rng, i):
+    words = rng.choices(WORDS, k=rng.randint(6, 14))
+    return f"{i}번 " + " ".join(words) + f" x={rng.randint(1, 99)}"
+
+
+def _build(n_docs, seed=0):
+    """sync() 와 같은 순서로 색인: 문서 추가 중 색인이 RENORM_GROWTH 배가 될 때마다 renormalize()."""
+    rng = random.Random(seed)
+    index = qs.NgramIndex()
+    texts = []
+    for i in range(n_docs):
+        text = _question(rng, i)
+        texts.append(text)
+        index.add(i + 1, 1, "수학", text)
+        if len(index) >= qs.RENORM_GROWTH * max(index.renorm_n, 1):
+            index.renormalize()
+    return index, texts
+
+
+def _self_score(index, texts, doc):
+    docs, sims = index.scores(texts[doc])
+    return float(sims[docs == doc][0])
+
+
+@pytest.mark.parametrize("renormalize", [False, True])
+def test_self_similarity_is_one_at_any_position(renormalize):
+    index, texts = _build(5000)
+    if renormalize:
+        index.renormalize()
+    assert index.stop           # 5000개면 흔한 n-gram 이 실제로 빠지는 상태
+    for doc in (0, 1, 500, 2047, 2048, 3000, 4999):
+        assert _self_score(index, texts, doc) == pytest.approx(1.0, abs=1e-4)
+
+
+def test_scores_never_exceed_one():
+    index, texts = _build(1500, seed=1)
+    for doc in (0, 700, 1499):
+        _, sims = index.scores(texts[doc])
+        assert sims.max() <= 1.0 + 1e-4